@@ -0,0 +1,238 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Tuple
+
+import nltk
+import numpy as np
+from nltk.corpus import stopwords
+from nltk.stem import WordNetLemmatizer
+from nltk.tokenize import sent_tokenize, word_tokenize
+
+from model_registry import OFFLINE_MODE, register_model, get_model
+
+NLTK_REGISTRY_KEY = "nltk"
+# NLTK packages used by the scorers, with the path nltk.data.find() looks them up by
+NLTK_RESOURCES = {
+    "stopwords": "corpora/stopwords",
+    "wordnet": "corpora/wordnet",
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    # Syllable counts for readability
+    "cmudict": "corpora/cmudict",
+}
+
+# Filled pauses counted by the fluency scorer (matched anywhere in the raw text)
+FILLED_PAUSES = ["um", "uh", "ah", "err", "hmm", "like", "you know", "i mean", "so"]
+_FILLED_PAUSE_PATTERNS = [re.compile(pause) for pause in FILLED_PAUSES]
+
+# Filler words dropped before grammar checking, as single tokens or token pairs
+GRAMMAR_FILLER_WORDS = frozenset(["um", "uh", "ah", "err", "hmm", "like"])
+GRAMMAR_FILLER_PHRASES = frozenset([("you", "know"), ("i", "mean")])
+
+_lemmatizer = WordNetLemmatizer()
+
+
+@lru_cache(maxsize=100000)
+def lemmatize(token):
+    return _lemmatizer.lemmatize(token)
+
+
+@lru_cache(maxsize=1)
+def english_stopwords():
+    return frozenset(stopwords.words('english'))
+
+
+def _load_nltk_data():
+    """
+    Make sure the NLTK data is installed, downloading what is missing unless running offline,
+    and load the corpora so the first transcript does not pay for it.
+    """
+    missing = []
+    for package, resource_path in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource_path)
+        except LookupError:
+            missing.append(package)
+    if missing and OFFLINE_MODE:
+        raise RuntimeError(f"NLTK data {missing} not installed and OFFLINE_MODE is set")
+    for package in missing:
+        if not nltk.download(package, quiet=True):
+            raise RuntimeError(f"Could not download NLTK data '{package}'")
+
+    english_stopwords()
+    lemmatize("loaded")
+    word_tokenize(sent_tokenize("NLTK data is loaded.")[0])
+    return NLTK_RESOURCES
+
+
+register_model(NLTK_REGISTRY_KEY, _load_nltk_data)
+
+
+@dataclass(frozen=True)
+class AnalyzedTranscript:
+    """
+    Everything the scorers derive from a transcription, computed once per job.
+    """
+    text: str
+    lower_text: str
+    sentences: Tuple[str, ...]
+    tokens: Tuple[str, ...]              # word_tokenize(text), original case
+    alpha_tokens: Tuple[str, ...]        # lowercased alphabetic tokens
+    lemmas: Tuple[str, ...]              # lemma of each alpha token
+    stopword_mask: np.ndarray            # True where the alpha token is an English stopword
+    filler_matches: Tuple[str, ...]      # filled pauses found in the text
+    grammar_token_count: int             # tokens left once grammar filler words are removed
+    words: Tuple[str, ...]               # ASR words with timestamps
+    word_starts: np.ndarray
+    word_ends: np.ndarray
+
+
+def _readonly(array):
+    array.flags.writeable = False
+    return array
+
+
+def word_timing_arrays(word_timestamps):
+    """
+    Convert Nemo word timestamps into contiguous start/end arrays plus the word list.
+    """
+    count = len(word_timestamps)
+    starts = np.fromiter((entry['start'] for entry in word_timestamps), dtype=np.float64, count=count)
+    ends = np.fromiter((entry['end'] for entry in word_timestamps), dtype=np.float64, count=count)
+    words = tuple(entry['word'] for entry in word_timestamps)
+    return words, starts, ends
+
+
+def _count_grammar_tokens(tokens):
+    count = 0
+    index = 0
+    while index < len(tokens):
+        if tuple(tokens[index:index + 2]) in GRAMMAR_FILLER_PHRASES:
+            index += 2
+            continue
+        if tokens[index] not in GRAMMAR_FILLER_WORDS:
+            count += 1
+        index += 1
+    return count
+
+
+def analyze_transcript(transcribe_output):
+    """
+    Build the shared AnalyzedTranscript from a transcribe output. Passing an
+    AnalyzedTranscript returns it unchanged, so scorers accept either.
+    """
+    if isinstance(transcribe_output, AnalyzedTranscript):
+        return transcribe_output
+
+    hypothesis = transcribe_output[0]
+    word_timestamps = (getattr(hypothesis, "timestamp", None) or {}).get('word', [])
+    words, starts, ends = word_timing_arrays(word_timestamps)
+    return analyze_text(hypothesis.text, words, starts, ends)
+
+
+def analyze_text(text, words, starts, ends):
+    """
+    Build the AnalyzedTranscript from the transcription text and its word timing arrays.
+    """
+    # Installs the NLTK data on first use when warm-up has not done it yet
+    get_model(NLTK_REGISTRY_KEY)
+
+    lower_text = text.lower()
+
+    # Same tokens as word_tokenize(text), which sentence-splits internally anyway
+    sentences = tuple(sentence for sentence in sent_tokenize(text) if sentence.strip())
+    tokens = tuple(token for sentence in sentences for token in word_tokenize(sentence, preserve_line=True))
+
+    alpha_tokens = tuple(token.lower() for token in tokens if token.isalpha())
+    stop_words = english_stopwords()
+    stopword_mask = np.fromiter((token in stop_words for token in alpha_tokens), dtype=bool,
+                                count=len(alpha_tokens))
+
+    filler_matches = tuple(match for pattern in _FILLED_PAUSE_PATTERNS for match in pattern.findall(text))
+
+    return AnalyzedTranscript(
+        text=text,
+        lower_text=lower_text,
+        sentences=sentences,
+        tokens=tokens,
+        alpha_tokens=alpha_tokens,
+        lemmas=tuple(lemmatize(token) for token in alpha_tokens),
+        stopword_mask=_readonly(stopword_mask),
+        filler_matches=filler_matches,
+        grammar_token_count=_count_grammar_tokens(tokens),
+        words=tuple(words),
+        word_starts=_readonly(np.asarray(starts, dtype=np.float64)),
+        word_ends=_readonly(np.asarray(ends, dtype=np.float64)),
+    )
+
+
+def content_lemmas(tokens):
+    """
+    Lemmas of the alphabetic, non-stopword tokens, as the vocabulary scorer counts them.
+    """
+    stop_words = english_stopwords()
+    lowered = (token.lower() for token in tokens if token.isalpha())
+    return [lemmatize(token) for token in lowered if token not in stop_words]
+
+
+class FilledPauseCounter:
+    """
+    Counts filled pauses in text that arrives piece by piece, with the same (non-overlapping)
+    matches as running the patterns over the whole text at once. Only the few characters a
+    match could still start in are kept between pieces.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._tail = ""
+        # Per pattern: where in the tail its next match may start
+        self._positions = [0] * len(_FILLED_PAUSE_PATTERNS)
+
+    def feed(self, text):
+        buffer = self._tail + text
+        for index, pattern in enumerate(_FILLED_PAUSE_PATTERNS):
+            position = self._positions[index]
+            while (match := pattern.search(buffer, position)) is not None:
+                self.count += 1
+                position = match.end()
+            # A match starting any earlier would already have been found
+            self._positions[index] = max(position, len(buffer) - len(pattern.pattern) + 1)
+        keep_from = min(self._positions)
+        self._tail = buffer[keep_from:]
+        self._positions = [position - keep_from for position in self._positions]
+
+
+class SentenceStream:
+    """
+    Sentence-splits and tokenizes text that arrives piece by piece, producing the same tokens
+    as analyze_text on the whole text. Sentences are final once a later one has started;
+    only the last, possibly unfinished sentence is re-tokenized when more text arrives.
+    """
+
+    def __init__(self):
+        self.open_text = ""
+
+    def split(self, text):
+        """
+        Return the (closed sentences, open sentence) that the open text plus `text` makes,
+        without consuming them.
+        """
+        get_model(NLTK_REGISTRY_KEY)
+        buffer = self.open_text + text
+        sentences = [sentence for sentence in sent_tokenize(buffer) if sentence.strip()]
+        if not sentences:
+            return [], buffer
+        # The last sentence runs to the end of the buffer
+        return sentences[:-1], buffer[buffer.rfind(sentences[-1]):]
+
+    def feed(self, text):
+        """
+        Add text and return the sentences it closed.
+        """
+        closed, self.open_text = self.split(text)
+        return closed
+
+
+def sentence_tokens(sentences):
+    return [token for sentence in sentences for token in word_tokenize(sentence, preserve_line=True)]
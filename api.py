@@ -1,62 +1,300 @@
 import os
+import json
+import time
 import uuid
-from typing import Dict, Any
+import zipfile
+from functools import partial
+from typing import Any, List, Optional
 import asyncio
-import aiofiles
-from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
-from fastapi import UploadFile, File, BackgroundTasks, HTTPException, status, APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import (UploadFile, File, Form, Query, HTTPException, status, APIRouter, Request, WebSocket,
+                     WebSocketDisconnect)
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from transcribe import transcribe_audio_with_nemo_parakeet
+from audio_ingest import MAX_AUDIO_DURATION_SEC, AudioRejectedError, ingest_upload
+from batch_input import (AsyncBytesReader, ManifestError, parse_manifest, read_archive_manifest,
+                         archive_audio_members)
+from dedup import (UploadStore, SingleFlight, transcript_cache, score_cache, score_cache_key,
+                   dedup_cache_stats)
+from events import EventBroker, TERMINAL_STATUSES
+from metrics import (JobTrace, AUDIO_DURATION_SECONDS, TRANSCRIPT_WORDS, EXECUTOR_BUSY, gauge, counter,
+                     profile_reports, render_metrics, time_stage, track_executor, PROFILER)
+from jobs import (Job, JobQueue, PriorityGate, AdmissionRejectedError, QueueFullError, PRIORITY_CLASSES,
+                  DEFAULT_PRIORITY, QUEUED, TRANSCRIBING, SCORING, COMPLETED, FAILED)
+from model_registry import model_status
+from result_store import create_result_store, summarize_text, compact_word_timestamps, STORE_WORD_TIMESTAMPS
+from segmentation import SAMPLE_RATE
+from streaming import STREAM_ENCODINGS, STREAM_INTERIM_SEC, PCMDecoder, StreamTranscript, StreamWindower
+from transcribe import asr_batcher, transcribe_audio
+from analysis import analyze_transcript
 from fluency_score import calculate_fluency_score
 from vocabulary_score import calculate_vocabulary_score
-from grammar_score import calculate_grammar_score
-from relevancy_score import calculate_relevancy_score
+from grammar_score import calculate_grammar_score, grammar_cache_stats
+from relevancy_score import calculate_relevancy_score, embedding_cache_stats
+from scoring import (SCORING_BACKEND, SCORING_WORKERS, create_scoring_executor, score_payload,
+                     transcript_payload)
 
 router = APIRouter(prefix="/audio", tags=["transcribe"])
+# Operational endpoints served at the root (metrics)
+ops_router = APIRouter(tags=["monitoring"])
 
-# --- In-memory storage for results ---
-# In a real application, use a database (e.g., Redis, PostgreSQL, MongoDB)
-results_db: Dict[str, Dict[str, Any]] = {}
-processing_status: Dict[str, str] = {} # To track if a task is 'processing' or 'completed'
+# --- Storage for results ---
+# Compact per-job records (status, topic, transcription summary, scores), in memory or SQLite.
+# Status moves queued -> transcribing -> scoring -> completed/failed
+result_store = create_result_store()
+
+
+# Pushes status transitions and per-scorer results to subscribed clients
+event_broker = EventBroker()
 
 
 # --- Configuration ---
 UPLOAD_DIRECTORY = "uploaded_audio"
-# Create the directory if it doesn't exist
-Path(UPLOAD_DIRECTORY).mkdir(parents=True, exist_ok=True)
+# Uploads are decoded in memory unless UPLOAD_SPOOL_TO_DISK is set; spooled uploads are stored
+# once per distinct content and expire from the directory, which is created if it doesn't exist
+upload_store = UploadStore(UPLOAD_DIRECTORY)
+# Concurrent jobs for the same recording share one transcription
+transcription_flights = SingleFlight()
+
+# Maximum number of uploads waiting for transcription before new ones are rejected
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", 100))
+# Decoded audio (bytes) that queued jobs may hold in memory before new uploads wait or get 503
+MAX_QUEUED_AUDIO_BYTES = int(os.environ.get("MAX_QUEUED_AUDIO_BYTES", 1024 ** 3))
+# Number of jobs transcribed concurrently (concurrent jobs share batched ASR calls)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 8))
+
+# Longest a results request may wait for completion (long-poll)
+LONG_POLL_MAX_SEC = float(os.environ.get("LONG_POLL_MAX_SEC", 60))
+# Longest an SSE / WebSocket subscription stays open
+EVENT_STREAM_MAX_SEC = float(os.environ.get("EVENT_STREAM_MAX_SEC", 1800))
 
 # --- Background Task Execution ---
-executor = ThreadPoolExecutor(max_workers=4) # Use a ThreadPoolExecutor for CPU-bound tasks
+# Threads for CPU-bound scoring, or worker processes when SCORING_BACKEND=process
+executor = create_scoring_executor()
+# Transcription blocks on the model, so it runs in its own pool off the event loop
+transcription_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+track_executor("scoring", SCORING_WORKERS)
+track_executor("transcription", JOB_WORKERS)
 
-async def run_scoring_in_background(unique_id: str, transcribed_output: Any, topic: str):
+def create_job(unique_id: str, **fields):
     """
-    Runs all scoring functions in parallel using ThreadPoolExecutor.
+    Stores a new job record and announces its first status to subscribers.
     """
-    processing_status[unique_id] = "processing"
-    results_db[unique_id] = {"status": "processing", "transcription": transcribed_output, "topic": topic}
+    with time_stage("store_write"):
+        result_store.create(unique_id, **fields)
+    event_broker.publish(unique_id, {"event": "status", **fields})
+
+
+def update_job(unique_id: str, **fields):
+    """
+    Updates a job record and pushes the change to subscribers.
+    """
+    with time_stage("store_write"):
+        result_store.update(unique_id, **fields)
+    event_broker.publish(unique_id, {"event": "status", **fields})
+
 
+def job_snapshot(unique_id: str) -> Optional[dict]:
+    """
+    Current state of a job as a status event, or None when it is unknown.
+    """
+    record = result_store.get(unique_id)
+    if record is None:
+        return None
+    event = {"event": "status", "unique_id": unique_id, "time": record["updated_at"], "status": record["status"]}
+    for key in ("transcription", "scores", "error"):
+        if record.get(key) is not None:
+            event[key] = record[key]
+    if record["status"] == QUEUED:
+        event["queue_position"] = job_queue.position(unique_id)
+    return event
+
+
+def _publish_score(unique_id: str, scorer: str, future: asyncio.Future):
+    if not future.cancelled() and future.exception() is None:
+        event_broker.publish(unique_id, {"event": "score", "scorer": scorer, "score": round(future.result(), 2)})
+
+
+async def _score_in_threads(unique_id: str, transcribed_output: Any, topic: str, trace: JobTrace) -> dict:
+    """
+    Runs all scoring functions in parallel using ThreadPoolExecutor.
+    """
     loop = asyncio.get_event_loop()
-    
-    # Run CPU-bound tasks in the executor
-    fluency_task = loop.run_in_executor(executor, calculate_fluency_score, transcribed_output)
-    vocabulary_task = loop.run_in_executor(executor, calculate_vocabulary_score, transcribed_output)
-    grammar_task = loop.run_in_executor(executor, calculate_grammar_score, transcribed_output)
-    relevancy_task = loop.run_in_executor(executor, calculate_relevancy_score, transcribed_output, topic)
+
+    # Tokenize, lemmatize and extract word timings once for all scorers
+    document = await loop.run_in_executor(executor, trace.wrap("analysis", analyze_transcript, pool="scoring"),
+                                          transcribed_output)
+    TRANSCRIPT_WORDS.observe(len(document.words))
+
+    # Run CPU-bound tasks in the executor, each timed as its own stage
+    fluency_task = loop.run_in_executor(executor, trace.wrap("fluency", calculate_fluency_score, pool="scoring"),
+                                        document)
+    vocabulary_task = loop.run_in_executor(
+        executor, trace.wrap("vocabulary", calculate_vocabulary_score, pool="scoring"), document)
+    grammar_task = loop.run_in_executor(executor, trace.wrap("grammar", calculate_grammar_score, pool="scoring"),
+                                        document)
+    relevancy_task = loop.run_in_executor(
+        executor, trace.wrap("relevancy", calculate_relevancy_score, pool="scoring"), document, topic)
+    # Push each score as soon as its scorer finishes
+    for scorer, task in (("fluency", fluency_task), ("vocabulary", vocabulary_task),
+                         ("grammar", grammar_task), ("relevancy", relevancy_task)):
+        task.add_done_callback(partial(_publish_score, unique_id, scorer))
 
     # Await all tasks to complete
     fluency_result, vocabulary_result, grammar_result, relevancy_result = await asyncio.gather(
         fluency_task, vocabulary_task, grammar_task, relevancy_task
     )
+    return {"fluency": fluency_result, "vocabulary": vocabulary_result, "grammar": grammar_result,
+            "relevancy": relevancy_result}
+
+
+async def _score_in_worker_process(unique_id: str, transcribed_output: Any, topic: str, trace: JobTrace) -> dict:
+    """
+    Runs the analysis and all scoring functions in one worker process. Only the text and
+    word timing arrays are sent to it, never the Nemo hypothesis.
+    """
+    loop = asyncio.get_event_loop()
+    payload = transcript_payload(transcribed_output)
+    TRANSCRIPT_WORDS.observe(len(payload["words"]))
+
+    # Counted from submission, so saturation above 1 means jobs are waiting for a worker
+    EXECUTOR_BUSY.inc(pool="scoring")
+    try:
+        result = await loop.run_in_executor(executor, score_payload, payload, topic, trace.profile)
+    finally:
+        EXECUTOR_BUSY.dec(pool="scoring")
+    trace.add_spans(result["spans"], result["profiles"])
+
+    for scorer, score in result["scores"].items():
+        event_broker.publish(unique_id, {"event": "score", "scorer": scorer, "score": round(score, 2)})
+    return result["scores"]
+
+
+async def run_scoring_in_background(unique_id: str, transcribed_output: Any, topic: str,
+                                    trace: Optional[JobTrace] = None):
+    """
+    Scores a transcription on the configured backend and stores the results.
+    """
+    trace = trace or JobTrace(unique_id)
+    update_job(unique_id, status=SCORING, transcription=summarize_text(transcribed_output[0].text))
+
+    if SCORING_BACKEND == "process":
+        results = await _score_in_worker_process(unique_id, transcribed_output, topic, trace)
+    else:
+        results = await _score_in_threads(unique_id, transcribed_output, topic, trace)
 
     # Store results
-    results_db[unique_id]["fluency"] = round(fluency_result, 2)
-    results_db[unique_id]["vocabulary"] = round(vocabulary_result, 2)
-    results_db[unique_id]["grammar"] = round(grammar_result, 2)
-    results_db[unique_id]["relevancy"] = round(relevancy_result, 2)
-    results_db[unique_id]["status"] = "completed"
-    processing_status[unique_id] = "completed"
+    scores = {scorer: round(result, 2) for scorer, result in results.items()}
+    update_job(unique_id, status=COMPLETED, scores=scores)
+    return scores
+
+
+async def transcribe_cached(audio_hash: str, audio_file: Any, trace: Optional[JobTrace] = None):
+    """
+    Transcribes a recording unless the same content was already transcribed;
+    simultaneous requests for the same content wait on a single ASR run.
+    """
+    if audio_hash is not None:
+        cached = transcript_cache.get(audio_hash)
+        if cached is not None:
+            return cached
+
+    loop = asyncio.get_running_loop()
+
+    async def run_asr():
+        # Includes the wait for a batch slot; the ASR stage itself is timed per batch
+        transcribe = trace.wrap("transcribe", transcribe_audio, pool="transcription") if trace else transcribe_audio
+        return await loop.run_in_executor(transcription_executor, transcribe, audio_file)
+
+    if audio_hash is None:
+        return await run_asr()
+    transcribed_output = await transcription_flights.run(audio_hash, run_asr)
+    transcript_cache.set(audio_hash, transcribed_output)
+    return transcribed_output
+
+
+async def process_job(job: Job):
+    """
+    Runs one queued upload through transcription and scoring.
+    """
+    unique_id = job.job_id
+    trace = JobTrace(unique_id, profile=job.profile)
+    trace.spans["queue_wait"] = round(time.monotonic() - job.enqueued_at, 4)
+    final_status = FAILED
+    try:
+        update_job(unique_id, status=TRANSCRIBING)
+
+        transcribed_output = await transcribe_cached(job.audio_hash, job.audio_file, trace)
+        print(f"Transcription completed for {unique_id}: {transcribed_output[0].text}")
+        if STORE_WORD_TIMESTAMPS:
+            result_store.put_timestamps(unique_id, compact_word_timestamps(transcribed_output[0].timestamp['word']))
+
+        # A job for the same recording and topic may have finished while this one waited
+        cache_key = score_cache_key(job.audio_hash, job.topic) if job.audio_hash else None
+        cached = score_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            update_job(unique_id, status=COMPLETED, scores=cached["scores"],
+                       transcription=cached["transcription"])
+            final_status = COMPLETED
+            return
+
+        # Scoring slots go to the highest priority, cheapest job first
+        wait_start = time.monotonic()
+        async with scoring_gate.admit(job):
+            trace.spans["scoring_wait"] = round(time.monotonic() - wait_start, 4)
+            scores = await run_scoring_in_background(unique_id, transcribed_output, job.topic, trace)
+        final_status = COMPLETED
+        if cache_key:
+            score_cache.set(cache_key, {"scores": scores, "transcription": summarize_text(transcribed_output[0].text)})
+    except Exception as e:
+        update_job(unique_id, status=FAILED, error=str(e))
+        raise
+    finally:
+        if isinstance(job.audio_file, str):
+            upload_store.release(job.audio_file)
+        trace.finish(final_status)
+
+
+job_queue = JobQueue(process_job, max_queue_size=JOB_QUEUE_SIZE, num_workers=JOB_WORKERS,
+                     max_audio_bytes=MAX_QUEUED_AUDIO_BYTES)
+scoring_gate = PriorityGate(SCORING_WORKERS, pool="scoring")
+
+
+def cache_stats() -> dict:
+    return {"topic_embeddings": embedding_cache_stats(), "grammar_sentences": grammar_cache_stats(),
+            **dedup_cache_stats()}
+
+
+def _cache_stat(key: str) -> dict:
+    return {(name,): stats[key] for name, stats in cache_stats().items() if stats is not None}
+
+
+# --- Metrics read at scrape time ---
+gauge("audio_job_queue_depth", "Jobs waiting for a worker.", function=job_queue.depth)
+gauge("audio_job_queue_depth_by_priority", "Jobs waiting for a worker, by priority class.",
+      labelnames=("priority",), function=job_queue.depth_by_priority)
+gauge("audio_scoring_waiting_jobs", "Queued jobs waiting for a scoring slot.", function=scoring_gate.waiting)
+gauge("audio_event_subscribers", "Open SSE/WebSocket subscriptions.", function=event_broker.subscriber_count)
+counter("audio_cache_hits_total", "Cache hits.", labelnames=("cache",), function=partial(_cache_stat, "hits"))
+counter("audio_cache_misses_total", "Cache misses.", labelnames=("cache",), function=partial(_cache_stat, "misses"))
+gauge("audio_cache_hit_ratio", "Fraction of cache lookups that hit.", labelnames=("cache",),
+      function=partial(_cache_stat, "hit_rate"))
+gauge("audio_cache_entries", "Entries held per cache.", labelnames=("cache",),
+      function=partial(_cache_stat, "entries"))
+
+
+def _check_priority(priority: str):
+    if priority not in PRIORITY_CLASSES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITY_CLASSES)}.")
+
+
+def _client_id(request: Request) -> Optional[str]:
+    """
+    The client a job counts against for quotas and fair queuing: the X-Client-ID header,
+    else the caller's address.
+    """
+    return request.headers.get("X-Client-ID") or (request.client.host if request.client else None)
 
 
 @router.post("/input", summary="Submit audio for transcription and analysis",
@@ -64,88 +302,515 @@ async def run_scoring_in_background(unique_id: str, transcribed_output: Any, top
                       "The audio will be transcribed, and then fluency, vocabulary, "
                       "grammar, and topic relevancy will be calculated in the background.")
 async def process_input(
+    request: Request,
     audio_file: UploadFile = File(..., description="Audio file to transcribe (e.g., WAV, MP3)"),
-    topic: str = File(..., description="The topic related to the audio content")
+    topic: str = File(..., description="The topic related to the audio content"),
+    profile: bool = Query(False, description="Profile this job's pipeline stages (when profiling is enabled)"),
+    priority: str = Query(DEFAULT_PRIORITY, description="Priority class of the job"),
 ):
     """
     Handles audio file upload and topic submission for background processing.
     """
+    _check_priority(priority)
     # Generate a unique ID for this request
     unique_id = str(uuid.uuid4())
     
-    # --- SAVE THE UPLOADED AUDIO FILE ---
-    # Construct a unique filename, preserving the original extension
+    # --- READ THE UPLOADED AUDIO ---
+    # Decoded to 16 kHz samples while it streams in (or stored under the hash of its content)
     file_extension = os.path.splitext(audio_file.filename)[1]
-    saved_filename = f"{unique_id}{file_extension}"
-    file_path = Path(UPLOAD_DIRECTORY) / saved_filename
 
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            while contents := await audio_file.read(1024 * 1024): # Read in 1MB chunks
-                await f.write(contents)
-        print(f"Audio file saved to: {file_path}")
+        with time_stage("ingest"):
+            ingested = await ingest_upload(audio_file, file_extension, upload_store)
+    except AudioRejectedError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail=f"Could not save audio file: {e}")
-    # Simulate Nemo Parakeet transcription
-    transcribed_output = await transcribe_audio_with_nemo_parakeet(str(file_path))
-
-    # Store initial status and transcription
-    results_db[unique_id] = {"status": "transcribing", "transcription": transcribed_output[0].text, "topic": topic}
-    processing_status[unique_id] = "transcribing"
-    print(f"Transcription completed for {unique_id}: {transcribed_output[0].text}")
-    # Add the intensive scoring task to background
-    # This will run `run_scoring_in_background` without blocking the API response
-    background_tasks = BackgroundTasks()
-    background_tasks.add_task(run_scoring_in_background, unique_id, transcribed_output, topic)
+                            detail=f"Could not read audio file: {e}")
+    audio_hash = ingested.audio_hash
+    print(f"Audio received for {unique_id}: {ingested.duration:.1f}s"
+          + (f", saved to {ingested.audio}" if ingested.on_disk else ""))
+
+    # Same recording and topic as an earlier request: reuse its scores
+    cached = score_cache.get(score_cache_key(audio_hash, topic))
+    if cached is not None:
+        create_job(unique_id, status=COMPLETED, topic=topic, scores=cached["scores"],
+                   transcription=cached["transcription"])
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={
+                "message": "Identical audio and topic were already analyzed. Results are available.",
+                "unique_id": unique_id,
+                "status": COMPLETED,
+            }
+        )
+
+    # Queue the upload for transcription and scoring; the response does not wait for either
+    create_job(unique_id, status=QUEUED, topic=topic)
+    if ingested.on_disk:
+        upload_store.acquire(ingested.audio)
+    job = Job(unique_id, ingested.audio, topic, audio_hash=audio_hash, profile=profile,
+              duration=ingested.duration, priority=priority, client_id=_client_id(request))
+    try:
+        queue_position = job_queue.submit(job)
+    except QueueFullError as e:
+        result_store.delete(unique_id)
+        if ingested.on_disk:
+            upload_store.release(ingested.audio)
+        detail = str(e) if isinstance(e, AdmissionRejectedError) else \
+            "Too many audio files are waiting to be processed. Please retry later."
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail,
+                            headers={"Retry-After": str(e.retry_after)})
+    if ingested.on_disk:
+        # Keep the upload directory within its retention and size budget
+        await asyncio.get_running_loop().run_in_executor(None, upload_store.cleanup)
 
     return JSONResponse(
         status_code=status.HTTP_202_ACCEPTED,
         content={
             "message": "Audio submitted for processing. Results will be available shortly.",
             "unique_id": unique_id,
-            "transcription": transcribed_output[0].text # Optionally return transcription immediately
-        },
-        background=background_tasks
+            "status": QUEUED,
+            "queue_position": queue_position,
+            "priority": priority,
+            "estimated_wait_sec": round(job_queue.estimated_wait(job), 1),
+        }
     )
 
+def _batch_item_result(item: dict) -> dict:
+    """
+    Builds the NDJSON line reporting the outcome of one batch item.
+    """
+    line = {"type": "result", "index": item["index"], "file": item["file"], "unique_id": item.get("unique_id")}
+    record = result_store.get(item["unique_id"]) if item.get("unique_id") else None
+    if item.get("error") or record is None:
+        line.update(status=FAILED, error=item.get("error") or "Result expired before it could be reported.")
+    elif record["status"] == COMPLETED:
+        line.update(status=COMPLETED, scores=record["scores"])
+    else:
+        line.update(status=record["status"], error=record.get("error"))
+    return line
+
+
+@router.post("/batch", summary="Submit many audio files in one request",
+          description="Upload several audio files (with `topics` in the same order, or one `topic` for all), "
+                      "or a zip `archive` with a `manifest` of (file, topic) pairs given as a CSV with a "
+                      "header row, JSON lines or a JSON list. The manifest may also be stored in the archive "
+                      "as manifest.csv/.jsonl/.json. Results are streamed back as NDJSON in completion order.")
+async def process_batch(
+    request: Request,
+    audio_files: Optional[List[UploadFile]] = File(None, description="Audio files to transcribe"),
+    topics: Optional[List[str]] = Form(None, description="One topic per audio file, in upload order"),
+    topic: Optional[str] = Form(None, description="Topic for every item without its own topic"),
+    archive: Optional[UploadFile] = File(None, description="Zip archive of audio files"),
+    manifest: Optional[UploadFile] = File(None, description="Manifest of (file, topic) pairs for the archive"),
+    priority: str = Form("background", description="Priority class of every job in the batch"),
+):
+    """
+    Saves every item of the batch, queues them together so transcription can be batched,
+    and streams one NDJSON line per item as it completes. A bad item never fails the batch.
+    """
+    _check_priority(priority)
+    client_id = _client_id(request)
+
+    # --- Collect (file, topic, reader) items ---
+    items = []
+    audio_files = audio_files or []
+    if topics and len(topics) != len(audio_files):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Provide exactly one topic per audio file, or a single 'topic'.")
+    for index, upload in enumerate(audio_files):
+        items.append({"file": upload.filename, "topic": topics[index] if topics else topic, "reader": upload})
+
+    if archive is not None:
+        manifest_content = await manifest.read() if manifest is not None else None
+
+        def open_archive():
+            # Reading the central directory and the manifest is blocking disk I/O and decompression
+            zip_archive = zipfile.ZipFile(archive.file)
+            if manifest_content is not None:
+                entries = parse_manifest(manifest_content, manifest.filename or "manifest.json")
+            else:
+                entries = read_archive_manifest(zip_archive)
+            if entries is None:
+                entries = [{"file": name, "topic": ""} for name in archive_audio_members(zip_archive)]
+            return zip_archive, entries, set(zip_archive.namelist())
+
+        try:
+            zip_archive, entries, members = await asyncio.to_thread(open_archive)
+        except (zipfile.BadZipFile, ManifestError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        for entry in entries:
+            reader = None
+            if entry["file"] in members:
+                reader = AsyncBytesReader(await asyncio.to_thread(zip_archive.open, entry["file"]))
+            items.append({"file": entry["file"], "topic": entry["topic"] or topic, "reader": reader})
+
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The batch contains no audio files.")
+
+    # --- Read every item before streaming; uploads are closed once the endpoint returns ---
+    # Items are stored in the upload store rather than decoded, so a large batch waiting for
+    # queue room holds files on disk instead of every recording's samples in memory
+    for index, item in enumerate(items):
+        item["index"] = index
+        reader = item.pop("reader")
+        if not item["topic"]:
+            item["error"] = "No topic given for this file."
+            continue
+        if reader is None:
+            item["error"] = "File listed in the manifest is not in the archive."
+            continue
+        try:
+            with time_stage("ingest"):
+                ingested = await ingest_upload(reader, os.path.splitext(item["file"])[1], upload_store, spool=True)
+        except AudioRejectedError as e:
+            item["error"] = str(e)
+            continue
+        except Exception as e:
+            item["error"] = f"Could not read audio file: {e}"
+            continue
+        item["audio_hash"], item["audio"] = ingested.audio_hash, ingested.audio
+        item["duration"], item["on_disk"] = ingested.duration, ingested.on_disk
+        item["unique_id"] = str(uuid.uuid4())
+        cached = score_cache.get(score_cache_key(item["audio_hash"], item["topic"]))
+        if cached is not None:
+            create_job(item["unique_id"], status=COMPLETED, topic=item["topic"], scores=cached["scores"],
+                       transcription=cached["transcription"])
+            item["cached"] = True
+            del item["audio"]
+        else:
+            create_job(item["unique_id"], status=QUEUED, topic=item["topic"])
+            if ingested.on_disk:
+                upload_store.acquire(item["audio"])
+
+    batch_id = str(uuid.uuid4())
+    events: asyncio.Queue = asyncio.Queue()
+    # The event loop only keeps weak references to tasks, so the reporters are held here
+    report_tasks = set()
+
+    async def report_when_done(item: dict, job: Job):
+        await job.done
+        await events.put(item)
+
+    async def submit_items():
+        # Waits for queue room instead of rejecting, so large batches are drained progressively
+        for position, item in enumerate(items):
+            if item.get("error") or item.get("cached"):
+                await events.put(item)
+                continue
+            job = Job(item["unique_id"], item["audio"], item["topic"], audio_hash=item["audio_hash"],
+                      duration=item["duration"], priority=priority, client_id=client_id)
+            try:
+                await job_queue.submit_wait(job)
+            except AdmissionRejectedError as e:
+                update_job(item["unique_id"], status=FAILED, error=str(e))
+                if item["on_disk"]:
+                    upload_store.release(job.audio_file)
+                item["error"] = str(e)
+                await events.put(item)
+                continue
+            except asyncio.CancelledError:
+                # The client went away: items that never reached the queue will not run
+                for pending in items[position:]:
+                    if not (pending.get("error") or pending.get("cached")):
+                        update_job(pending["unique_id"], status=FAILED,
+                                   error="Batch request closed before the item was queued.")
+                        if pending["on_disk"]:
+                            upload_store.release(pending["audio"])
+                raise
+            del item["audio"]
+            task = asyncio.create_task(report_when_done(item, job))
+            report_tasks.add(task)
+            task.add_done_callback(report_tasks.discard)
+
+    async def stream_results():
+        started = time.monotonic()
+        yield json.dumps({"type": "accepted", "batch_id": batch_id, "total": len(items), "items": [
+            {"index": item["index"], "file": item["file"], "unique_id": item.get("unique_id")} for item in items
+        ]}) + "\n"
+
+        submitter = asyncio.create_task(submit_items())
+        counts = {COMPLETED: 0, FAILED: 0}
+        try:
+            for reported in range(1, len(items) + 1):
+                line = _batch_item_result(await events.get())
+                counts[COMPLETED if line["status"] == COMPLETED else FAILED] += 1
+                line["progress"] = {"done": reported, "total": len(items)}
+                yield json.dumps(line) + "\n"
+            await submitter
+        finally:
+            # On a client disconnect, stop queuing items; queued jobs still run to completion
+            submitter.cancel()
+            for task in list(report_tasks):
+                task.cancel()
+
+        yield json.dumps({"type": "summary", "batch_id": batch_id, "total": len(items),
+                          "completed": counts[COMPLETED], "failed": counts[FAILED],
+                          "elapsed_sec": round(time.monotonic() - started, 3)}) + "\n"
+        await asyncio.get_running_loop().run_in_executor(None, upload_store.cleanup)
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
 @router.get("/results/{unique_id}", summary="Retrieve analysis results",
          description="Get the analysis results (fluency, vocabulary, grammar, relevancy) "
-                     "for a given unique ID. Returns 'processing' if not yet complete.")
-async def get_results(unique_id: str):
+                     "for a given unique ID. Returns 'processing' if not yet complete. "
+                     "With `wait`, the request is held open (long-poll) until the analysis "
+                     "completes or fails, or `wait` seconds pass.")
+async def get_results(
+    unique_id: str,
+    wait: float = Query(0, ge=0, le=LONG_POLL_MAX_SEC, description="Seconds to wait for completion"),
+):
     """
     Retrieves the analysis results for a given unique ID.
     """
-    if unique_id not in results_db:
+    record = result_store.get(unique_id)
+    if record is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unique ID not found.")
 
-    transcribe_status = processing_status.get(unique_id, "unknown")
+    if wait > 0 and record["status"] not in TERMINAL_STATUSES:
+        async for _ in event_broker.watch(unique_id, partial(job_snapshot, unique_id), timeout=wait):
+            pass
+        record = result_store.get(unique_id) or record
+
+    transcribe_status = record.get("status") or "unknown"
     
-    if transcribe_status == "completed":
+    if transcribe_status == COMPLETED:
         return JSONResponse(
             status_code=status.HTTP_200_OK,
             content={
-                "scores":{
-                "fluency": results_db[unique_id].get("fluency"),
-                "vocabulary": results_db[unique_id].get("vocabulary"),
-                "grammar": results_db[unique_id].get("grammar"),
-                "relevancy": results_db[unique_id].get("relevancy")
-            },
+                "scores": record.get("scores"),
             "message": "Analysis completed.",
             "unique_id": unique_id,
             }
             )
-    else:
+    elif transcribe_status == FAILED:
         return JSONResponse(
-            status_code=status.HTTP_202_ACCEPTED, # Still processing
+            status_code=status.HTTP_200_OK,
             content={
-                "status": transcribe_status,
-                "message": "Processing in progress. Please try again later.",
+                "status": FAILED,
+                "message": "Analysis failed.",
                 "unique_id": unique_id,
-                "transcription": results_db[unique_id].get("transcription") # Show transcription if available
+                "error": record.get("error"),
             }
         )
+    else:
+        content = {
+            "status": transcribe_status,
+            "message": "Processing in progress. Please try again later.",
+            "unique_id": unique_id,
+            "transcription": record.get("transcription") # Show transcription if available
+        }
+        if transcribe_status == QUEUED:
+            content["queue_position"] = job_queue.position(unique_id)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED, # Still processing
+            content=content
+        )
+
+@router.get("/events/{unique_id}", summary="Subscribe to analysis progress (Server-Sent Events)",
+         description="Stream the job's status transitions (queued, transcribing, scoring), each score "
+                     "as its scorer finishes, and the final completed/failed status. The stream ends "
+                     "once the job reaches a final status.")
+async def stream_events(unique_id: str):
+    """
+    Pushes progress events for a unique ID over Server-Sent Events.
+    """
+    if result_store.get(unique_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unique ID not found.")
+
+    async def event_stream():
+        async for event in event_broker.watch(unique_id, partial(job_snapshot, unique_id),
+                                              timeout=EVENT_STREAM_MAX_SEC, keepalive_sec=15):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/ws/{unique_id}")
+async def websocket_events(websocket: WebSocket, unique_id: str):
+    """
+    Pushes the same progress events as /events/{unique_id} as WebSocket JSON messages.
+    """
+    await websocket.accept()
+    if result_store.get(unique_id) is None:
+        await websocket.close(code=4404, reason="Unique ID not found.")
+        return
+    try:
+        async for event in event_broker.watch(unique_id, partial(job_snapshot, unique_id),
+                                              timeout=EVENT_STREAM_MAX_SEC):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+@router.websocket("/stream")
+async def stream_audio(
+    websocket: WebSocket,
+    topic: str = Query(..., description="The topic related to the audio content"),
+    encoding: str = Query("pcm_s16le", description="Sample format of the binary frames: pcm_s16le or pcm_f32le"),
+):
+    """
+    Transcribes and scores audio while it is recorded. The client sends 16 kHz mono PCM as binary
+    frames and {"type": "end"} when done. Each chunk the batch path would transcribe on its own is
+    transcribed as soon as it is complete and answered with a "partial" message; the audio after it
+    is re-transcribed every STREAM_INTERIM_SEC for "interim" messages. The "final" message carries
+    the same transcription and scores as submitting the recording to /input.
+    """
+    await websocket.accept()
+    if encoding not in STREAM_ENCODINGS:
+        await websocket.close(code=4400, reason=f"Unsupported encoding {encoding!r}.")
+        return
+
+    unique_id = str(uuid.uuid4())
+    decoder = PCMDecoder(encoding)
+    windower = StreamWindower()
+    transcript = StreamTranscript()
+    # (start second, samples, committed) windows, transcribed one after another
+    windows: asyncio.Queue = asyncio.Queue()
+
+    async def transcribe_window(samples):
+        # Batched with the chunks of concurrent jobs and streams
+        return (await asyncio.wrap_future(asr_batcher.submit(samples)))[0]
+
+    def rounded(scores):
+        return {scorer: round(score, 2) for scorer, score in scores.items()}
+
+    async def process_windows():
+        while (window := await windows.get()) is not None:
+            start, samples, committed = window
+            if not committed:
+                # Skipped when a chunk was committed after the audio was taken
+                if start != windower.chunk_start or not windows.empty():
+                    continue
+                hypothesis = await transcribe_window(samples)
+                scores = await asyncio.to_thread(transcript.preview_scores, hypothesis, start)
+                await websocket.send_json({"type": "interim",
+                                           "received_sec": round(start + len(samples) / SAMPLE_RATE, 2),
+                                           "text": hypothesis.text.strip(), "scores": rounded(scores)})
+                continue
+            hypothesis = await transcribe_window(samples)
+            await asyncio.to_thread(transcript.add, hypothesis, start)
+            await websocket.send_json({"type": "partial",
+                                       "committed_sec": round(start + len(samples) / SAMPLE_RATE, 2),
+                                       "text": hypothesis.text.strip(),
+                                       "scores": rounded(await asyncio.to_thread(transcript.partial_scores))})
+
+    worker = asyncio.create_task(process_windows())
+    try:
+        await websocket.send_json({"type": "ready", "unique_id": unique_id, "sample_rate": SAMPLE_RATE})
+        interim_at = STREAM_INTERIM_SEC
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if worker.done():
+                # Surfaces a transcription error
+                await worker
+            if message.get("text") is not None:
+                if json.loads(message["text"]).get("type") == "end":
+                    break
+                continue
+            for start, samples in windower.add(decoder.decode(message.get("bytes") or b"")):
+                await windows.put((start, samples, True))
+            if windower.duration > MAX_AUDIO_DURATION_SEC:
+                await websocket.close(code=4413, reason=f"Recording is longer than the "
+                                                        f"{MAX_AUDIO_DURATION_SEC:g} second limit.")
+                return
+            if windower.duration >= interim_at:
+                interim_at = windower.duration + STREAM_INTERIM_SEC
+                if windows.empty():
+                    await windows.put((*windower.pending_audio(), False))
+
+        if windower.total_samples == 0:
+            await websocket.close(code=4400, reason="The stream contains no audio.")
+            return
+        for start, samples in windower.finish():
+            await windows.put((start, samples, True))
+        await windows.put(None)
+        await worker
+
+        transcribed_output = [transcript.transcript()]
+        payload = transcript_payload(transcribed_output)
+        AUDIO_DURATION_SECONDS.observe(windower.duration)
+        TRANSCRIPT_WORDS.observe(len(payload["words"]))
+        # Grammar and relevancy need the whole transcript; fluency and vocabulary finish the streamed state
+        loop = asyncio.get_running_loop()
+        scores, result = await asyncio.gather(
+            asyncio.to_thread(transcript.final_scores),
+            loop.run_in_executor(executor, score_payload, payload, topic, False, ("grammar", "relevancy")))
+        scores = rounded({**scores, **result["scores"]})
+
+        create_job(unique_id, status=COMPLETED, topic=topic, scores=scores,
+                   transcription=summarize_text(payload["text"]))
+        if STORE_WORD_TIMESTAMPS:
+            result_store.put_timestamps(unique_id, compact_word_timestamps(transcribed_output[0].timestamp['word']))
+        await websocket.send_json({"type": "final", "unique_id": unique_id, "transcription": payload["text"],
+                                   "scores": scores})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Stream {unique_id} failed: {e}")
+        await websocket.close(code=1011, reason="Transcription failed.")
+    finally:
+        worker.cancel()
+
+
+@router.get("/results/{unique_id}/timestamps", summary="Retrieve word timestamps",
+         description="Get the [word, start, end] timestamps of a transcription. "
+                     "Only available when the server keeps word timestamps.")
+async def get_word_timestamps(unique_id: str):
+    """
+    Retrieves the stored word timestamps for a given unique ID.
+    """
+    words = result_store.get_timestamps(unique_id)
+    if words is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No timestamps stored for this unique ID.")
+    return {"unique_id": unique_id, "words": words}
+
+@router.get("/results/{unique_id}/profile", summary="Retrieve a job profile",
+         description="Get the profiler report of each pipeline stage of a job submitted with `profile=1`. "
+                     "Only available when the server enables profiling.")
+async def get_profile(unique_id: str):
+    """
+    Retrieves the per-stage profiler reports kept for a given unique ID, naming the profiler
+    that produced them: pyinstrument (sampling) or, when it is not installed, cProfile (tracing).
+    """
+    reports = profile_reports.get(unique_id)
+    if reports is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile kept for this unique ID.")
+    return {"unique_id": unique_id, "profiler": PROFILER, "stages": reports}
+
+@router.get("/models", summary="Model status",
+         description="Report whether each shared model is cold, loading, warm or failed, "
+                     "and how long it took to load.")
+async def get_model_status():
+    """
+    Returns the lifecycle state of the models loaded by this worker.
+    """
+    return model_status()
+
+@router.get("/cache", summary="Cache statistics",
+         description="Report entries, hits and misses of the caches used by the scorers.")
+async def get_cache_stats():
+    """
+    Returns hit/miss counts of the scoring caches in this worker.
+    """
+    return cache_stats()
 
 @router.get("/", include_in_schema=False)
 async def root():
     return {"message": "Welcome to the Audio Analysis API. Go to /docs for Swagger UI."}
+
+@ops_router.get("/metrics", summary="Prometheus metrics",
+             description="Stage latencies, input size histograms, queue depth, executor saturation "
+                         "and cache hit rates in the Prometheus text format.")
+async def get_metrics():
+    """
+    Returns this worker's metrics in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,206 @@
+import os
+import io
+import shutil
+import asyncio
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Union
+
+import numpy as np
+
+from segmentation import SAMPLE_RATE, to_mono_16k
+from transcribe import audio_duration_seconds
+
+# --- Configuration ---
+# Uploads larger than this are rejected while they stream in
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 200 * 1024 ** 2))
+# Recordings longer than this are rejected as soon as that much audio has been decoded
+MAX_AUDIO_DURATION_SEC = float(os.environ.get("MAX_AUDIO_DURATION_SEC", 3600))
+# Store uploads in UPLOAD_DIRECTORY and let Nemo decode the file, instead of decoding them in memory
+UPLOAD_SPOOL_TO_DISK = os.environ.get("UPLOAD_SPOOL_TO_DISK", "0") == "1"
+# Decoder used for in-memory ingestion; without ffmpeg, soundfile decodes the buffered upload
+FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Read in 1MB chunks
+# Containers whose index may sit at the end of the file, so ffmpeg cannot decode them from a pipe
+SEEKABLE_CONTAINERS = {".m4a", ".mp4", ".mov", ".3gp"}
+
+
+class AudioRejectedError(ValueError):
+    """
+    Raised when an upload cannot be accepted for transcription.
+    """
+
+    status_code = 400
+
+
+class AudioTooLargeError(AudioRejectedError):
+    """
+    Raised when an upload exceeds MAX_UPLOAD_BYTES or MAX_AUDIO_DURATION_SEC.
+    """
+
+    status_code = 413
+
+
+class AudioDecodeError(AudioRejectedError):
+    """
+    Raised when an upload is not audio the decoder can read.
+    """
+
+
+@dataclass
+class IngestedAudio:
+    audio_hash: str
+    # 16 kHz mono float32 samples, or the stored path when uploads are spooled to disk
+    audio: Union[np.ndarray, str]
+    duration: float
+
+    @property
+    def on_disk(self) -> bool:
+        return isinstance(self.audio, str)
+
+
+class _LimitedReader:
+    """
+    Wraps an upload's async `read(n)`, hashing what passes through and raising
+    AudioTooLargeError once more than MAX_UPLOAD_BYTES have been read.
+    """
+
+    def __init__(self, upload):
+        self._upload = upload
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        contents = await self._upload.read(size)
+        self.size += len(contents)
+        if self.size > MAX_UPLOAD_BYTES:
+            raise AudioTooLargeError(f"Upload exceeds the {MAX_UPLOAD_BYTES} byte limit.")
+        self.digest.update(contents)
+        return contents
+
+
+def _too_long_error() -> AudioTooLargeError:
+    return AudioTooLargeError(f"Recording is longer than the {MAX_AUDIO_DURATION_SEC:g} second limit.")
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+async def _decode_with_ffmpeg(reader: _LimitedReader, source: str = "pipe:0") -> np.ndarray:
+    """
+    Decode to 16 kHz mono float32 with ffmpeg, feeding it the upload as it is read
+    (or the file `source`) and collecting the samples from its stdout.
+    """
+    max_bytes = int(MAX_AUDIO_DURATION_SEC * SAMPLE_RATE) * 4
+    process = await asyncio.create_subprocess_exec(
+        FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", source,
+        "-f", "f32le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+        stdin=asyncio.subprocess.PIPE if source == "pipe:0" else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+    samples = bytearray()
+
+    async def feed_input():
+        try:
+            while contents := await reader.read(UPLOAD_CHUNK_SIZE):
+                process.stdin.write(contents)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            # ffmpeg gave up on the input; its exit status and stderr say why
+            pass
+        finally:
+            process.stdin.close()
+
+    async def read_output():
+        while contents := await process.stdout.read(UPLOAD_CHUNK_SIZE):
+            samples.extend(contents)
+            if len(samples) > max_bytes:
+                raise _too_long_error()
+
+    tasks = [asyncio.ensure_future(read_output()), asyncio.ensure_future(process.stderr.read())]
+    if source == "pipe:0":
+        tasks.append(asyncio.ensure_future(feed_input()))
+    try:
+        _, stderr = (await asyncio.gather(*tasks))[:2]
+        return_code = await process.wait()
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if process.returncode is None:
+            process.kill()
+        # The process only counts as finished once its unread output is drained
+        await process.communicate()
+        raise
+
+    if return_code != 0:
+        message = stderr.decode(errors="replace").strip().splitlines()
+        raise AudioDecodeError(f"Could not decode audio: {message[-1] if message else f'ffmpeg exited {return_code}'}")
+    usable = len(samples) - len(samples) % 4
+    return np.frombuffer(samples, dtype="<f4", count=usable // 4).astype(np.float32, copy=False)
+
+
+async def _decode_with_ffmpeg_from_file(reader: _LimitedReader, extension: str) -> np.ndarray:
+    """
+    Containers like MP4 need a seekable input: stream the upload to a temporary
+    file, decode it, and remove the file straight away.
+    """
+    handle, temp_path = tempfile.mkstemp(suffix=extension)
+    try:
+        with os.fdopen(handle, "wb") as f:
+            while contents := await reader.read(UPLOAD_CHUNK_SIZE):
+                await asyncio.to_thread(f.write, contents)
+        return await _decode_with_ffmpeg(reader, source=temp_path)
+    finally:
+        os.remove(temp_path)
+
+
+def _decode_with_soundfile(contents: bytes) -> np.ndarray:
+    import soundfile
+
+    buffer = io.BytesIO(contents)
+    try:
+        info = soundfile.info(buffer)
+        if info.duration > MAX_AUDIO_DURATION_SEC:
+            raise _too_long_error()
+        buffer.seek(0)
+        audio, samplerate = soundfile.read(buffer, dtype="float32", always_2d=True)
+    except RuntimeError as e:
+        # libsndfile messages start with the repr of the buffer
+        raise AudioDecodeError(f"Could not decode audio: {str(e).rsplit(': ', 1)[-1]}") from None
+    return to_mono_16k(audio, samplerate)
+
+
+async def _decode_upload(reader: _LimitedReader, extension: str) -> np.ndarray:
+    if ffmpeg_available():
+        if extension.lower() in SEEKABLE_CONTAINERS:
+            return await _decode_with_ffmpeg_from_file(reader, extension)
+        return await _decode_with_ffmpeg(reader)
+
+    chunks = []
+    while contents := await reader.read(UPLOAD_CHUNK_SIZE):
+        chunks.append(contents)
+    return await asyncio.to_thread(_decode_with_soundfile, b"".join(chunks))
+
+
+async def ingest_upload(upload: Any, extension: str, upload_store, spool: bool = False) -> IngestedAudio:
+    """
+    Read an upload, enforcing the size and duration limits as it streams in, and return its
+    content hash with either the decoded 16 kHz samples or, with `spool` or UPLOAD_SPOOL_TO_DISK,
+    the path it was stored at. Raises AudioRejectedError for uploads that cannot be accepted.
+    """
+    reader = _LimitedReader(upload)
+    if spool or UPLOAD_SPOOL_TO_DISK:
+        audio_hash, file_path = await upload_store.save(reader, extension)
+        # Zero when soundfile cannot read the format; Nemo then decodes it whole
+        duration = await asyncio.to_thread(audio_duration_seconds, str(file_path))
+        if duration > MAX_AUDIO_DURATION_SEC:
+            raise _too_long_error()
+        return IngestedAudio(audio_hash, str(file_path), duration)
+
+    audio = await _decode_upload(reader, extension)
+    if len(audio) == 0:
+        raise AudioDecodeError("The upload contains no audio.")
+    return IngestedAudio(reader.digest.hexdigest(), audio, len(audio) / SAMPLE_RATE)
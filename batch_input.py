@@ -0,0 +1,78 @@
+import io
+import csv
+import asyncio
+import json
+import zipfile
+from typing import Dict, List, Optional
+
+AUDIO_EXTENSIONS = {".wav", ".mp3", ".flac", ".ogg", ".m4a", ".opus", ".webm"}
+MANIFEST_NAMES = ("manifest.csv", "manifest.jsonl", "manifest.json")
+
+
+class ManifestError(ValueError):
+    """
+    Raised when a batch manifest cannot be parsed.
+    """
+
+
+class AsyncBytesReader:
+    """
+    Gives an in-memory or archive member file the async `read(n)` of an UploadFile.
+    Reads run in a thread, since archive members are decompressed as they are read.
+    """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.to_thread(self._fileobj.read, size)
+
+
+def parse_manifest(content: bytes, filename: str) -> List[Dict[str, str]]:
+    """
+    Parse (file, topic) pairs from a CSV (with a header row), JSON lines or JSON list manifest.
+    """
+    try:
+        text = content.decode("utf-8-sig")
+        if filename.endswith(".csv"):
+            rows = list(csv.DictReader(io.StringIO(text)))
+        elif filename.endswith(".jsonl"):
+            rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+        else:
+            rows = json.loads(text)
+    except (ValueError, csv.Error) as e:
+        raise ManifestError(f"Could not parse manifest {filename}: {e}") from None
+    if not isinstance(rows, list):
+        raise ManifestError(f"Manifest {filename} must be a list of entries.")
+
+    entries = []
+    for row_number, row in enumerate(rows, start=1):
+        if not isinstance(row, dict) or not row.get("file"):
+            raise ManifestError(f"Manifest entry {row_number} has no 'file' field.")
+        entries.append({"file": str(row["file"]).strip(), "topic": (row.get("topic") or "").strip()})
+    return entries
+
+
+def read_archive_manifest(archive: zipfile.ZipFile) -> Optional[List[Dict[str, str]]]:
+    """
+    Return the entries of a manifest stored at the root of the archive, if any.
+    """
+    names = set(archive.namelist())
+    for manifest_name in MANIFEST_NAMES:
+        if manifest_name in names:
+            return parse_manifest(archive.read(manifest_name), manifest_name)
+    return None
+
+
+def archive_audio_members(archive: zipfile.ZipFile) -> List[str]:
+    """
+    List the audio files in an archive, in archive order, skipping directories and metadata.
+    """
+    members = []
+    for info in archive.infolist():
+        name = info.filename
+        if info.is_dir() or name.startswith("__MACOSX/") or name.rsplit("/", 1)[-1].startswith("."):
+            continue
+        if any(name.lower().endswith(extension) for extension in AUDIO_EXTENSIONS):
+            members.append(name)
+    return members
@@ -0,0 +1,303 @@
+"""
+Offline batch scorer: runs transcription and the four scorers over a directory or a
+manifest of recordings in a process pool, without going through the API.
+
+    python batch_score.py recordings/ --topic "My hometown" -o results.jsonl
+    python batch_score.py manifest.csv -o results.parquet --workers 8 --save-transcripts
+    python batch_score.py results.jsonl --rescore -o rescored.jsonl
+
+Results are appended as they complete, so an interrupted run resumes where it stopped
+when started again with the same output. Files that failed are tried again on resume;
+a later row for the same id supersedes the earlier one.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+from batch_input import AUDIO_EXTENSIONS, ManifestError, parse_manifest
+
+# Rows buffered before a Parquet part file is written
+PARQUET_ROWS_PER_PART = 500
+# Rough memory one worker takes with its own Parakeet, embedding model and LanguageTool JVMs
+WORKER_MEMORY_GB = 6
+
+
+# --- Inputs ---
+def load_items(input_path, default_topic, rescore):
+    """
+    Build the work items from a directory, a CSV/JSONL manifest or, in rescore mode,
+    a previous results JSONL that contains transcripts.
+    """
+    path = Path(input_path)
+    if rescore:
+        # Keyed by id, so the last row written for a recording wins
+        items = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if row.get("transcript") is None:
+                    continue
+                items[row["id"]] = {"id": row["id"], "file": row.get("file"),
+                                    "topic": row.get("topic") or default_topic,
+                                    "audio_sec": row.get("audio_sec"), "transcript": row["transcript"]}
+        return list(items.values())
+
+    if path.is_dir():
+        files = sorted(p for p in path.rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS)
+        return [{"id": str(p.relative_to(path)), "file": str(p), "topic": default_topic} for p in files]
+
+    entries = parse_manifest(path.read_bytes(), path.name)
+    # A recording may be listed once per topic, so the id is the (file, topic) pair;
+    # rows repeating the same pair are scored once
+    items = {}
+    for entry in entries:
+        audio_path = Path(entry["file"])
+        if not audio_path.is_absolute():
+            audio_path = path.parent / audio_path
+        topic = entry["topic"] or default_topic
+        item_id = f"{entry['file']}|{topic}"
+        items.setdefault(item_id, {"id": item_id, "file": str(audio_path), "topic": topic})
+    return list(items.values())
+
+
+# --- Outputs ---
+class JsonlWriter:
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def done_ids(self):
+        """
+        Ids whose latest row is completed; failed files are tried again.
+        """
+        statuses = {}
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    statuses[row["id"]] = row.get("status")
+                except (ValueError, KeyError):
+                    # A line cut short by a crash is scored again
+                    continue
+        return {item_id for item_id, status in statuses.items() if status == "completed"}
+
+    def write(self, row):
+        self._file.write(json.dumps(row) + "\n")
+        # Flushed per row so the file doubles as the resume checkpoint
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """
+    Writes rows as numbered part files in a dataset directory; every part is a checkpoint.
+    All parts share one explicit schema, so a part where every row failed (and the scores
+    are null) still reads together with the others. Needs the optional pyarrow package.
+    """
+
+    def __init__(self, path):
+        import pyarrow
+        import pyarrow.parquet
+
+        self._parquet = pyarrow.parquet
+        self._table_from_rows = pyarrow.Table.from_pylist
+        self.schema = pyarrow.schema([
+            ("id", pyarrow.string()), ("file", pyarrow.string()), ("topic", pyarrow.string()),
+            ("status", pyarrow.string()), ("error", pyarrow.string()), ("audio_sec", pyarrow.float64()),
+            ("fluency", pyarrow.float64()), ("vocabulary", pyarrow.float64()), ("grammar", pyarrow.float64()),
+            ("relevancy", pyarrow.float64()), ("transcript", pyarrow.string()), ("elapsed_sec", pyarrow.float64()),
+        ])
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._rows = []
+        self._next_part = len(list(self.path.glob("part-*.parquet")))
+
+    def done_ids(self):
+        """
+        Ids whose latest row is completed; failed files are tried again.
+        """
+        statuses = {}
+        for part in sorted(self.path.glob("part-*.parquet")):
+            table = self._parquet.read_table(part, columns=["id", "status"])
+            statuses.update(zip(table.column("id").to_pylist(), table.column("status").to_pylist()))
+        return {item_id for item_id, status in statuses.items() if status == "completed"}
+
+    def write(self, row):
+        row = dict(row)
+        if "transcript" in row:
+            row["transcript"] = json.dumps(row["transcript"])
+        self._rows.append(row)
+        if len(self._rows) >= PARQUET_ROWS_PER_PART:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        part_path = self.path / f"part-{self._next_part:05d}.parquet"
+        self._parquet.write_table(self._table_from_rows(self._rows, schema=self.schema), part_path)
+        self._next_part += 1
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def open_writer(output_path):
+    if str(output_path).endswith(".parquet"):
+        return ParquetWriter(output_path)
+    Path(output_path).touch()
+    return JsonlWriter(output_path)
+
+
+# --- Worker process ---
+_save_transcripts = False
+
+
+def _init_worker(rescore, save_transcripts):
+    """
+    Load models once per worker process instead of once per file.
+    """
+    global _save_transcripts
+    _save_transcripts = save_transcripts
+
+    from model_registry import warm_up
+    from analysis import NLTK_REGISTRY_KEY
+    from grammar_score import LANGUAGE_TOOL_REGISTRY_KEY
+    from relevancy_score import EMBEDDING_REGISTRY_KEY
+    from transcribe import ASR_REGISTRY_KEY
+
+    names = [NLTK_REGISTRY_KEY, LANGUAGE_TOOL_REGISTRY_KEY, EMBEDDING_REGISTRY_KEY]
+    if not rescore:
+        names.append(ASR_REGISTRY_KEY)
+    warm_up(names)
+
+
+def _transcript_from_saved(saved):
+    from segmentation import Transcript
+
+    words = [{"word": word, "start": start, "end": end} for word, start, end in saved.get("words", [])]
+    return [Transcript(text=saved["text"], timestamp={"word": words})]
+
+
+def score_item(item):
+    """
+    Transcribe (unless a saved transcript is given) and score one recording.
+    """
+    from analysis import analyze_transcript
+    from fluency_score import calculate_fluency_score
+    from vocabulary_score import calculate_vocabulary_score
+    from grammar_score import calculate_grammar_score
+    from relevancy_score import calculate_relevancy_score
+    from result_store import compact_word_timestamps
+
+    started = time.perf_counter()
+    row = {"id": item["id"], "file": item["file"], "topic": item["topic"], "status": "completed",
+           "error": None, "audio_sec": item.get("audio_sec")}
+    try:
+        if not item["topic"]:
+            raise ValueError("No topic given for this file.")
+        if item.get("transcript") is not None:
+            transcribed_output = _transcript_from_saved(item["transcript"])
+        else:
+            from transcribe import transcribe_audio, audio_duration_seconds
+
+            row["audio_sec"] = round(audio_duration_seconds(item["file"]), 3)
+            transcribed_output = transcribe_audio(item["file"])
+
+        document = analyze_transcript(transcribed_output)
+        row["fluency"] = round(calculate_fluency_score(document), 2)
+        row["vocabulary"] = round(calculate_vocabulary_score(document), 2)
+        row["grammar"] = round(calculate_grammar_score(document), 2)
+        row["relevancy"] = round(calculate_relevancy_score(document, item["topic"]), 2)
+
+        if _save_transcripts or item.get("transcript") is not None:
+            row["transcript"] = item.get("transcript") or {
+                "text": transcribed_output[0].text,
+                "words": compact_word_timestamps(transcribed_output[0].timestamp['word']),
+            }
+    except Exception as e:
+        row["status"] = "failed"
+        row["error"] = str(e)
+    row["elapsed_sec"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+# --- Driver ---
+def default_workers():
+    try:
+        memory_gb = os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return 2
+    return max(1, min(os.cpu_count() or 1, int(memory_gb // WORKER_MEMORY_GB)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Transcribe and score recordings offline in a process pool.")
+    parser.add_argument("input", help="Directory of audio files, a CSV/JSONL/JSON manifest of (file, topic), "
+                                      "or with --rescore a previous results JSONL holding transcripts")
+    parser.add_argument("-o", "--output", default="results.jsonl",
+                        help="Results file (.jsonl) or Parquet dataset directory (.parquet)")
+    parser.add_argument("--topic", default="", help="Topic for items that do not have their own")
+    parser.add_argument("--workers", type=int, default=default_workers(),
+                        help=f"Worker processes; each loads its own models (about {WORKER_MEMORY_GB} GB), so the "
+                             f"default is one per {WORKER_MEMORY_GB} GB of RAM, at most one per core")
+    parser.add_argument("--save-transcripts", action="store_true",
+                        help="Store text and word timestamps so the results can be rescored later")
+    parser.add_argument("--rescore", action="store_true",
+                        help="Reuse the transcripts saved in the input results file and skip ASR")
+    parser.add_argument("--report-every", type=int, default=50, help="Print throughput every N files")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        items = load_items(args.input, args.topic, args.rescore)
+    except (OSError, ManifestError) as e:
+        print(f"Could not read input {args.input}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        writer = open_writer(args.output)
+    except ImportError:
+        print("Parquet output needs pyarrow: pip install pyarrow", file=sys.stderr)
+        return 2
+    done_ids = writer.done_ids()
+    pending = [item for item in items if item["id"] not in done_ids]
+    print(f"{len(items)} items, {len(items) - len(pending)} already scored, {len(pending)} to go")
+    if not pending:
+        writer.close()
+        return 0
+
+    # Spawned workers do not inherit model threads or the LanguageTool JVM from the parent
+    context = multiprocessing.get_context("spawn")
+    started = time.perf_counter()
+    files_done = failed = 0
+    audio_sec_done = 0.0
+    try:
+        with context.Pool(processes=max(1, args.workers), initializer=_init_worker,
+                          initargs=(args.rescore, args.save_transcripts)) as pool:
+            for row in pool.imap_unordered(score_item, pending):
+                writer.write(row)
+                files_done += 1
+                failed += row["status"] != "completed"
+                audio_sec_done += row.get("audio_sec") or 0.0
+                if files_done % args.report_every == 0 or files_done == len(pending):
+                    elapsed = time.perf_counter() - started
+                    print(f"{files_done}/{len(pending)} files ({failed} failed) | "
+                          f"{files_done / elapsed:.2f} files/sec | {audio_sec_done / elapsed:.1f} audio-sec/sec")
+    finally:
+        writer.close()
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
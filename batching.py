@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and processes them in batches.
+
+    A batch is closed when `max_batch_size` items are gathered, when adding the next item
+    would push the summed `cost_fn` past `max_batch_cost`, or when `max_wait_ms` has passed
+    since the first item of the batch arrived. `process_batch` receives the list of items
+    and must return one result per item, in the same order.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 8,
+                 max_wait_ms: float = 50, max_batch_cost: Optional[float] = None,
+                 cost_fn: Optional[Callable[[Any], float]] = None, name: str = "batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_sec = max(0.0, max_wait_ms / 1000)
+        self.max_batch_cost = max_batch_cost
+        self.cost_fn = cost_fn
+        self.name = name
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._carry_over: Optional[tuple] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Queue an item and return a Future that resolves to its individual result.
+        """
+        self._ensure_started()
+        future: Future = Future()
+        cost = self.cost_fn(item) if self.cost_fn else 0.0
+        self._queue.put((item, cost, future))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _next_batch(self) -> List[tuple]:
+        # Block until the first item of the batch is available
+        first = self._carry_over if self._carry_over is not None else self._queue.get()
+        self._carry_over = None
+
+        batch = [first]
+        batch_cost = first[1]
+        deadline = time.monotonic() + self.max_wait_sec
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if self.max_batch_cost is not None and batch_cost + entry[1] > self.max_batch_cost:
+                # Too big for this batch, it opens the next one instead
+                self._carry_over = entry
+                break
+            batch.append(entry)
+            batch_cost += entry[1]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            items = [item for item, _, _ in batch]
+            try:
+                results = self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
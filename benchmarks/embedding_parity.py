@@ -0,0 +1,138 @@
+"""
+Compare the embedding backends of the relevancy scorer: score parity with the PyTorch
+model, encode latency and the memory taken by the loaded model.
+
+    python benchmarks/embedding_parity.py                              # torch vs onnx-int8
+    python benchmarks/embedding_parity.py --backends torch onnx onnx-int8 --tolerance 0.25
+
+Each backend runs in its own process so its memory is measured in isolation. The first
+backend is the reference; exits with status 1 when another backend's relevancy score
+differs from it by more than the tolerance on any fixture.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+
+BENCHMARK_DIRECTORY = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIRECTORY.parent))
+
+from fixtures import RELEVANCY_FIXTURES, make_transcript  # noqa: E402
+from run_benchmarks import BENCHMARK_TOPIC, percentiles  # noqa: E402
+
+DEFAULT_BACKENDS = ("torch", "onnx-int8")
+
+
+def fixture_pairs():
+    # The hand-written pairs, plus long transcriptions that hit the model's sequence limit
+    pairs = [(topic, text) for topic, text in RELEVANCY_FIXTURES]
+    pairs += [(BENCHMARK_TOPIC, make_transcript(size)[0].text) for size in (100, 1000)]
+    return pairs
+
+
+def measure_backend(repeats):
+    """
+    Runs in the child process, with EMBEDDING_BACKEND already set in its environment.
+    """
+    from analysis import NLTK_REGISTRY_KEY
+    from model_registry import get_model
+    from relevancy_score import EMBEDDING_REGISTRY_KEY, _encode_batch, calculate_relevancy_score
+    from segmentation import Transcript
+
+    get_model(NLTK_REGISTRY_KEY)
+    # ru_maxrss is in KiB on Linux; the growth while loading approximates the model's footprint
+    rss_before_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    load_start = time.perf_counter()
+    get_model(EMBEDDING_REGISTRY_KEY)
+    load_sec = time.perf_counter() - load_start
+    model_rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before_kib
+
+    pairs = fixture_pairs()
+    scores = [calculate_relevancy_score([Transcript(text=text)], topic) for topic, text in pairs]
+
+    texts = [text for _, text in pairs]
+    single_ms, batch_ms = [], []
+    for _ in range(repeats):
+        for text in texts:
+            start = time.perf_counter()
+            _encode_batch([text])
+            single_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        _encode_batch(texts)
+        batch_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "scores": scores,
+        "load_sec": round(load_sec, 2),
+        "model_rss_mib": round(model_rss_kib / 1024, 1),
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "encode_single": percentiles(single_ms),
+        "encode_batch": percentiles(batch_ms),
+    }
+
+
+def run_backend(backend, repeats):
+    environment = {**os.environ, "EMBEDDING_BACKEND": backend}
+    completed = subprocess.run([sys.executable, __file__, "--measure", "--repeats", str(repeats)],
+                               env=environment, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Backend {backend} failed:\n{completed.stderr}")
+    # The measurements are the last line; model loading may print before it
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare relevancy embedding backends.")
+    parser.add_argument("--backends", nargs="+", default=list(DEFAULT_BACKENDS),
+                        help="Backends to compare; the first is the reference")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Largest allowed relevancy score difference (0-10 scale) from the reference")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed encode runs per fixture")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument("--measure", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.measure:
+        print(json.dumps(measure_backend(args.repeats)))
+        return 0
+
+    results = {}
+    for backend in args.backends:
+        result = results[backend] = run_backend(backend, args.repeats)
+        print(f"{backend:>10} | model {result['model_rss_mib']:>7.1f} MiB | load {result['load_sec']:>6.2f} s | "
+              f"encode p50 {result['encode_single']['p50_ms']:>8.2f} ms | "
+              f"batch of {len(result['scores'])} p50 {result['encode_batch']['p50_ms']:>8.2f} ms")
+
+    reference_backend = args.backends[0]
+    reference = results[reference_backend]["scores"]
+    failures = []
+    for backend in args.backends[1:]:
+        differences = [abs(score - expected) for score, expected in zip(results[backend]["scores"], reference)]
+        results[backend]["max_score_difference"] = round(max(differences), 3)
+        print(f"{backend} vs {reference_backend}: max relevancy difference {max(differences):.3f} "
+              f"(tolerance {args.tolerance})")
+        for index, difference in enumerate(differences):
+            if difference > args.tolerance:
+                failures.append(f"{backend} fixture {index}: {results[backend]['scores'][index]} "
+                                f"vs {reference[index]}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if failures:
+        print(f"{len(failures)} fixture(s) outside the tolerance:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("All backends within tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
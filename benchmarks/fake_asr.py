@@ -0,0 +1,39 @@
+"""
+Stand-in for the Parakeet model, so the API can be benchmarked end to end without a GPU.
+"""
+import time
+
+import model_registry
+from transcribe import ASR_REGISTRY_KEY
+
+from fixtures import make_transcript
+
+
+class FakeASRModel:
+    """
+    Answers every transcribe() call with a synthetic transcription after a delay that
+    grows with the batch size, like a batched GPU forward pass.
+    """
+
+    def __init__(self, num_words=300, base_latency_ms=80.0, per_item_latency_ms=10.0):
+        self.num_words = num_words
+        self.base_latency_ms = base_latency_ms
+        self.per_item_latency_ms = per_item_latency_ms
+        self.calls = 0
+        self.items = 0
+
+    def transcribe(self, audio_files, batch_size=1, timestamps=True, **kwargs):
+        self.calls += 1
+        self.items += len(audio_files)
+        time.sleep((self.base_latency_ms + self.per_item_latency_ms * len(audio_files)) / 1000)
+        return [make_transcript(self.num_words, seed=self.items + index)[0] for index in range(len(audio_files))]
+
+
+def install_fake_asr(model):
+    """
+    Make the model registry hand out `model` instead of loading Parakeet.
+    """
+    handle = model_registry.ModelHandle(ASR_REGISTRY_KEY, lambda: model)
+    model_registry._models[ASR_REGISTRY_KEY] = handle
+    handle.get()
+    return handle
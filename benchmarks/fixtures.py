@@ -0,0 +1,116 @@
+"""
+Synthetic transcriptions shaped like Nemo Parakeet output (text plus timestamp['word']),
+used to benchmark the scorers without audio or an ASR model, and small WAV uploads.
+"""
+import io
+import wave
+import random
+
+import numpy as np
+
+from segmentation import Transcript
+
+FIXTURE_SIZES = (10, 100, 1000, 5000, 20000)
+
+COMMON_WORDS = (
+    "the a and to of in it is was i you that we he she they my our this with for on at "
+    "but so have had be been are were go went get got make made like know think see said "
+    "very really just then there here when what because people time day year home school "
+    "family friend work city place thing way good new big small old first last long little"
+).split()
+RARER_WORDS = (
+    "neighbourhood festival architecture harbour tradition autumn cuisine commute landscape "
+    "museum volunteer curious vibrant gradually remarkable frequently community generation "
+    "memorable atmosphere opportunity challenging environment peaceful crowded historical "
+    "renovated university scholarship ambitious nostalgic surrounding agriculture boulevard"
+).split()
+FILLERS = ("um", "uh", "like", "you know")
+
+
+def make_transcript(num_words, seed=0):
+    """
+    Build a transcription of `num_words` words with sentence punctuation, occasional filled
+    pauses and hesitations, and realistic word timings. The same seed gives the same fixture.
+    """
+    rng = random.Random(f"{num_words}-{seed}")
+    words = []
+    sentence_length = 0
+    target_length = rng.randint(6, 18)
+    time_sec = rng.uniform(0.1, 0.5)
+
+    while len(words) < num_words:
+        if sentence_length > 0 and rng.random() < 0.04:
+            token = rng.choice(FILLERS)
+        elif rng.random() < 0.15:
+            token = rng.choice(RARER_WORDS)
+        else:
+            token = rng.choice(COMMON_WORDS)
+        if sentence_length == 0:
+            token = token.capitalize()
+
+        for part in token.split():
+            duration = rng.uniform(0.12, 0.25) + 0.03 * len(part)
+            words.append({"word": part, "start": round(time_sec, 3), "end": round(time_sec + duration, 3)})
+            time_sec += duration + rng.uniform(0.02, 0.15)
+        sentence_length += 1
+
+        if sentence_length >= target_length or len(words) >= num_words:
+            words[-1]["word"] += "." if rng.random() < 0.85 else "?"
+            time_sec += rng.uniform(0.3, 0.9)
+            sentence_length = 0
+            target_length = rng.randint(6, 18)
+        elif rng.random() < 0.08:
+            words[-1]["word"] += ","
+            time_sec += rng.uniform(0.2, 0.5)
+        elif rng.random() < 0.05:
+            # Hesitation mid-sentence
+            time_sec += rng.uniform(0.5, 1.5)
+
+    words = words[:num_words]
+    if not words[-1]["word"].endswith((".", "?")):
+        words[-1]["word"] += "."
+    text = " ".join(word["word"] for word in words)
+    return [Transcript(text=text, timestamp={"word": words})]
+
+
+def make_wav_bytes(duration_sec=2.0, seed=0):
+    """
+    A 16 kHz mono WAV of low-level noise; different seeds give different content (and hashes).
+    """
+    rng = np.random.default_rng(seed)
+    samples = (rng.normal(0, 0.01, int(duration_sec * 16000)) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+# (topic, transcription) pairs from clearly on-topic to off-topic, for comparing embedding backends
+RELEVANCY_FIXTURES = (
+    ("Describe the town or city where you grew up",
+     "I grew up in a small coastal town in the north. There was a harbour full of fishing boats "
+     "and every summer the whole neighbourhood came out for the festival."),
+    ("Describe the town or city where you grew up",
+     "My favourite food is probably pasta, especially with a lot of garlic and fresh tomatoes."),
+    ("Talk about a book that influenced you",
+     "Um, the book that changed how I think was a novel about a family across three generations. "
+     "I read it when I was fifteen and I still go back to it."),
+    ("Talk about a book that influenced you",
+     "Yesterday the train was late again so I walked to work, which took about forty minutes."),
+    ("What do you do to stay healthy?",
+     "I try to run three times a week and I cook at home most days, you know, lots of vegetables, "
+     "and I go to bed early when I can."),
+    ("What do you do to stay healthy?",
+     "The museum has a new exhibition on ancient pottery and the architecture of the building is remarkable."),
+    ("Describe a memorable trip",
+     "Last autumn we drove through the mountains for a week. The landscape was amazing and we stayed "
+     "in a different village every night."),
+    ("Describe a memorable trip", "Yes. No. I don't know."),
+    ("Explain the advantages of working from home",
+     "Working from home saves me the commute, so I have more time, and I can focus better without "
+     "the noise of the office, although I sometimes miss my colleagues."),
+    ("Explain the advantages of working from home", ""),
+)
@@ -0,0 +1,141 @@
+"""
+Compare the in-project lexical diversity and readability kernels used by the vocabulary
+scorer with the libraries they replace (lexicalrichness for MTLD and HD-D, textstat for
+the Flesch reading ease and Gunning fog index), for both parity and speed.
+
+    python benchmarks/lexical_parity.py
+    python benchmarks/lexical_parity.py --sizes 100 5000 --tolerance 1e-6
+
+Exits with status 1 when a kernel differs from its library by more than the tolerance
+on any fixture.
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+BENCHMARK_DIRECTORY = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIRECTORY.parent))
+
+from fixtures import FIXTURE_SIZES, RELEVANCY_FIXTURES, make_transcript  # noqa: E402
+from run_benchmarks import percentiles  # noqa: E402
+
+METRICS = ("mtld", "hdd", "flesch_reading_ease", "gunning_fog")
+
+
+def fixture_texts(sizes):
+    # Short answers, synthetic transcriptions of each size, and degenerate inputs
+    texts = [(f"relevancy-{index}", text) for index, (_, text) in enumerate(RELEVANCY_FIXTURES)]
+    texts += [(f"{size} words", make_transcript(size)[0].text) for size in sizes]
+    texts += [("empty", ""), ("one word", "Hello."), ("repeated word", "again " * 50)]
+    return texts
+
+
+def content_lemmas(text):
+    from analysis import analyze_text
+
+    document = analyze_text(text, (), (), ())
+    return [lemma for lemma, is_stop_word in zip(document.lemmas, document.stopword_mask) if not is_stop_word]
+
+
+def draws_for(lemmas):
+    # Same draw count as vocabulary_score.lexical_diversity
+    unique_words = len(set(lemmas))
+    draws = max(1, unique_words // 2)
+    return unique_words - 1 if draws >= unique_words else draws
+
+
+def library_metrics(lemmas, text):
+    import textstat
+    from lexicalrichness import LexicalRichness
+
+    lex = LexicalRichness(lemmas, preprocessor=None, tokenizer=None)
+    metrics = {}
+    for name, measure in (("mtld", lex.mtld), ("hdd", lambda: lex.hdd(draws=draws_for(lemmas)))):
+        try:
+            metrics[name] = measure()
+        except Exception:
+            metrics[name] = None
+    metrics["flesch_reading_ease"] = textstat.flesch_reading_ease(text)
+    metrics["gunning_fog"] = textstat.gunning_fog(text)
+    return metrics
+
+
+def kernel_metrics(lemmas, text):
+    import lexical_kernels
+
+    token_ids, unique_words = lexical_kernels.encode_tokens(lemmas)
+    metrics = {}
+    for name, measure in (("mtld", lambda: lexical_kernels.mtld(token_ids, unique_words)),
+                          ("hdd", lambda: lexical_kernels.hdd(token_ids, draws=draws_for(lemmas)))):
+        try:
+            metrics[name] = measure()
+        except Exception:
+            metrics[name] = None
+    metrics["flesch_reading_ease"], metrics["gunning_fog"] = lexical_kernels.readability(text)
+    return metrics
+
+
+def time_ms(fn, lemmas, texts):
+    samples = []
+    for text in texts:
+        start = time.perf_counter()
+        fn(lemmas, text)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentiles(samples)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the lexical kernels with lexicalrichness and textstat.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(FIXTURE_SIZES),
+                        help="Transcription lengths (words) to generate")
+    parser.add_argument("--tolerance", type=float, default=1e-6,
+                        help="Largest allowed absolute difference of any metric")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per fixture")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    failures = []
+    for name, text in fixture_texts(args.sizes):
+        lemmas = content_lemmas(text)
+        # textstat caches per text, so each timed run gets a text it has not seen
+        variants = [f"{text}{' ' * repeat}" for repeat in range(args.repeats + 1)]
+        expected = library_metrics(lemmas, variants[0])
+        actual = kernel_metrics(lemmas, variants[0])
+        library_ms = time_ms(library_metrics, lemmas, variants[1:])
+        kernel_ms = time_ms(kernel_metrics, lemmas, variants[1:])
+
+        differences = {}
+        for metric in METRICS:
+            if expected[metric] is None or actual[metric] is None:
+                differences[metric] = 0.0 if expected[metric] is actual[metric] else float("inf")
+            else:
+                differences[metric] = abs(actual[metric] - expected[metric])
+            if differences[metric] > args.tolerance:
+                failures.append(f"{name} {metric}: {actual[metric]} vs {expected[metric]}")
+
+        results[name] = {"library": expected, "kernels": actual, "library_latency": library_ms,
+                         "kernel_latency": kernel_ms, "max_difference": max(differences.values())}
+        speedup = library_ms["p50_ms"] / kernel_ms["p50_ms"] if kernel_ms["p50_ms"] else float("inf")
+        print(f"{name:>14} | {len(lemmas):>6} lemmas | library p50 {library_ms['p50_ms']:>9.3f} ms | "
+              f"kernels p50 {kernel_ms['p50_ms']:>8.3f} ms | x{speedup:>6.1f} | "
+              f"max difference {max(differences.values()):.2e}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if failures:
+        print(f"{len(failures)} metric(s) outside the tolerance of {args.tolerance}:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"All metrics within {args.tolerance} of lexicalrichness and textstat")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Latency, memory and throughput benchmarks for the scoring pipeline.
+
+    python benchmarks/run_benchmarks.py                     # run and compare with the baseline
+    python benchmarks/run_benchmarks.py --save-baseline     # record the current numbers
+    python benchmarks/run_benchmarks.py --sizes 10 1000 --concurrency 1 8 --skip-api
+
+Scorers are timed on synthetic transcriptions of increasing length; the API is driven
+in-process through an HTTP client with a fake ASR model. Exits with status 1 when a
+result regresses past the stored baseline by more than the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+BENCHMARK_DIRECTORY = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIRECTORY.parent))
+
+from fixtures import FIXTURE_SIZES, make_transcript, make_wav_bytes  # noqa: E402
+
+DEFAULT_BASELINE = BENCHMARK_DIRECTORY / "baseline.json"
+DEFAULT_CONCURRENCY = (1, 4, 16)
+BENCHMARK_TOPIC = "Describe the town or city where you grew up"
+# Latency differences below this are treated as timer noise when checking for regressions
+NOISE_FLOOR_MS = 1.0
+
+
+def percentiles(samples_ms):
+    return {
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 3),
+    }
+
+
+# --- Scorer benchmarks ---
+def scorer_functions():
+    from analysis import analyze_transcript
+    from fluency_score import calculate_fluency_score
+    from vocabulary_score import calculate_vocabulary_score
+    from grammar_score import calculate_grammar_score, sentence_rule_cache
+    from relevancy_score import calculate_relevancy_score
+
+    def grammar(document):
+        # Fixtures are scored repeatedly; a warm sentence cache would hide the LanguageTool cost
+        sentence_rule_cache.clear()
+        return calculate_grammar_score(document)
+
+    # The topic embedding stays cached between runs, as it does for a reused prompt
+    return {
+        "analysis": lambda document, raw: analyze_transcript(raw),
+        "fluency": lambda document, raw: calculate_fluency_score(document),
+        "vocabulary": lambda document, raw: calculate_vocabulary_score(document),
+        "grammar": lambda document, raw: grammar(document),
+        "relevancy": lambda document, raw: calculate_relevancy_score(document, BENCHMARK_TOPIC),
+    }
+
+
+def benchmark_scorers(sizes, repeats):
+    """
+    Time every scorer on every fixture size, then measure its peak Python allocation
+    in a separate traced run so tracing does not distort the timings.
+    """
+    from analysis import analyze_transcript
+
+    functions = scorer_functions()
+    results = {}
+    for size in sizes:
+        raw = make_transcript(size)
+        document = analyze_transcript(raw)
+        for name, function in functions.items():
+            function(document, raw)  # warm-up
+            samples_ms = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                function(document, raw)
+                samples_ms.append((time.perf_counter() - start) * 1000)
+
+            tracemalloc.start()
+            function(document, raw)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            result = {**percentiles(samples_ms), "peak_kib": round(peak_bytes / 1024, 1)}
+            results.setdefault(name, {})[str(size)] = result
+            print(f"{name:>10} {size:>6} words | p50 {result['p50_ms']:>9.2f} ms | "
+                  f"p95 {result['p95_ms']:>9.2f} ms | peak {result['peak_kib']:>9.1f} KiB")
+    return results
+
+
+# --- End-to-end API benchmark ---
+async def _run_client(client, num_requests, latencies_ms):
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        # Unique content per upload, so deduplication does not skip transcription or scoring
+        audio_bytes = make_wav_bytes(seed=uuid.uuid4().int)
+        response = await client.post("/audio/input", data={"topic": BENCHMARK_TOPIC},
+                                     files={"audio_file": ("bench.wav", audio_bytes, "audio/wav")})
+        response.raise_for_status()
+        unique_id = response.json()["unique_id"]
+        while True:
+            response = await client.get(f"/audio/results/{unique_id}", params={"wait": 30})
+            if response.status_code == 200:
+                break
+        if "error" in response.json():
+            raise RuntimeError(f"Benchmark job failed: {response.json()['error']}")
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+
+async def _benchmark_api(concurrency_levels, requests_per_client, asr_words):
+    import httpx
+
+    from fake_asr import FakeASRModel, install_fake_asr
+
+    fake_model = FakeASRModel(num_words=asr_words)
+    install_fake_asr(fake_model)
+    import main
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=120) as client:
+        await _run_client(client, 1, [])  # warm-up
+        for concurrency in concurrency_levels:
+            latencies_ms = []
+            calls_before, items_before = fake_model.calls, fake_model.items
+            start = time.perf_counter()
+            await asyncio.gather(*(_run_client(client, requests_per_client, latencies_ms)
+                                   for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            calls = fake_model.calls - calls_before
+            result = {
+                **percentiles(latencies_ms),
+                "throughput_rps": round(len(latencies_ms) / elapsed, 3),
+                "avg_asr_batch": round((fake_model.items - items_before) / calls, 2) if calls else 0,
+            }
+            results[str(concurrency)] = result
+            print(f"concurrency {concurrency:>3} | {result['throughput_rps']:>7.2f} req/s | "
+                  f"p50 {result['p50_ms']:>9.2f} ms | p95 {result['p95_ms']:>9.2f} ms | "
+                  f"avg ASR batch {result['avg_asr_batch']}")
+    return results
+
+
+def benchmark_api(concurrency_levels, requests_per_client, asr_words):
+    # Uploads and any SQLite store are written to a scratch directory
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch_directory:
+        os.chdir(scratch_directory)
+        try:
+            return asyncio.run(_benchmark_api(concurrency_levels, requests_per_client, asr_words))
+        finally:
+            os.chdir(working_directory)
+
+
+# --- Baseline comparison ---
+def find_regressions(current, baseline, tolerance):
+    """
+    List the results that got worse than the baseline by more than `tolerance` (a fraction).
+    """
+    regressions = []
+    for name, by_size in baseline.get("scorers", {}).items():
+        for size, expected in by_size.items():
+            measured = current.get("scorers", {}).get(name, {}).get(size)
+            if measured is None:
+                continue
+            for key in ("p50_ms", "p95_ms"):
+                if (measured[key] > expected[key] * (1 + tolerance)
+                        and measured[key] - expected[key] > NOISE_FLOOR_MS):
+                    regressions.append(f"{name} @ {size} words: {key} {expected[key]} -> {measured[key]}")
+            if measured["peak_kib"] > expected["peak_kib"] * (1 + tolerance):
+                regressions.append(f"{name} @ {size} words: peak_kib {expected['peak_kib']} -> {measured['peak_kib']}")
+
+    for concurrency, expected in baseline.get("api", {}).items():
+        measured = current.get("api", {}).get(concurrency)
+        if measured is None:
+            continue
+        if measured["throughput_rps"] < expected["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"api @ concurrency {concurrency}: throughput_rps "
+                               f"{expected['throughput_rps']} -> {measured['throughput_rps']}")
+        if measured["p95_ms"] > expected["p95_ms"] * (1 + tolerance):
+            regressions.append(f"api @ concurrency {concurrency}: p95_ms {expected['p95_ms']} -> {measured['p95_ms']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scorers and the API pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(FIXTURE_SIZES),
+                        help="Transcript lengths (words) to benchmark the scorers on")
+    parser.add_argument("--repeats", type=int, default=10, help="Timed runs per scorer and size")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY),
+                        help="Concurrent API clients to measure throughput at")
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--asr-words", type=int, default=300, help="Words in each fake ASR transcription")
+    parser.add_argument("--skip-scorers", action="store_true")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown (fraction) before a result counts as a regression")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+    if not args.skip_scorers:
+        results["scorers"] = benchmark_scorers(args.sizes, args.repeats)
+    if not args.skip_api:
+        results["api"] = benchmark_api(args.concurrency, args.requests_per_client, args.asr_words)
+    # ru_maxrss is in KiB on Linux
+    results["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"Process memory high-water mark: {results['max_rss_kib'] / 1024:.1f} MiB")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+        return 0
+
+    regressions = find_regressions(results, json.loads(baseline_path.read_text()), args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {baseline_path}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print(f"No regressions against {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
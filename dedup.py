@@ -0,0 +1,173 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import aiofiles
+
+from cache import LRUCache
+
+# --- Configuration ---
+# Transcriptions kept per audio hash (each holds the full hypothesis with timestamps)
+TRANSCRIPT_CACHE_SIZE = int(os.environ.get("TRANSCRIPT_CACHE_SIZE", 256))
+# Scores kept per (audio hash, topic)
+SCORE_CACHE_SIZE = int(os.environ.get("SCORE_CACHE_SIZE", 4096))
+# Stored uploads are evicted, least recently used first, above this total size
+UPLOAD_DIRECTORY_MAX_BYTES = int(os.environ.get("UPLOAD_DIRECTORY_MAX_BYTES", 2 * 1024 ** 3))
+# Stored uploads not used for this long are deleted (0 keeps them until the size budget is reached)
+UPLOAD_RETENTION_SEC = float(os.environ.get("UPLOAD_RETENTION_SEC", 24 * 3600))
+# Partial uploads older than this were left behind by an interrupted request
+STALE_PARTIAL_UPLOAD_SEC = 3600
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # Read in 1MB chunks
+
+transcript_cache = LRUCache(max_entries=TRANSCRIPT_CACHE_SIZE)
+score_cache = LRUCache(max_entries=SCORE_CACHE_SIZE)
+
+
+def score_cache_key(audio_hash: str, topic: str) -> Tuple[str, str]:
+    return audio_hash, " ".join(topic.lower().split())
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key: the first caller runs the coroutine and
+    everyone arriving while it is in flight awaits the same result. When the first caller
+    is cancelled, one of the waiting callers runs the coroutine in its place.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, coroutine_fn: Callable[[], Awaitable[Any]]) -> Any:
+        while (future := self._in_flight.get(key)) is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only the running caller was cancelled, not this one: take over its work
+                if not future.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await coroutine_fn()
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            # Cancelled (client disconnect, shutdown): wake the waiters so they do not hang
+            if not future.done():
+                future.cancel()
+            del self._in_flight[key]
+
+
+class UploadStore:
+    """
+    Content-addressed upload directory: each distinct recording is stored once as
+    `<sha256><ext>`, files expire after a retention period and the directory is kept
+    under a size budget. Files used by queued or running jobs are never evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = UPLOAD_DIRECTORY_MAX_BYTES,
+                 retention_sec: float = UPLOAD_RETENTION_SEC):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.retention_sec = retention_sec
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def save(self, upload, extension: str) -> Tuple[str, Path]:
+        """
+        Stream an upload to disk while hashing it. Returns the audio hash and the stored path;
+        when the same content is already stored, the new copy is discarded.
+        """
+        temp_path = self.directory / f".upload-{uuid.uuid4()}{extension}"
+        digest = hashlib.sha256()
+        try:
+            async with aiofiles.open(temp_path, 'wb') as f:
+                while contents := await upload.read(UPLOAD_CHUNK_SIZE):
+                    digest.update(contents)
+                    await f.write(contents)
+        except Exception:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+        audio_hash = digest.hexdigest()
+        file_path = self.directory / f"{audio_hash}{extension}"
+        if file_path.exists():
+            temp_path.unlink(missing_ok=True)
+            # Refresh the access time used for LRU eviction
+            os.utime(file_path)
+        else:
+            os.replace(temp_path, file_path)
+        return audio_hash, file_path
+
+    def acquire(self, file_path):
+        with self._lock:
+            key = str(file_path)
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+
+    def release(self, file_path):
+        with self._lock:
+            key = str(file_path)
+            remaining = self._in_use.get(key, 0) - 1
+            if remaining > 0:
+                self._in_use[key] = remaining
+            else:
+                self._in_use.pop(key, None)
+
+    def cleanup(self) -> int:
+        """
+        Delete expired files and stale partial uploads, then the least recently used stored
+        files until the directory fits the budget. Returns the number of files removed.
+        """
+        now = time.time()
+        entries = []
+        total_bytes = 0
+        removed = 0
+        with self._lock:
+            for entry in os.scandir(self.directory):
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                if entry.name.startswith(".upload-"):
+                    if now - stat.st_mtime > STALE_PARTIAL_UPLOAD_SEC and self._remove(entry.path):
+                        removed += 1
+                elif self.retention_sec and now - stat.st_mtime > self.retention_sec and self._remove(entry.path):
+                    removed += 1
+                else:
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total_bytes += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                if self._remove(path):
+                    total_bytes -= size
+                    removed += 1
+        return removed
+
+    def _remove(self, path: str) -> bool:
+        # Called with the lock held
+        if path in self._in_use:
+            return False
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+
+def dedup_cache_stats() -> Dict[str, Optional[Dict[str, Any]]]:
+    return {"transcripts": transcript_cache.stats(), "scores": score_cache.stats()}
@@ -1,32 +1,19 @@
-# Download the pretrained Parakeet model from NVIDIA's NeMo library
-import nemo.collections.asr as nemo_asr
+# Download the pretrained Parakeet model, the sentence embedding model, LanguageTool and
+# the NLTK data at image build time, using the same loaders as the API so the cached
+# files match what is served
+import sys
 
+from model_registry import FAILED, warm_up
+import analysis  # noqa: F401 - registers the NLTK data
+import grammar_score  # noqa: F401 - registers LanguageTool
+import relevancy_score  # noqa: F401 - registers the embedding model
+import transcribe  # noqa: F401 - registers Parakeet
 
-asr_model = nemo_asr.models.ASRModel.from_pretrained(model_name="nvidia/parakeet-tdt-0.6b-v2")
-print("Pretrained Parakeet model downloaded successfully.")
 
-from sentence_transformers import SentenceTransformer
+statuses = warm_up()
+for name, status in statuses.items():
+    print(f"{name}: {status['state']}" + (f" ({status['error']})" if status['error'] else ""))
 
-
-embedding_model = SentenceTransformer("avsolatorio/GIST-Embedding-v0", )
-
-# Download the nltk data
-import nltk
-try:
-    nltk.data.find('corpora/stopwords')
-except:
-    nltk.download('stopwords')
-try:
-    nltk.data.find('corpora/wordnet')
-except:
-    nltk.download('wordnet')
-try:
-    nltk.data.find('corpora/punkt')
-except:
-    nltk.download('punkt')
-try:
-    nltk.data.find('corpora/punkt_tab')
-except:
-    nltk.download('punkt_tab')
-
-print("NLTK data downloaded successfully.")
+if any(status['state'] == FAILED for status in statuses.values()):
+    sys.exit(1)
+print("Models and NLTK data downloaded successfully.")
@@ -0,0 +1,78 @@
+import time
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+
+from jobs import COMPLETED, FAILED
+
+TERMINAL_STATUSES = {COMPLETED, FAILED}
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe of job events, used to push progress to clients
+    instead of having them poll. Must be used from the event loop thread.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def publish(self, unique_id: str, event: Dict[str, Any]):
+        event = {"unique_id": unique_id, "time": time.time(), **event}
+        for subscriber in self._subscribers.get(unique_id, ()):
+            subscriber.put_nowait(event)
+
+    def subscribe(self, unique_id: str) -> asyncio.Queue:
+        subscriber: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(unique_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, unique_id: str, subscriber: asyncio.Queue):
+        subscribers = self._subscribers.get(unique_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            del self._subscribers[unique_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    async def watch(self, unique_id: str, snapshot: Callable[[], Optional[Dict[str, Any]]],
+                    timeout: Optional[float] = None, poll_interval: float = 1.0,
+                    keepalive_sec: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the job's current state, then every event published for it, until it reaches
+        a terminal status or `timeout` seconds pass. The snapshot is re-read every
+        `poll_interval` seconds, so progress made by another worker is still picked up.
+        With `keepalive_sec`, None is yielded after that long without an event.
+        """
+        subscriber = self.subscribe(unique_id)
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        last_status = None
+        last_yield = time.monotonic()
+        try:
+            event = snapshot()
+            while True:
+                if event is not None:
+                    if event.get("event") != "status" or event.get("status") != last_status:
+                        if event.get("event") == "status":
+                            last_status = event["status"]
+                        last_yield = time.monotonic()
+                        yield event
+                    if last_status in TERMINAL_STATUSES:
+                        return
+                if keepalive_sec is not None and time.monotonic() - last_yield >= keepalive_sec:
+                    last_yield = time.monotonic()
+                    yield None
+
+                wait = poll_interval
+                if deadline is not None:
+                    wait = min(wait, deadline - time.monotonic())
+                    if wait <= 0:
+                        return
+                try:
+                    event = await asyncio.wait_for(subscriber.get(), timeout=wait)
+                except asyncio.TimeoutError:
+                    event = snapshot()
+        finally:
+            self.unsubscribe(unique_id, subscriber)
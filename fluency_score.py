@@ -1,75 +1,57 @@
-import re
-from collections import OrderedDict
-import pandas as pd
+import numpy as np
+
+from analysis import analyze_transcript
 
 LOWER_BOUND = 0
 UPPER_BOUND = 10
 
-def add_pauses_to_df(pause_df, minimum_pause_duration, punctuation):
-    for index, row in pause_df.iterrows():
-        if row['pause'] > minimum_pause_duration:
-            pause_df.at[index, 'pause_valid'] = row['pause']
-            
-            if any(char in punctuation for char in index):
-                pause_df.at[index, 'linguistic_pause'] = row['pause']
-                pause_df.at[index, 'hesitation_pause'] = 0
-            else:
-                pause_df.at[index, 'hesitation_pause'] = row['pause']
-                pause_df.at[index, 'linguistic_pause'] = 0
-            
-        else:
-            pause_df.at[index, 'pause_valid'] = 0
-            pause_df.at[index, 'hesitation_pause'] = 0
-            pause_df.at[index, 'linguistic_pause'] = 0
-    return pause_df
-
-
-def calculate_fluency_score(transcribe_output):
+# Gaps between words shorter than this are not counted as pauses
+MINIMUM_PAUSE_DURATION = 0.2
+# A pause after a word carrying one of these characters is a linguistic (expected) pause
+PUNCTUATION = ".?!,;:-"
+
+
+def calculate_pause_metrics(words, starts, ends, num_filled_pauses):
     """
-    Calculate fluency score based on the transcribe output.
+    Compute pause and rate metrics from word start/end arrays with vectorized operations.
+    Every word is counted on its own, so repeated words are not merged.
+    """
+    num_words = len(words)
+    if num_words == 0:
+        return None
+
+    full_time_scale = float(ends[-1] - starts[0])
+
+    # Pause after each word; the last word has no following pause
+    pauses = np.zeros(num_words)
+    pauses[:-1] = starts[1:] - ends[:-1]
+
+    valid = pauses > MINIMUM_PAUSE_DURATION
+    has_punctuation = np.fromiter((any(char in PUNCTUATION for char in word) for word in words),
+                                  dtype=bool, count=num_words)
+    linguistic = valid & has_punctuation
+    hesitation = valid & ~has_punctuation
+
+    total_pause_time_sec = float(pauses[valid].sum())
+    num_total_pauses = int(np.count_nonzero(valid))
+    num_valid_pauses = int(np.count_nonzero(linguistic))
+    num_hesitation_pauses = int(np.count_nonzero(hesitation))
+
+    valid_pause_durations = float(pauses[linguistic].sum())
+    hesitation_pause_durations = float(pauses[hesitation].sum())
+
+    return pause_metrics_from_totals(num_words, full_time_scale, total_pause_time_sec, num_total_pauses,
+                                     num_valid_pauses, num_hesitation_pauses, valid_pause_durations,
+                                     hesitation_pause_durations, num_filled_pauses)
+
+
+def pause_metrics_from_totals(num_words, full_time_scale, total_pause_time_sec, num_total_pauses, num_valid_pauses,
+                              num_hesitation_pauses, valid_pause_durations, hesitation_pause_durations,
+                              num_filled_pauses):
+    """
+    Derive the averages and rates from the pause counts and durations of a transcription,
+    whether they were computed in one pass or accumulated while streaming.
     """
-    
-    fluency_score = 0
-    # Fetch Text
-    audio_text = transcribe_output[0].text
-    
-    word_timestamps = transcribe_output[0].timestamp['word']
-    
-    full_time_scale = word_timestamps[-1]['end'] - word_timestamps[0]['start']
-    sentence_length = len(word_timestamps)
-
-    pause_taken = OrderedDict()
-
-    
-    for index in range(sentence_length):
-        
-        word = word_timestamps[index]['word']
-        if index == sentence_length - 1:
-            time_taken = 0
-        else:
-            time_taken = word_timestamps[index+1]['start'] - word_timestamps[index]['end']
-        
-        word_duration = word_timestamps[index]['end'] - word_timestamps[index]['start']
-        pause_taken[word] = {'pause': time_taken, 'duration': word_duration}
-        
-    pause_df = pd.DataFrame.from_dict(pause_taken, orient='index')
-
-
-    minimum_pause_duration = 0.2
-
-    punctuation = ".?!,;:-"
-
-    pause_df = add_pauses_to_df(pause_df, minimum_pause_duration, punctuation)
-    
-    
-    total_pause_time_sec = pause_df['pause_valid'].sum()
-    num_total_pauses = len(pause_df[pause_df['pause_valid'] > 0])
-    num_valid_pauses = len(pause_df[pause_df['linguistic_pause'] > 0])
-    num_hesitation_pauses = len(pause_df[pause_df['hesitation_pause'] > 0])
-
-    valid_pause_durations = pause_df['linguistic_pause'].sum()
-    hesitation_pause_durations = pause_df['hesitation_pause'].sum()
-    
     avg_pause_duration_sec = total_pause_time_sec / num_total_pauses if num_total_pauses > 0 else 0
     avg_valid_pause_duration_sec = valid_pause_durations / num_valid_pauses if num_valid_pauses > 0 else 0
     avg_hesitation_pause_duration_sec = hesitation_pause_durations / num_hesitation_pauses if num_hesitation_pauses > 0 else 0
@@ -77,21 +59,43 @@ def calculate_fluency_score(transcribe_output):
     speaking_time_of_words = full_time_scale - total_pause_time_sec
 
     # Calculate rates
-    speech_rate_wpm = (pause_df.shape[0] / full_time_scale) * 60 if full_time_scale > 0 else 0
-    articulation_rate_wpm = (pause_df.shape[0] / speaking_time_of_words) * 60 if speaking_time_of_words > 0 else 0
+    speech_rate_wpm = (num_words / full_time_scale) * 60 if full_time_scale > 0 else 0
+    articulation_rate_wpm = (num_words / speaking_time_of_words) * 60 if speaking_time_of_words > 0 else 0
 
     pauses_per_minute = (num_total_pauses / full_time_scale) * 60 if full_time_scale > 0 else 0
     hesitation_pauses_per_minute = (num_hesitation_pauses / full_time_scale) * 60 if full_time_scale > 0 else 0
 
-    
-    # Identify filled pauses
-    filled_pauses = ["um", "uh", "ah", "err", "hmm", "like", "you know", "i mean", "so"]
+    filled_pauses_percentage = (num_filled_pauses / num_words) * 100
+
+    return {
+        "num_words": num_words,
+        "full_time_scale_sec": full_time_scale,
+        "total_pause_time_sec": total_pause_time_sec,
+        "num_total_pauses": num_total_pauses,
+        "num_valid_pauses": num_valid_pauses,
+        "num_hesitation_pauses": num_hesitation_pauses,
+        "avg_pause_duration_sec": avg_pause_duration_sec,
+        "avg_valid_pause_duration_sec": avg_valid_pause_duration_sec,
+        "avg_hesitation_pause_duration_sec": avg_hesitation_pause_duration_sec,
+        "speech_rate_wpm": speech_rate_wpm,
+        "articulation_rate_wpm": articulation_rate_wpm,
+        "pauses_per_minute": pauses_per_minute,
+        "hesitation_pauses_per_minute": hesitation_pauses_per_minute,
+        "num_filled_pauses": num_filled_pauses,
+        "filled_pauses_percentage": filled_pauses_percentage,
+    }
+
+
+def fluency_score_from_metrics(metrics):
+    """
+    Turn pause and rate metrics into the 0-10 fluency score.
+    """
+    if metrics is None:
+        return LOWER_BOUND
+
+    speech_rate_wpm = metrics["speech_rate_wpm"]
+    articulation_rate_wpm = metrics["articulation_rate_wpm"]
 
-    matching_filled_pauses = [re.findall(pause, audio_text) for pause in filled_pauses]
-    num_filled_pauses = sum(len(matches) for matches in matching_filled_pauses)
-    filled_pauses_percentage = (num_filled_pauses / pause_df.shape[0]) * 100 if pause_df.shape[0] > 0 else 0
-    
-    
     # --- Simple Fluency Score (Heuristic) ---
     fluency_score = 0
 
@@ -102,22 +106,37 @@ def calculate_fluency_score(transcribe_output):
         fluency_score += 15 # Acceptable range
     else:
         fluency_score += 5 # Too slow/fast
-    
+
     # Pause Component (fewer and shorter hesitation pauses are better)
     # Penalize for more hesitation pauses and longer average hesitation pauses
-    if num_hesitation_pauses == 0:
+    if metrics["num_hesitation_pauses"] == 0:
         fluency_score += 20
     else:
-        fluency_score += max(0, 20 - (hesitation_pauses_per_minute * 2.5) - (avg_hesitation_pause_duration_sec * 10))
-
+        fluency_score += max(0, 20 - (metrics["hesitation_pauses_per_minute"] * 2.5)
+                             - (metrics["avg_hesitation_pause_duration_sec"] * 10))
 
     # Filled Pauses Component (fewer is better)
-    fluency_score += max(0, 20 - (filled_pauses_percentage * 3))
+    fluency_score += max(0, 20 - (metrics["filled_pauses_percentage"] * 3))
 
     # Consistency (articulation rate vs. speech rate)
     if articulation_rate_wpm > speech_rate_wpm * 1.05 and articulation_rate_wpm < speech_rate_wpm * 1.5:
         fluency_score += 10 # Good balance, suggests efficient speaking between pauses
-        
+
     # Total Fluency Score with normalization and bounds
-    fluency_score = max(LOWER_BOUND, min(fluency_score/UPPER_BOUND, UPPER_BOUND))
+    return max(LOWER_BOUND, min(fluency_score/UPPER_BOUND, UPPER_BOUND))
+
+
+def calculate_fluency_score(transcribe_output, return_metrics=False):
+    """
+    Calculate fluency score based on the transcribe output (or an AnalyzedTranscript).
+    With `return_metrics=True` the intermediate pause and rate metrics are returned as well.
+    """
+    document = analyze_transcript(transcribe_output)
+
+    metrics = calculate_pause_metrics(document.words, document.word_starts, document.word_ends,
+                                      len(document.filler_matches))
+    fluency_score = fluency_score_from_metrics(metrics)
+
+    if return_metrics:
+        return fluency_score, metrics
     return fluency_score
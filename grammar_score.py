@@ -1,87 +1,182 @@
-import re
-import nltk
-from nltk.tokenize import word_tokenize
-import language_tool_python
+import os
+import queue
+import hashlib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis import analyze_transcript
+from cache import LRUCache
+from model_registry import OFFLINE_MODE, register_model, get_model
 
 LOWER_BOUND = 0
 UPPER_BOUND = 10
 
-# Download NLTK resources and assign the language tool en-US for grammar checking
-try:
-    try:
-        nltk.data.find('corpora/punkt')
-    except :
-        nltk.download('punkt')
+# --- Configuration ---
+# Number of LanguageTool servers sentences are checked on in parallel
+LANGUAGE_TOOL_POOL_SIZE = int(os.environ.get("LANGUAGE_TOOL_POOL_SIZE", 2))
+# Sentences whose LanguageTool matches are remembered
+GRAMMAR_CACHE_SIZE = int(os.environ.get("GRAMMAR_CACHE_SIZE", 20000))
+# URL of a running LanguageTool server to check against instead of starting JVMs in this process
+LANGUAGE_TOOL_SERVER = os.environ.get("LANGUAGE_TOOL_SERVER")
+
+LANGUAGE_TOOL_REGISTRY_KEY = "language_tool"
+
+# Define a simple penalty system for demonstration
+# You would need to refine this based on specific rule IDs for your use case
+PENALTY_MAP = {
+    'GRAMMAR_ERROR': 5,      # General, more severe issues
+    'TYPOGRAPHICAL_ERROR': 1, # Spelling/punctuation issues
+    'STYLE_ERROR': 2,        # Stylistic suggestions
+    'UNCATEGORIZED': 3       # Default for others
+}
+
+
+class LanguageToolPool:
+    """
+    Fixed set of LanguageTool backends; each check borrows one for its duration. With a
+    `remote_server` URL the backends are clients of that server and no JVM is started.
+    """
+
+    def __init__(self, size, language='en-US', remote_server=None):
+        import language_tool_python
+
+        self._tools = queue.Queue()
+        self.size = 0
+        for _ in range(size):
+            try:
+                self._tools.put(language_tool_python.LanguageTool(language, remote_server=remote_server))
+                self.size += 1
+            except Exception as e:
+                print(f"Error initializing language tool: {e}")
+
+    @contextmanager
+    def acquire(self):
+        tool = self._tools.get()
+        try:
+            yield tool
+        finally:
+            self._tools.put(tool)
+
+    def check(self, text):
+        with self.acquire() as tool:
+            return tool.check(text)
+
+
+def _language_tool_installed():
+    # language_tool_python keeps its LanguageTool download here (LTP_PATH overrides it)
+    download_path = os.environ.get("LTP_PATH", os.path.join(os.path.expanduser("~"), ".cache", "language_tool_python"))
+    return os.path.isdir(download_path) and any(name.startswith("LanguageTool") for name in os.listdir(download_path))
+
+
+def _load_language_tool_pool():
+    """
+    Start the LanguageTool servers, or connect to LANGUAGE_TOOL_SERVER. Only called once per
+    process by the model registry.
+    """
+    if LANGUAGE_TOOL_SERVER:
+        pool = LanguageToolPool(LANGUAGE_TOOL_POOL_SIZE, 'en-US', remote_server=LANGUAGE_TOOL_SERVER)
+    else:
+        if OFFLINE_MODE and not _language_tool_installed():
+            raise RuntimeError("LanguageTool is not installed and OFFLINE_MODE is set")
+        pool = LanguageToolPool(LANGUAGE_TOOL_POOL_SIZE, 'en-US')
+    if pool.size == 0:
+        raise RuntimeError("No LanguageTool server could be started")
+    return pool
+
+
+register_model(LANGUAGE_TOOL_REGISTRY_KEY, _load_language_tool_pool)
+
+
+def start_language_tool_server(language='en-US'):
+    """
+    Start one LanguageTool server for several worker processes and return it with its URL,
+    which the workers are given as LANGUAGE_TOOL_SERVER instead of starting servers of their own.
+    """
+    import language_tool_python
+
+    if OFFLINE_MODE and not _language_tool_installed():
+        raise RuntimeError("LanguageTool is not installed and OFFLINE_MODE is set")
+    tool = language_tool_python.LanguageTool(language)
+    # The client knows the host and free port its server was started on
+    return tool, f"http://{tool._host}:{tool._port}"
+
+
+def get_language_tool_pool():
+    """
+    Return the shared LanguageTool pool, or None when it could not be started.
+    """
     try:
-        nltk.data.find('corpora/punkt_tab')
-    except :
-        nltk.download('punkt_tab')
-except Exception as e:
-    print(f"Error downloading NLTK resources: {e}")
-    lang_tool = None
+        return get_model(LANGUAGE_TOOL_REGISTRY_KEY)
+    except Exception:
+        return None
+
+
+# Sentences of one transcript are spread over the pool from here
+_check_executor = ThreadPoolExecutor(max_workers=max(1, LANGUAGE_TOOL_POOL_SIZE))
 
-try:
-    lang_tool = language_tool_python.LanguageTool('en-US')
-except Exception as e:
-    print(f"Error initializing language tool: {e}")
-    lang_tool = None
+# Rule ids of the matches found in a sentence, keyed by the hash of the sentence text
+sentence_rule_cache = LRUCache(max_entries=GRAMMAR_CACHE_SIZE)
+
+
+def _sentence_rule_ids(sentence):
+    key = hashlib.sha1(sentence.encode("utf-8")).hexdigest()
+    rule_ids = sentence_rule_cache.get(key)
+    if rule_ids is None:
+        rule_ids = tuple(match.ruleId for match in get_model(LANGUAGE_TOOL_REGISTRY_KEY).check(sentence))
+        sentence_rule_cache.set(key, rule_ids)
+    return rule_ids
+
+
+def check_rule_ids(sentences):
+    """
+    Return the LanguageTool rule id of every match in the sentences, checking them in
+    parallel across the pool and skipping sentences that were already checked.
+    """
+    if len(sentences) <= 1:
+        return [rule_id for sentence in sentences for rule_id in _sentence_rule_ids(sentence)]
+    return [rule_id for rule_ids in _check_executor.map(_sentence_rule_ids, sentences) for rule_id in rule_ids]
+
+
+def rule_penalty(rule_id):
+    # Attempt to categorize error type
+    error_type = 'UNCATEGORIZED'
+    if 'AGREEMENT' in rule_id or 'SVA' in rule_id or 'TENSE' in rule_id or 'PRONOUN' in rule_id:
+        error_type = 'GRAMMAR_ERROR'
+    elif 'COMMA' in rule_id or 'PUNCTUATION' in rule_id or 'SPELLING' in rule_id:
+        error_type = 'TYPOGRAPHICAL_ERROR'
+    elif 'REDUNDANCY' in rule_id or 'CLARITY' in rule_id or 'WORD_CHOICE' in rule_id:
+        error_type = 'STYLE_ERROR'
+
+    return PENALTY_MAP.get(error_type, 3) # Get penalty, default 3
+
+
+def grammar_cache_stats():
+    return sentence_rule_cache.stats()
 
 
 def calculate_grammar_score(transcribe_output):
     """
-    Calculate grammar score based on the transcribe output.
+    Calculate grammar score based on the transcribe output (or an AnalyzedTranscript).
     """
     grammar_score = 0
-    
-    # Fetch Text
-    audio_text = transcribe_output[0].text
-    
-    # Removing filler words from the text to avoid classifying them as correct grammar
-    filler_word_pattern=r'\b(um|uh|ah|err|hmm|like|you know|i mean)\b'
-
-    clean_audio_text = re.sub(filler_word_pattern, '', audio_text)
-    # To Remove extra spaces
-    clean_audio_text = re.sub(r'\s+', ' ', clean_audio_text).strip()
-    
-    # Tokenize the text
-    words = word_tokenize(clean_audio_text)
-    
-    # Define a simple penalty system for demonstration
-    # You would need to refine this based on specific rule IDs for your use case
-    penalty_map = {
-        'GRAMMAR_ERROR': 5,      # General, more severe issues
-        'TYPOGRAPHICAL_ERROR': 1, # Spelling/punctuation issues
-        'STYLE_ERROR': 2,        # Stylistic suggestions
-        'UNCATEGORIZED': 3       # Default for others
-    }
-    
+
+    document = analyze_transcript(transcribe_output)
+
+    # Filler words are left out of the word count to avoid classifying them as correct grammar
+    num_words = document.grammar_token_count
+
     # Check for grammatical errors using language_tool_python
-    if lang_tool:
-        
+    if get_language_tool_pool():
+
         # Check for grammatical errors
-        match_texts = lang_tool.check(audio_text)
-        num_errors = len(match_texts)
-        
-        total_penalty = 0
-        for match in match_texts:
-            rule_id = match.ruleId
-            message = match.message
-            # Attempt to categorize error type
-            error_type = 'UNCATEGORIZED'
-            if 'AGREEMENT' in rule_id or 'SVA' in rule_id or 'TENSE' in rule_id or 'PRONOUN' in rule_id:
-                error_type = 'GRAMMAR_ERROR'
-            elif 'COMMA' in rule_id or 'PUNCTUATION' in rule_id or 'SPELLING' in rule_id:
-                error_type = 'TYPOGRAPHICAL_ERROR'
-            elif 'REDUNDANCY' in rule_id or 'CLARITY' in rule_id or 'WORD_CHOICE' in rule_id:
-                error_type = 'STYLE_ERROR'
-
-            penalty = penalty_map.get(error_type, 3) # Get penalty, default 3
-            total_penalty += penalty
-        
+        rule_ids = check_rule_ids(document.sentences)
+
+        total_penalty = sum(rule_penalty(rule_id) for rule_id in rule_ids)
+
         # Calculate grammar score based on the number of errors
-        if len(words) > 0:
+        if num_words > 0:
             # Penalize more for denser errors
-            scaled_penalty = (total_penalty / len(words)) * 50 # Adjust 50 as a sensitivity factor
+            scaled_penalty = (total_penalty / num_words) * 50 # Adjust 50 as a sensitivity factor
             grammar_score = max(LOWER_BOUND, 100 - scaled_penalty)
             grammar_score = min(UPPER_BOUND, grammar_score / 10)  # Scale to 0-10
         else:
@@ -89,5 +184,5 @@ def calculate_grammar_score(transcribe_output):
     else:
         print("Language tool not initialized. Grammar score cannot be calculated.")
         grammar_score = 0
-    
+
     return grammar_score
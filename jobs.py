@@ -0,0 +1,384 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import QUEUE_WAIT_SECONDS
+
+# --- Job states, in pipeline order ---
+QUEUED = "queued"
+TRANSCRIBING = "transcribing"
+SCORING = "scoring"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# --- Configuration ---
+# Priority classes, highest first, as name:deadline. A job whose estimated wait exceeds its
+# class deadline (seconds) is refused with 503; a deadline of 0 never refuses
+JOB_PRIORITY_CLASSES = os.environ.get("JOB_PRIORITY_CLASSES", "live:60,standard:600,background:0")
+DEFAULT_PRIORITY = os.environ.get("DEFAULT_PRIORITY", "standard")
+# Order within a class: "sjf" (shortest estimated job first) or "wfq" (weighted fair queuing across clients)
+JOB_SCHEDULING_POLICY = os.environ.get("JOB_SCHEDULING_POLICY", "sjf")
+# With sjf, each second a job waits counts as this many seconds off its estimated cost,
+# so long recordings are not starved by a stream of short ones
+SJF_AGING = float(os.environ.get("SJF_AGING", 0.5))
+# Jobs one client may have transcribing or scoring at once (0: no limit)
+CLIENT_MAX_ACTIVE_JOBS = int(os.environ.get("CLIENT_MAX_ACTIVE_JOBS", 0))
+
+# Worker seconds per second of audio assumed until jobs have been timed
+INITIAL_SEC_PER_AUDIO_SEC = 0.1
+
+
+def parse_priority_classes(spec: str) -> "OrderedDict[str, float]":
+    """
+    Parse "name:deadline,..." into an ordered {class: deadline seconds}, highest priority first.
+    """
+    classes = OrderedDict()
+    for entry in spec.split(","):
+        name, _, deadline = entry.strip().partition(":")
+        if name:
+            classes[name] = float(deadline or 0)
+    if not classes:
+        raise ValueError("JOB_PRIORITY_CLASSES must name at least one class")
+    return classes
+
+
+PRIORITY_CLASSES = parse_priority_classes(JOB_PRIORITY_CLASSES)
+
+if DEFAULT_PRIORITY not in PRIORITY_CLASSES:
+    raise ValueError(f"DEFAULT_PRIORITY {DEFAULT_PRIORITY!r} is not one of {list(PRIORITY_CLASSES)}")
+if JOB_SCHEDULING_POLICY not in ("sjf", "wfq"):
+    raise ValueError(f"JOB_SCHEDULING_POLICY must be 'sjf' or 'wfq', not {JOB_SCHEDULING_POLICY!r}")
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job cannot be accepted because the queue is at capacity.
+    """
+
+    def __init__(self, retry_after: int, message: Optional[str] = None):
+        super().__init__(message or f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionRejectedError(QueueFullError):
+    """
+    Raised when a job's estimated wait exceeds the deadline of its priority class.
+    """
+
+    def __init__(self, retry_after: int, priority: str, estimated_wait: float, deadline: float):
+        super().__init__(retry_after, f"Estimated wait of {estimated_wait:.0f}s exceeds the {deadline:g}s "
+                                      f"deadline for '{priority}' jobs, retry after {retry_after}s")
+        self.priority = priority
+        self.estimated_wait = estimated_wait
+        self.deadline = deadline
+
+
+@dataclass
+class Job:
+    job_id: str
+    audio_file: Any
+    topic: str
+    audio_hash: Optional[str] = None
+    # Profile the job's pipeline stages (only honoured when profiling is enabled)
+    profile: bool = False
+    # Scheduling: decoded audio duration (0 when unknown), priority class and the client it counts against
+    duration: float = 0.0
+    priority: str = DEFAULT_PRIORITY
+    client_id: Optional[str] = None
+    # Estimated worker seconds, set when the job is queued
+    cost: float = 0.0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Resolved once the handler has finished with the job, successfully or not
+    done: Optional[asyncio.Future] = field(default=None, repr=False)
+    # Weighted fair queuing finish tag
+    finish_tag: float = field(default=0.0, repr=False)
+
+
+class JobQueue:
+    """
+    Bounded queue of jobs drained by a fixed number of asyncio workers. Jobs of a higher
+    priority class always go first; within a class they are ordered shortest estimated job
+    first or by weighted fair queuing across clients. A client over its active-job quota is
+    skipped until one of its jobs finishes.
+
+    Job cost is estimated from the audio duration and the measured worker seconds per audio
+    second. The queue holds at most `max_queue_size` jobs, so picking the next one is a scan,
+    and at most `max_audio_bytes` of decoded in-memory audio (0: no limit); a job is always
+    accepted into an empty queue, so one recording larger than the limit can still run.
+
+    Workers are started lazily on the first submission, so the queue binds to the
+    event loop that serves the API.
+    """
+
+    def __init__(self, handler: Callable[[Job], Awaitable[None]], max_queue_size: int = 100,
+                 num_workers: int = 4, policy: str = JOB_SCHEDULING_POLICY,
+                 client_max_active: int = CLIENT_MAX_ACTIVE_JOBS, max_audio_bytes: int = 0):
+        self.handler = handler
+        self.max_queue_size = max_queue_size
+        self.max_audio_bytes = max_audio_bytes
+        self.num_workers = max(1, num_workers)
+        self.policy = policy
+        self.client_max_active = client_max_active
+
+        self._started = False
+        self._workers = []
+        # Futures of idle workers and of submitters waiting for room, resolved by _wake()
+        self._idle_workers: List[asyncio.Future] = []
+        self._room_waiters: List[asyncio.Future] = []
+        # Jobs waiting to be picked up, in arrival order
+        self._pending: "OrderedDict[str, Job]" = OrderedDict()
+        # Bytes of decoded audio held by the pending jobs
+        self._pending_audio_bytes = 0
+        # Jobs held by a worker, with when they started
+        self._running: Dict[str, Tuple[Job, float]] = {}
+        self._active_per_client: Counter = Counter()
+        # Weighted fair queuing: the last finish tag handed out per (class, client) and per class
+        self._client_finish_tags: Dict[Tuple[str, str], float] = {}
+        self._virtual_time: Dict[str, float] = {}
+        # Moving averages of the time a job holds a worker, overall and per second of audio
+        self._avg_job_sec = 5.0
+        self._sec_per_audio_sec = INITIAL_SEC_PER_AUDIO_SEC
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        self._started = True
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    def estimate_cost(self, job: Job) -> float:
+        """
+        Worker seconds the job is expected to take.
+        """
+        if job.duration > 0:
+            return job.duration * self._sec_per_audio_sec
+        return self._avg_job_sec
+
+    def _order_key(self, job: Job, now: float) -> Tuple[int, float]:
+        rank = list(PRIORITY_CLASSES).index(job.priority)
+        if self.policy == "wfq":
+            return rank, job.finish_tag
+        return rank, job.cost - SJF_AGING * (now - job.enqueued_at)
+
+    def _dispatch_order(self) -> List[Job]:
+        now = time.monotonic()
+        return sorted(self._pending.values(), key=lambda job: self._order_key(job, now))
+
+    def estimated_wait(self, job: Job) -> float:
+        """
+        Seconds until a worker would pick up `job`: the remaining work of the running jobs plus
+        the queued jobs ordered ahead of it, spread over the workers.
+        """
+        now = time.monotonic()
+        key = self._order_key(job, now)
+        running = sum(max(0.0, running_job.cost - (now - started))
+                      for running_job, started in self._running.values())
+        ahead = sum(queued.cost for queued in self._pending.values()
+                    if queued is not job and self._order_key(queued, now) <= key)
+        if len(self._running) < self.num_workers and ahead == 0:
+            return 0.0
+        return (running + ahead) / self.num_workers
+
+    def retry_after(self) -> int:
+        """
+        Rough number of seconds until a slot frees up in the queue.
+        """
+        return max(1, math.ceil(self._avg_job_sec * max(1, len(self._pending)) / self.num_workers))
+
+    def _admit(self, job: Job):
+        """
+        Estimate the job's cost and refuse it if its wait would exceed its class deadline.
+        """
+        if job.priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class {job.priority!r}; use one of {list(PRIORITY_CLASSES)}")
+        job.cost = self.estimate_cost(job)
+        deadline = PRIORITY_CLASSES[job.priority]
+        if self.policy == "wfq":
+            # Tags are only handed out once the job is admitted
+            job.finish_tag = self._next_finish_tag(job, commit=False)
+        if deadline > 0:
+            wait = self.estimated_wait(job)
+            if wait > deadline:
+                raise AdmissionRejectedError(max(1, math.ceil(wait - deadline)), job.priority, wait, deadline)
+
+    def _next_finish_tag(self, job: Job, commit: bool) -> float:
+        # Self-clocked fair queuing: a client's jobs are spaced by their cost, starting no
+        # earlier than the tag of the job last dispatched from the class
+        flow = (job.priority, job.client_id or job.job_id)
+        start = max(self._virtual_time.get(job.priority, 0.0), self._client_finish_tags.get(flow, 0.0))
+        finish_tag = start + job.cost
+        if commit:
+            self._client_finish_tags[flow] = finish_tag
+        return finish_tag
+
+    @staticmethod
+    def _audio_bytes(job: Job) -> int:
+        # Decoded samples; paths of spooled uploads hold no audio in memory
+        return getattr(job.audio_file, "nbytes", 0)
+
+    def _has_room(self, job: Job) -> bool:
+        if len(self._pending) >= self.max_queue_size:
+            return False
+        return (not self.max_audio_bytes or not self._pending
+                or self._pending_audio_bytes + self._audio_bytes(job) <= self.max_audio_bytes)
+
+    def submit(self, job: Job) -> int:
+        """
+        Enqueue a job without waiting and return its 1-based queue position. Raises
+        AdmissionRejectedError when its estimated wait exceeds its class deadline and
+        QueueFullError when the queue is at capacity, in jobs or in audio bytes.
+        """
+        self._ensure_started()
+        if not self._has_room(job):
+            raise QueueFullError(self.retry_after())
+        self._admit(job)
+        return self._enqueued(job)
+
+    async def submit_wait(self, job: Job) -> int:
+        """
+        Enqueue a job, waiting for room when the queue is full, and return its queue position.
+        Raises AdmissionRejectedError like `submit`.
+        """
+        self._ensure_started()
+        while not self._has_room(job):
+            waiter = asyncio.get_running_loop().create_future()
+            self._room_waiters.append(waiter)
+            await waiter
+        self._admit(job)
+        return self._enqueued(job)
+
+    def _enqueued(self, job: Job) -> int:
+        job.enqueued_at = time.monotonic()
+        if job.done is None:
+            job.done = asyncio.get_running_loop().create_future()
+        if self.policy == "wfq":
+            job.finish_tag = self._next_finish_tag(job, commit=True)
+        self._pending[job.job_id] = job
+        self._pending_audio_bytes += self._audio_bytes(job)
+        self._wake(self._idle_workers)
+        return self.position(job.job_id)
+
+    @staticmethod
+    def _wake(waiters: List[asyncio.Future]):
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        waiters.clear()
+
+    def position(self, job_id: str) -> Optional[int]:
+        """
+        Return the 1-based position of a job still waiting in the queue, or None.
+        """
+        if job_id not in self._pending:
+            return None
+        for index, job in enumerate(self._dispatch_order()):
+            if job.job_id == job_id:
+                return index + 1
+        return None
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def depth_by_priority(self) -> Dict[Tuple[str], int]:
+        counts = Counter(job.priority for job in self._pending.values())
+        return {(priority,): counts.get(priority, 0) for priority in PRIORITY_CLASSES}
+
+    def _take_next(self) -> Optional[Job]:
+        for job in self._dispatch_order():
+            client = job.client_id
+            if self.client_max_active and client and self._active_per_client[client] >= self.client_max_active:
+                continue
+            del self._pending[job.job_id]
+            self._pending_audio_bytes -= self._audio_bytes(job)
+            if client:
+                self._active_per_client[client] += 1
+            if self.policy == "wfq":
+                self._virtual_time[job.priority] = job.finish_tag
+            self._wake(self._room_waiters)
+            return job
+        return None
+
+    async def _worker(self):
+        while True:
+            while (job := self._take_next()) is None:
+                waiter = asyncio.get_running_loop().create_future()
+                self._idle_workers.append(waiter)
+                await waiter
+            wait = time.monotonic() - job.enqueued_at
+            QUEUE_WAIT_SECONDS.observe(wait, priority=job.priority, pool="transcription")
+            start = time.monotonic()
+            self._running[job.job_id] = (job, start)
+            try:
+                await self.handler(job)
+            except Exception as e:
+                print(f"Job {job.job_id} failed: {e}")
+            finally:
+                elapsed = time.monotonic() - start
+                self._avg_job_sec = 0.8 * self._avg_job_sec + 0.2 * elapsed
+                if job.duration > 0:
+                    self._sec_per_audio_sec = 0.8 * self._sec_per_audio_sec + 0.2 * elapsed / job.duration
+                del self._running[job.job_id]
+                if job.client_id:
+                    self._active_per_client[job.client_id] -= 1
+                    if not self._active_per_client[job.client_id]:
+                        del self._active_per_client[job.client_id]
+                if not job.done.done():
+                    job.done.set_result(None)
+                # A client quota slot may have freed up
+                self._wake(self._idle_workers)
+
+
+class PriorityGate:
+    """
+    Admits at most `slots` holders at a time. When a slot frees up it goes to the waiter of the
+    highest priority class, and within a class to the cheapest job, so queued scoring work
+    enters the executor in the same order the job queue dispatches transcription.
+    """
+
+    def __init__(self, slots: int, pool: str):
+        self.slots = max(1, slots)
+        self.pool = pool
+        self._holders = 0
+        # (class rank, cost, arrival) -> future resolved when the waiter may enter
+        self._waiters: List[Tuple[int, float, int, asyncio.Future]] = []
+        self._arrivals = itertools.count()
+
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def admit(self, job: Job):
+        start = time.monotonic()
+        if self._holders < self.slots and not self._waiters:
+            self._holders += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            rank = list(PRIORITY_CLASSES).index(job.priority)
+            heapq.heappush(self._waiters, (rank, job.cost, next(self._arrivals), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just before the cancellation
+                    self._release()
+                raise
+        QUEUE_WAIT_SECONDS.observe(time.monotonic() - start, priority=job.priority, pool=self.pool)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        # Hand the slot straight to the next live waiter, so no newcomer can take it in between
+        while self._waiters:
+            waiter = heapq.heappop(self._waiters)[-1]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._holders -= 1
@@ -0,0 +1,206 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Sequence, Tuple
+
+import numpy as np
+from scipy.special import gammaln
+
+# --- Configuration ---
+# Hypergeometric tables (one per transcript length and draw count) kept for HD-D
+HDD_TABLE_CACHE_SIZE = int(os.environ.get("HDD_TABLE_CACHE_SIZE", 256))
+# Distinct words whose syllable count and difficulty are memoized for readability
+SYLLABLE_CACHE_SIZE = int(os.environ.get("SYLLABLE_CACHE_SIZE", 200000))
+
+MTLD_THRESHOLD = 0.72  # lexicalrichness default
+
+# textstat's English settings
+READABILITY_LANGUAGE = "en_US"
+FRE_BASE = 206.835
+FRE_SENTENCE_LENGTH = 1.015
+FRE_SYLLABLES_PER_WORD = 84.6
+FOG_SYLLABLE_THRESHOLD = 3
+
+# textstat's word splitting: punctuation is dropped, apostrophes of contractions are kept
+_NONCONTRACTION_APOSTROPHE = re.compile(r"\'(?![tsd]|ve|ll|re)")
+_WORD_CHARACTER = re.compile(r"\w")
+_SENTENCE = re.compile(r"\b[^.!?]+[.!?]*", re.UNICODE)
+
+
+def encode_tokens(tokens: Sequence[str]) -> Tuple[np.ndarray, int]:
+    """
+    Map tokens to integer ids in order of first appearance. Returns the ids and the number of types.
+    """
+    ids = {}
+    encoded = np.fromiter((ids.setdefault(token, len(ids)) for token in tokens), dtype=np.int64, count=len(tokens))
+    return encoded, len(ids)
+
+
+def _mtld_pass(ids, num_types: int, threshold: float) -> float:
+    """
+    One direction of lexicalrichness' MTLD: the number of tokens per factor, a factor
+    ending wherever the running type/token ratio falls to the threshold.
+    """
+    num_tokens = len(ids)
+    # Segment in which each type was last seen, instead of a new set per segment
+    last_segment = [-1] * num_types
+    segment = 0
+    word_counter = 0
+    segment_types = 0
+    factor_count = 0
+    ttr = 1.0
+    for token in ids:
+        word_counter += 1
+        if last_segment[token] != segment:
+            last_segment[token] = segment
+            segment_types += 1
+        ttr = segment_types / word_counter
+        if ttr <= threshold:
+            word_counter = 0
+            segment_types = 0
+            segment += 1
+            factor_count += 1
+
+    # Partial factor for the last, unfinished segment
+    if word_counter > 0:
+        factor_count += (1 - ttr) / (1 - threshold)
+
+    # The ratio never fell to the threshold
+    if factor_count == 0:
+        ttr = num_types / num_tokens
+        if ttr == 1:
+            factor_count += 1
+        else:
+            factor_count += (1 - ttr) / (1 - threshold)
+    return num_tokens / factor_count
+
+
+def mtld(ids: np.ndarray, num_types: int, threshold: float = MTLD_THRESHOLD) -> float:
+    """
+    Measure of textual lexical diversity of integer-encoded tokens: the mean of the forward
+    and backward passes, as LexicalRichness.mtld computes it.
+    """
+    tokens = ids.tolist()
+    return (_mtld_pass(tokens, num_types, threshold) + _mtld_pass(tokens[::-1], num_types, threshold)) / 2
+
+
+@lru_cache(maxsize=HDD_TABLE_CACHE_SIZE)
+def _absent_probabilities(num_tokens: int, draws: int) -> np.ndarray:
+    """
+    For every frequency f in 0..num_tokens, the hypergeometric probability that a type occurring
+    f times is not among `draws` tokens drawn without replacement: C(N - f, n) / C(N, n).
+    """
+    remaining = np.arange(num_tokens, -1, -1, dtype=np.float64)  # N - f
+    probabilities = np.zeros(num_tokens + 1)
+    possible = remaining >= draws
+    log_probabilities = (gammaln(remaining[possible] + 1) - gammaln(remaining[possible] - draws + 1)
+                         + gammaln(num_tokens - draws + 1) - gammaln(num_tokens + 1))
+    probabilities[possible] = np.exp(log_probabilities)
+    probabilities.flags.writeable = False
+    return probabilities
+
+
+def hdd_from_frequencies(frequencies: np.ndarray, types_per_frequency: np.ndarray, num_tokens: int,
+                         draws: int) -> float:
+    """
+    HD-D from a frequency-of-frequency table: `types_per_frequency[i]` types occur
+    `frequencies[i]` times. Types sharing a frequency share one table lookup.
+    """
+    if num_tokens < draws:
+        raise ValueError(f"Number of draws should be less than the total sample size of {num_tokens}.")
+    if draws < 1 or isinstance(draws, float):
+        raise ValueError("Number of draws must be a positive integer.")
+    present = 1 - _absent_probabilities(num_tokens, draws)[frequencies]
+    return float(np.dot(types_per_frequency, present)) / draws
+
+
+def hdd(ids: np.ndarray, draws: int) -> float:
+    """
+    Hypergeometric distribution diversity of integer-encoded tokens, as LexicalRichness.hdd computes it.
+    """
+    types_per_frequency = np.bincount(np.bincount(ids)) if len(ids) else np.zeros(1, dtype=np.int64)
+    frequencies = np.flatnonzero(types_per_frequency)
+    return hdd_from_frequencies(frequencies, types_per_frequency[frequencies], len(ids), draws)
+
+
+@lru_cache(maxsize=1)
+def _syllable_dictionaries():
+    """
+    The CMU pronouncing dictionary (None when its NLTK data is not installed), the Pyphen
+    hyphenator it falls back to, and textstat's easy word list.
+    """
+    import importlib.resources
+    import nltk
+    from pyphen import Pyphen
+
+    try:
+        nltk.data.find("corpora/cmudict")
+        cmudict = nltk.corpus.cmudict.dict()
+    except LookupError:
+        cmudict = None
+    with importlib.resources.files("textstat").joinpath("resources/en/easy_words.txt").open() as f:
+        easy_words = frozenset(line.strip() for line in f)
+    return cmudict, Pyphen(lang=READABILITY_LANGUAGE), easy_words
+
+
+@lru_cache(maxsize=SYLLABLE_CACHE_SIZE)
+def word_syllables(word: str) -> Tuple[int, bool]:
+    """
+    Syllable count of a lowercased word and whether the Gunning fog index counts it as difficult.
+    """
+    cmudict, pyphen, easy_words = _syllable_dictionaries()
+    try:
+        syllables = sum(1 for phone in cmudict[word][0] if phone[-1].isdigit())
+    except (TypeError, IndexError, KeyError):
+        syllables = len(pyphen.positions(word)) + 1
+    return syllables, word not in easy_words and syllables >= FOG_SYLLABLE_THRESHOLD
+
+
+def _remove_punctuation(text: str) -> str:
+    # Same result as textstat's regular expressions; the characters outside \w, \s and the apostrophe
+    # are looked up among the distinct characters of the text and deleted in one translate()
+    if "'" in text:
+        text = _NONCONTRACTION_APOSTROPHE.sub("", text)
+    punctuation = [ord(char) for char in set(text)
+                   if not (char.isalnum() or char == "_" or char == "'" or char.isspace())]
+    return text.translate(dict.fromkeys(punctuation)) if punctuation else text
+
+
+def _counts_as_sentence(sentence: str) -> bool:
+    # textstat ignores sentences of two words or less; a token is a word unless it is all punctuation
+    words = 0
+    for token in sentence.split():
+        if _WORD_CHARACTER.search(token):
+            words += 1
+            if words > 2:
+                return True
+    return False
+
+
+def readability(text: str) -> Tuple[float, float]:
+    """
+    Flesch reading ease and Gunning fog index of the text, counted the way textstat counts
+    words, sentences and syllables, with each distinct word looked up once.
+    """
+    words = Counter(_remove_punctuation(text).lower().split())
+    num_words = sum(words.values())
+    if num_words == 0:
+        return 0.0, 0.0
+
+    # There is always at least one sentence
+    num_sentences = max(1, sum(1 for sentence in _SENTENCE.findall(text) if _counts_as_sentence(sentence)))
+    words_per_sentence = num_words / num_sentences
+
+    syllables = 0
+    difficult_words = 0
+    for word, count in words.items():
+        word_syllable_count, is_difficult = word_syllables(word)
+        syllables += word_syllable_count * count
+        difficult_words += is_difficult * count
+
+    syllables_per_word = syllables / num_words
+    flesch_reading_ease = 0.0 if syllables_per_word == 0 else (
+        FRE_BASE - FRE_SENTENCE_LENGTH * words_per_sentence - FRE_SYLLABLES_PER_WORD * syllables_per_word)
+    gunning_fog = 0.4 * (words_per_sentence + 100 * difficult_words / num_words)
+    return flesch_reading_ease, gunning_fog
@@ -1,15 +1,83 @@
-from fastapi import FastAPI
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, status
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 
-from api import router
+from api import router, ops_router, result_store, executor, upload_store
+from metrics import process_memory
+from model_registry import FAILED, WARM, OFFLINE_MODE, all_warm, model_status, warm_up
+from relevancy_score import TOPIC_BANK_FILE, load_topic_bank, preload_topics
+from scoring import SCORING_BACKEND, local_model_names, warm_up_scoring_workers
+
+# Load every model in the background when the worker starts instead of on first use
+PRELOAD_MODELS = os.environ.get("PRELOAD_MODELS", "1") == "1"
+# How often expired and over-budget files are removed from the upload directory
+UPLOAD_CLEANUP_INTERVAL_SEC = float(os.environ.get("UPLOAD_CLEANUP_INTERVAL_SEC", 600))
+
+started_at = time.time()
+# Model status reported by each scoring worker process (process backend only)
+scoring_worker_status = {}
+
+
+def warm_up_in_background():
+    """
+    Load the registered models in parallel, then embed the topic bank.
+    Runs in a thread after startup, so the server accepts connections meanwhile.
+    """
+    if PRELOAD_MODELS:
+        statuses = warm_up(local_model_names())
+        try:
+            scoring_worker_status.update(warm_up_scoring_workers(executor))
+        except Exception as e:
+            print(f"Could not start the scoring worker processes: {e}")
+        statuses.update(scoring_worker_status)
+        failed = [name for name, model in statuses.items() if model["state"] == FAILED]
+        if failed:
+            print(f"Warm-up failed for {', '.join(failed)}{' (OFFLINE_MODE is set)' if OFFLINE_MODE else ''}")
+    # With the process backend, each scoring worker embeds the topic bank itself
+    if TOPIC_BANK_FILE and SCORING_BACKEND != "process":
+        # Embed the prompt bank once so relevancy scoring only encodes transcripts
+        try:
+            count = preload_topics(load_topic_bank(TOPIC_BANK_FILE))
+            print(f"Preloaded {count} topic embeddings from {TOPIC_BANK_FILE}")
+        except Exception as e:
+            print(f"Could not preload topics from {TOPIC_BANK_FILE}: {e}")
+
 
+async def clean_uploads_periodically():
+    """
+    Apply the upload retention policy even while no uploads arrive.
+    """
+    while True:
+        try:
+            removed = await asyncio.to_thread(upload_store.cleanup)
+            if removed:
+                print(f"Removed {removed} expired upload(s) from {upload_store.directory}")
+        except Exception as e:
+            print(f"Could not clean up {upload_store.directory}: {e}")
+        await asyncio.sleep(UPLOAD_CLEANUP_INTERVAL_SEC)
 
 
 # --- FastAPI App Instance ---
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Not awaited: readiness is reported by /readyz while the models load
+    app.state.warm_up = asyncio.create_task(asyncio.to_thread(warm_up_in_background))
+    upload_cleanup = asyncio.create_task(clean_uploads_periodically())
+    yield
+    upload_cleanup.cancel()
+    # Commit buffered result writes before the worker exits
+    result_store.close()
+    executor.shutdown(wait=False, cancel_futures=True)
+
 app = FastAPI(
     title="Audio Analysis API",
     description="API for transcribing audio and analyzing fluency, vocabulary, grammar, and topic relevancy.",
@@ -17,6 +85,7 @@ app = FastAPI(
     docs_url="/docs",
     redoc_url="/redoc",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -28,4 +97,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(router)
\ No newline at end of file
+app.include_router(router)
+app.include_router(ops_router)
+
+
+@app.get("/healthz", tags=["monitoring"], summary="Liveness probe")
+async def healthz():
+    """
+    The process is up and serving requests, whether or not the models are loaded. Reports its
+    memory, so the weights shared by workers forked from serve.py show up as `shared`.
+    """
+    return {"status": "ok", "uptime_sec": round(time.time() - started_at, 3), "pid": os.getpid(),
+            "memory_bytes": process_memory()}
+
+
+@app.get("/readyz", tags=["monitoring"], summary="Readiness probe",
+         description="Report the state and load time of each component (ASR model, embedding model, "
+                     "LanguageTool, NLTK data). Returns 503 until the worker can serve jobs.")
+async def readyz():
+    """
+    Ready once every component is loaded; without preloading, ready unless a component failed to load.
+    """
+    components = {**model_status(local_model_names()), **scoring_worker_status}
+    warm_up_running = not app.state.warm_up.done()
+    if PRELOAD_MODELS:
+        ready = (not warm_up_running and all_warm(local_model_names())
+                 and all(component["state"] == WARM for component in scoring_worker_status.values()))
+    else:
+        ready = all(component["state"] != FAILED for component in components.values())
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": ready, "offline_mode": OFFLINE_MODE, "components": components},
+    )
@@ -0,0 +1,358 @@
+import io
+import os
+import json
+import time
+import threading
+import importlib.util
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cache import LRUCache
+
+# --- Configuration ---
+# Allow clients to request a profile of their job with `?profile=1`
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+# Profile reports kept in memory per worker
+PROFILE_REPORTS_KEPT = int(os.environ.get("PROFILE_REPORTS_KEPT", 100))
+# Print one JSON line with the stage timings of every job
+LOG_STAGE_TIMINGS = os.environ.get("LOG_STAGE_TIMINGS", "1") == "1"
+
+# The sampling profiler when installed (requirements-dev.txt), else the deterministic cProfile tracer
+PROFILER = "pyinstrument" if importlib.util.find_spec("pyinstrument") else "cProfile"
+if PROFILING_ENABLED and PROFILER == "cProfile":
+    print("PROFILING_ENABLED is set but pyinstrument is not installed; profiling with cProfile, which traces "
+          "every call and slows profiled stages much more than sampling")
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    A metric family in the Prometheus text exposition format. Values are kept per tuple
+    of label values; `function`, when given, is called at scrape time instead and returns
+    either a number or a {label values: number} dict.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], Any]] = None):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _current_values(self) -> Dict[LabelValues, float]:
+        if self.function is None:
+            with self._lock:
+                return dict(self._values)
+        value = self.function()
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        for key, value in sorted(self._current_values().items()):
+            if value is not None:
+                yield self.name, dict(zip(self.labelnames, key)), value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label values: [bucket counts..., sum, count]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in series_items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield f"{self.name}_sum", labels, series[-2]
+            yield f"{self.name}_count", labels, series[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            # Re-registering a name (e.g. on module reload) replaces the old family
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # A failing callback must not break the whole scrape
+                print(f"Could not collect metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = (), function=None) -> Counter:
+    return registry.register(Counter(name, help_text, labelnames, function))
+
+
+def gauge(name: str, help_text: str, labelnames: Sequence[str] = (), function=None) -> Gauge:
+    return registry.register(Gauge(name, help_text, labelnames, function))
+
+
+def histogram(name: str, help_text: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+    return registry.register(Histogram(name, help_text, buckets, labelnames))
+
+
+# --- Pipeline metrics ---
+STAGE_SECONDS = histogram(
+    "audio_stage_duration_seconds", "Time spent in each pipeline stage.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+    labelnames=("stage",))
+AUDIO_DURATION_SECONDS = histogram(
+    "audio_input_duration_seconds", "Duration of the transcribed recordings.",
+    buckets=(5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600))
+TRANSCRIPT_WORDS = histogram(
+    "audio_transcript_words", "Words per scored transcription.",
+    buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000))
+JOBS_TOTAL = counter("audio_jobs_total", "Jobs finished, by final status.", labelnames=("status",))
+QUEUE_WAIT_SECONDS = histogram(
+    "audio_queue_wait_seconds", "Time jobs wait for a transcription worker or a scoring slot, by priority class.",
+    buckets=(0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+    labelnames=("priority", "pool"))
+EXECUTOR_BUSY = gauge("audio_executor_busy_workers", "Executor threads currently running a task.",
+                      labelnames=("pool",))
+
+profile_reports = LRUCache(max_entries=PROFILE_REPORTS_KEPT)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Record the duration of the enclosed block in the stage histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage)
+
+
+def track_executor(pool: str, max_workers: int):
+    """
+    Export the size and saturation (busy / max workers) of a thread pool whose tasks
+    are wrapped with `JobTrace.wrap(..., pool=pool)`.
+    """
+    _pool_sizes[pool] = max_workers
+
+
+def _executor_saturation() -> Dict[LabelValues, float]:
+    busy = EXECUTOR_BUSY._current_values()
+    return {(pool,): busy.get((pool,), 0) / size for pool, size in _pool_sizes.items()}
+
+
+_pool_sizes: Dict[str, int] = {}
+gauge("audio_executor_max_workers", "Worker threads per pool.", labelnames=("pool",),
+      function=lambda: {(pool,): size for pool, size in _pool_sizes.items()})
+gauge("audio_executor_saturation", "Fraction of a pool's worker threads that are busy.", labelnames=("pool",),
+      function=_executor_saturation)
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Resident memory of this process in bytes, split into pages shared with other processes
+    (such as model weights inherited from the serve.py parent) and pages private to it.
+    Empty where /proc/self/smaps_rollup is not available.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+gauge("audio_worker_memory_bytes", "Resident memory of this worker, by kind (rss, pss, shared, private).",
+      labelnames=("kind",), function=lambda: {(kind,): value for kind, value in process_memory().items()})
+
+
+def profile_call(fn: Callable, args: tuple) -> Tuple[Any, str]:
+    """
+    Run `fn` under pyinstrument's sampling profiler when it is installed, else cProfile
+    (see PROFILER). cProfile's deterministic tracing inflates the stage's own timing.
+    """
+    if PROFILER == "cProfile":
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        try:
+            result = profiler.runcall(fn, *args)
+        finally:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(30)
+        return result, output.getvalue()
+
+    from pyinstrument import Profiler
+
+    profiler = Profiler(interval=0.001)
+    profiler.start()
+    try:
+        result = fn(*args)
+    finally:
+        profiler.stop()
+    return result, profiler.output_text(unicode=False, color=False)
+
+
+class JobTrace:
+    """
+    Collects the stage timings of one job and, when profiling was requested,
+    a profile of each stage that runs in a worker thread.
+    """
+
+    def __init__(self, job_id: str, profile: bool = False):
+        self.job_id = job_id
+        self.profile = profile and PROFILING_ENABLED
+        self.spans: Dict[str, float] = {}
+        self.profiles: Dict[str, str] = {}
+        self._started = time.perf_counter()
+
+    def _record(self, stage: str, elapsed: float):
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        self.spans[stage] = round(elapsed, 4)
+
+    def add_spans(self, spans: Dict[str, float], profiles: Optional[Dict[str, str]] = None):
+        """
+        Record stages that were timed elsewhere, e.g. in a scoring worker process.
+        """
+        for stage, elapsed in spans.items():
+            self._record(stage, elapsed)
+        if profiles:
+            self.profiles.update(profiles)
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(stage, time.perf_counter() - start)
+
+    def wrap(self, stage: str, fn: Callable, pool: Optional[str] = None) -> Callable:
+        """
+        Wrap a blocking function submitted to an executor so its run is timed (and profiled),
+        and counted as busy time of `pool`.
+        """
+        def run(*args):
+            if pool:
+                EXECUTOR_BUSY.inc(pool=pool)
+            start = time.perf_counter()
+            try:
+                if self.profile:
+                    result, self.profiles[stage] = profile_call(fn, args)
+                    return result
+                return fn(*args)
+            finally:
+                self._record(stage, time.perf_counter() - start)
+                if pool:
+                    EXECUTOR_BUSY.dec(pool=pool)
+        return run
+
+    def finish(self, status: str):
+        JOBS_TOTAL.inc(status=status)
+        self.spans["total"] = round(time.perf_counter() - self._started, 4)
+        if LOG_STAGE_TIMINGS:
+            print(json.dumps({"event": "job_timings", "unique_id": self.job_id, "status": status,
+                              "spans": self.spans}))
+        if self.profiles:
+            profile_reports.set(self.job_id, dict(self.profiles))
+
+
+def render_metrics() -> str:
+    return registry.render()
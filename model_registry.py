@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# --- Configuration ---
+# Only use models and data already on disk; loaders fail immediately instead of downloading
+OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "0") == "1"
+if OFFLINE_MODE:
+    # Read by huggingface_hub when it is first imported (NeMo and sentence-transformers)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+# After a failed load, callers get the recorded error for this long instead of retrying the load
+MODEL_RETRY_BACKOFF_SEC = float(os.environ.get("MODEL_RETRY_BACKOFF_SEC", 60))
+
+# --- Model states ---
+COLD = "cold"          # Registered but not loaded yet
+LOADING = "loading"    # A loader is currently running
+WARM = "warm"          # Loaded and ready to serve
+FAILED = "failed"      # The last load attempt raised an exception
+
+
+class ModelLoadError(RuntimeError):
+    """
+    Raised by `get` while a failed model is inside its retry backoff.
+    """
+
+
+class ModelHandle:
+    """
+    Holds a single lazily-loaded model instance for this process.
+
+    The loader runs at most once at a time; concurrent callers of `get` block on the
+    same lock and all receive the same instance once it is loaded. A failed load is not
+    retried for `retry_backoff_sec`, unless the caller forces it (as warm-up does).
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], retry_backoff_sec: float = MODEL_RETRY_BACKOFF_SEC):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._instance: Any = None
+        self.state = COLD
+        self.load_time_sec: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.failed_at: Optional[float] = None
+        self.retry_backoff_sec = retry_backoff_sec
+
+    def _check_backoff(self):
+        if self.state == FAILED and time.time() - self.failed_at < self.retry_backoff_sec:
+            raise ModelLoadError(f"Model '{self.name}' failed to load: {self.error}")
+
+    def get(self, force: bool = False) -> Any:
+        """
+        Return the loaded model, loading it first if needed. Raises ModelLoadError without
+        loading while a failed model is in its retry backoff, unless `force` is set.
+        """
+        # Fast path without taking the lock once the model is warm
+        if self.state == WARM:
+            return self._instance
+        if not force:
+            self._check_backoff()
+
+        with self._lock:
+            if self.state == WARM:
+                return self._instance
+            # Callers that waited on the lock during a failed load do not retry it
+            if not force:
+                self._check_backoff()
+
+            self.state = LOADING
+            start = time.perf_counter()
+            try:
+                instance = self._loader()
+            except Exception as e:
+                self.state = FAILED
+                self.error = str(e)
+                self.failed_at = time.time()
+                print(f"Error loading model '{self.name}': {e}")
+                raise
+
+            self._instance = instance
+            self.load_time_sec = round(time.perf_counter() - start, 3)
+            self.loaded_at = time.time()
+            self.error = None
+            self.state = WARM
+            print(f"Model '{self.name}' loaded in {self.load_time_sec}s")
+            return instance
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "state": self.state,
+            "load_time_sec": self.load_time_sec,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+            "failed_at": self.failed_at,
+        }
+
+
+# --- Process-wide registry ---
+_models: Dict[str, ModelHandle] = {}
+_models_lock = threading.Lock()
+
+
+def register_model(name: str, loader: Callable[[], Any]) -> ModelHandle:
+    """
+    Register a loader under `name`. Registering the same name twice keeps the first handle,
+    so modules can be re-imported without dropping an already loaded model.
+    """
+    with _models_lock:
+        if name not in _models:
+            _models[name] = ModelHandle(name, loader)
+        return _models[name]
+
+
+def get_model(name: str, force: bool = False) -> Any:
+    """
+    Return the shared instance of a registered model, loading it on first use. A model that
+    failed to load is only retried once its backoff has passed, or with `force`.
+    """
+    try:
+        handle = _models[name]
+    except KeyError:
+        raise KeyError(f"Model '{name}' is not registered.") from None
+    return handle.get(force=force)
+
+
+def _load_quietly(name: str):
+    try:
+        # An explicit warm-up retries failed models right away
+        get_model(name, force=True)
+    except Exception:
+        # Recorded on the handle and reported by model_status()
+        pass
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the given models (all registered models by default) in parallel, one thread each,
+    and return their status. Load failures are recorded on the handle instead of being raised.
+    """
+    selected = list(names) if names is not None else list(_models)
+    threads = [threading.Thread(target=_load_quietly, args=(name,), name=f"warm-up-{name}", daemon=True)
+               for name in selected]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return model_status(selected)
+
+
+def all_warm(names: Optional[Iterable[str]] = None) -> bool:
+    """
+    Whether every given model (all registered models by default) is loaded.
+    """
+    return all(status["state"] == WARM for status in model_status(names).values())
+
+
+def model_status(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Return the warm/cold state and load time of the given models (all by default).
+    """
+    selected = list(names) if names is not None else list(_models)
+    return {name: _models[name].status() for name in selected if name in _models}
@@ -1,28 +1,188 @@
-from sentence_transformers import util
-from sentence_transformers import SentenceTransformer
+import os
+import json
+
+from analysis import analyze_transcript
+from batching import MicroBatcher
+from cache import LRUCache
+from model_registry import register_model, get_model
 
 LOWER_BOUND = 0
 UPPER_BOUND = 10
 
-embedding_model = SentenceTransformer("avsolatorio/GIST-Embedding-v0", )
+# --- Configuration ---
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL_NAME", "avsolatorio/GIST-Embedding-v0")
+EMBEDDING_REGISTRY_KEY = "embedding"
+# "torch" (full precision), "onnx" (ONNX Runtime) or "onnx-int8" (ONNX Runtime, dynamically quantized to int8)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# ONNX Runtime intra-op threads per encode call (0 lets onnxruntime use every core)
+EMBEDDING_ONNX_THREADS = int(os.environ.get("EMBEDDING_ONNX_THREADS", 0))
+# Quantization preset for onnx-int8: arm64, avx2, avx512 or avx512_vnni
+EMBEDDING_QUANTIZATION = os.environ.get("EMBEDDING_QUANTIZATION", "avx2")
+# The ONNX export is written here once and reused by every worker
+EMBEDDING_ONNX_DIR = os.environ.get("EMBEDDING_ONNX_DIR",
+                                    os.path.join(os.path.expanduser("~"), ".cache", "embedding-onnx"))
+TOPIC_CACHE_SIZE = int(os.environ.get("TOPIC_CACHE_SIZE", 1024))
+TOPIC_CACHE_TTL_SEC = float(os.environ.get("TOPIC_CACHE_TTL_SEC", 24 * 3600))
+# Transcripts from concurrent jobs are encoded together in one call
+EMBED_BATCH_MAX_SIZE = int(os.environ.get("EMBED_BATCH_MAX_SIZE", 16))
+EMBED_BATCH_WINDOW_MS = float(os.environ.get("EMBED_BATCH_WINDOW_MS", 20))
+# Optional file of topics (one per line, or a JSON list) embedded at startup
+TOPIC_BANK_FILE = os.environ.get("TOPIC_BANK_FILE")
+
+if EMBEDDING_BACKEND not in ("torch", "onnx", "onnx-int8"):
+    raise ValueError(f"EMBEDDING_BACKEND must be 'torch', 'onnx' or 'onnx-int8', not {EMBEDDING_BACKEND!r}")
+
+
+def _onnx_export_directory():
+    variant = "onnx" if EMBEDDING_BACKEND == "onnx" else f"qint8-{EMBEDDING_QUANTIZATION}"
+    return os.path.join(EMBEDDING_ONNX_DIR, f"{EMBEDDING_MODEL_NAME.replace('/', '--')}--{variant}")
+
+
+def _onnx_file_name():
+    return "model.onnx" if EMBEDDING_BACKEND == "onnx" else f"model_qint8_{EMBEDDING_QUANTIZATION}.onnx"
+
+
+def _find_onnx_file(export_directory):
+    """
+    Path of the backend's ONNX file relative to the export directory, or None before the export.
+    """
+    for relative_path in (os.path.join("onnx", _onnx_file_name()), _onnx_file_name()):
+        if os.path.exists(os.path.join(export_directory, relative_path)):
+            return relative_path
+    return None
+
+
+def _export_onnx_model(export_directory):
+    """
+    Export the embedding model to ONNX, plus a dynamically quantized int8 copy for onnx-int8.
+    The export is written next to its final location and renamed into place, so workers
+    starting together do not read a half-written model.
+    """
+    import shutil
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    print(f"Exporting {EMBEDDING_MODEL_NAME} to ONNX in {export_directory}")
+    staging_directory = f"{export_directory}.tmp-{os.getpid()}"
+    # Without an ONNX file in the model repository, sentence-transformers exports one on load
+    model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend="onnx",
+                                model_kwargs={"provider": "CPUExecutionProvider"})
+    model.save(staging_directory)
+    if EMBEDDING_BACKEND == "onnx-int8":
+        export_dynamic_quantized_onnx_model(model, EMBEDDING_QUANTIZATION, staging_directory)
+    try:
+        os.rename(staging_directory, export_directory)
+    except OSError:
+        # Another worker finished its export first
+        shutil.rmtree(staging_directory, ignore_errors=True)
+
+
+def _onnx_session_kwargs(file_name):
+    import onnxruntime
+
+    session_options = onnxruntime.SessionOptions()
+    if EMBEDDING_ONNX_THREADS:
+        session_options.intra_op_num_threads = EMBEDDING_ONNX_THREADS
+    # The encoder graph is a single chain of operators, so inter-op threads would only idle
+    session_options.inter_op_num_threads = 1
+    return {"file_name": file_name, "provider": "CPUExecutionProvider", "session_options": session_options}
+
+
+def _load_embedding_model():
+    """
+    Load the sentence embedding model. Only called once per process by the model registry.
+    The ONNX backends export the model on first use.
+    """
+    # Imported here because importing sentence-transformers pulls in torch
+    from sentence_transformers import SentenceTransformer
+
+    if EMBEDDING_BACKEND == "torch":
+        return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+    export_directory = _onnx_export_directory()
+    if _find_onnx_file(export_directory) is None:
+        os.makedirs(EMBEDDING_ONNX_DIR, exist_ok=True)
+        _export_onnx_model(export_directory)
+    return SentenceTransformer(export_directory, backend="onnx",
+                               model_kwargs=_onnx_session_kwargs(_find_onnx_file(export_directory)))
+
+
+register_model(EMBEDDING_REGISTRY_KEY, _load_embedding_model)
+
+topic_embedding_cache = LRUCache(max_entries=TOPIC_CACHE_SIZE, ttl_sec=TOPIC_CACHE_TTL_SEC)
+
+
+def _encode_batch(texts):
+    embeddings = get_model(EMBEDDING_REGISTRY_KEY).encode(texts, batch_size=len(texts), convert_to_tensor=True)
+    return list(embeddings)
+
+
+text_encoder = MicroBatcher(
+    _encode_batch,
+    max_batch_size=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_WINDOW_MS,
+    name="embedding-batcher",
+)
+
+
+def normalize_topic(topic):
+    return " ".join(topic.lower().split())
+
+
+def get_topic_embedding(topic):
+    """
+    Return the embedding of a topic, encoding it only on a cache miss.
+    """
+    clean_topic = normalize_topic(topic)
+    topic_embedding = topic_embedding_cache.get(clean_topic)
+    if topic_embedding is None:
+        topic_embedding = text_encoder.submit(clean_topic).result()
+        topic_embedding_cache.set(clean_topic, topic_embedding)
+    return topic_embedding
+
+
+def preload_topics(topics):
+    """
+    Embed a list of topics in a single call and store them in the topic cache.
+    """
+    clean_topics = list(dict.fromkeys(normalize_topic(topic) for topic in topics if topic.strip()))
+    if not clean_topics:
+        return 0
+    for clean_topic, topic_embedding in zip(clean_topics, _encode_batch(clean_topics)):
+        topic_embedding_cache.set(clean_topic, topic_embedding)
+    return len(clean_topics)
+
+
+def load_topic_bank(path):
+    """
+    Read topics from a JSON list or a plain text file with one topic per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        content = f.read()
+    if path.endswith(".json"):
+        return json.loads(content)
+    return [line for line in content.splitlines() if line.strip()]
+
+
+def embedding_cache_stats():
+    return topic_embedding_cache.stats()
 
 
 def calculate_relevancy_score(transcribe_output, topic):
     """
-    Calculate relevancy score based on the transcribe output.
+    Calculate relevancy score based on the transcribe output (or an AnalyzedTranscript).
     """
     relevancy_score = 5.0
 
     # Fetch Text
-    audio_text = transcribe_output[0].text
-    clean_topic = topic.lower().strip()
-    clean_audio_text = audio_text.lower().strip()
+    clean_audio_text = analyze_transcript(transcribe_output).lower_text.strip()
 
-    # Encode the text
-    topic_embedding = embedding_model.encode(clean_topic, convert_to_tensor=True)
-    audio_embedding = embedding_model.encode(clean_audio_text, convert_to_tensor=True)
+    # Encode the text; the topic usually comes from the cache and the transcript is
+    # batched with the transcripts of concurrent jobs
+    topic_embedding = get_topic_embedding(topic)
+    audio_embedding = text_encoder.submit(clean_audio_text).result()
 
     # Calculate cosine similarity
+    from sentence_transformers import util
     cosine_scores = util.pytorch_cos_sim(topic_embedding, audio_embedding)
 
     # Calculate the average cosine similarity score
@@ -30,8 +190,8 @@ def calculate_relevancy_score(transcribe_output, topic):
 
     # Normalizing the score between 0 to 10
     relevancy_score = (avg_cosine_score + 1) / 2 * 10
-    
+
     # Rounding of ensuring the score is between 0 to 10
     relevancy_score = round(max(LOWER_BOUND, min(relevancy_score, UPPER_BOUND)), 2)
 
-    return relevancy_score
\ No newline at end of file
+    return relevancy_score
@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# --- Configuration ---
+RESULT_STORE = os.environ.get("RESULT_STORE", "memory")  # "memory" or "sqlite"
+RESULT_STORE_PATH = os.environ.get("RESULT_STORE_PATH", "results.sqlite3")
+# Records older than this (since their last update) are evicted
+RESULT_TTL_SEC = float(os.environ.get("RESULT_TTL_SEC", 24 * 3600))
+# Upper bound on records kept by the in-memory backend
+RESULT_MAX_ENTRIES = int(os.environ.get("RESULT_MAX_ENTRIES", 10000))
+# SQLite writes are buffered and committed together
+RESULT_FLUSH_INTERVAL_MS = float(os.environ.get("RESULT_FLUSH_INTERVAL_MS", 50))
+RESULT_FLUSH_BATCH = int(os.environ.get("RESULT_FLUSH_BATCH", 200))
+# Transcriptions longer than this are cut in the stored summary
+RESULT_TEXT_MAX_CHARS = int(os.environ.get("RESULT_TEXT_MAX_CHARS", 4000))
+# Word timestamps are only kept when explicitly enabled
+STORE_WORD_TIMESTAMPS = os.environ.get("STORE_WORD_TIMESTAMPS", "0") == "1"
+
+
+def summarize_text(text: Optional[str]) -> Optional[str]:
+    if text is None or len(text) <= RESULT_TEXT_MAX_CHARS:
+        return text
+    return text[:RESULT_TEXT_MAX_CHARS].rstrip() + "..."
+
+
+def compact_word_timestamps(word_timestamps) -> List[list]:
+    """
+    Reduce Nemo word timestamp dicts to [word, start, end] triples.
+    """
+    return [[entry['word'], round(entry['start'], 3), round(entry['end'], 3)] for entry in word_timestamps]
+
+
+class ResultStore(ABC):
+    """
+    Stores one compact record per job: status, topic, transcription summary, scores and error.
+    Word timestamps, when kept, are stored separately from the record.
+    """
+
+    @abstractmethod
+    def get(self, unique_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def put(self, unique_id: str, record: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def delete(self, unique_id: str):
+        ...
+
+    @abstractmethod
+    def put_timestamps(self, unique_id: str, words: List[list]):
+        ...
+
+    @abstractmethod
+    def get_timestamps(self, unique_id: str) -> Optional[List[list]]:
+        ...
+
+    def create(self, unique_id: str, **fields):
+        now = time.time()
+        record = {"status": None, "topic": None, "transcription": None, "scores": None, "error": None,
+                  "created_at": now, "updated_at": now}
+        record.update(fields)
+        self.put(unique_id, record)
+
+    def update(self, unique_id: str, **fields):
+        """
+        Merge fields into an existing record. Updates to unknown (e.g. evicted) ids are dropped.
+        """
+        record = self.get(unique_id)
+        if record is None:
+            return
+        record.update(fields)
+        record["updated_at"] = time.time()
+        self.put(unique_id, record)
+
+    def close(self):
+        pass
+
+
+class MemoryResultStore(ResultStore):
+    """
+    Process-local LRU store with TTL eviction; memory stays bounded by `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = RESULT_MAX_ENTRIES, ttl_sec: float = RESULT_TTL_SEC):
+        self.max_entries = max(1, max_entries)
+        self.ttl_sec = ttl_sec
+        self._records: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._timestamps: Dict[str, List[list]] = {}
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_sec
+        # Records are kept in update order, so expired ones sit at the front
+        while self._records:
+            unique_id, record = next(iter(self._records.items()))
+            if len(self._records) <= self.max_entries and record["updated_at"] >= cutoff:
+                break
+            self._records.popitem(last=False)
+            self._timestamps.pop(unique_id, None)
+
+    def get(self, unique_id):
+        with self._lock:
+            record = self._records.get(unique_id)
+            if record is None or record["updated_at"] < time.time() - self.ttl_sec:
+                return None
+            return dict(record)
+
+    def put(self, unique_id, record):
+        with self._lock:
+            self._records[unique_id] = dict(record)
+            self._records.move_to_end(unique_id)
+            self._evict()
+
+    def delete(self, unique_id):
+        with self._lock:
+            self._records.pop(unique_id, None)
+            self._timestamps.pop(unique_id, None)
+
+    def put_timestamps(self, unique_id, words):
+        with self._lock:
+            if unique_id in self._records:
+                self._timestamps[unique_id] = words
+
+    def get_timestamps(self, unique_id):
+        with self._lock:
+            return self._timestamps.get(unique_id)
+
+
+class SQLiteResultStore(ResultStore):
+    """
+    Embedded SQLite store in WAL mode, shared by every worker pointing at the same file.
+
+    Writes are buffered in memory and committed in batches by a background thread;
+    reads see buffered writes of this process immediately.
+    """
+
+    def __init__(self, path: str = RESULT_STORE_PATH, ttl_sec: float = RESULT_TTL_SEC,
+                 flush_interval_ms: float = RESULT_FLUSH_INTERVAL_MS, flush_batch: int = RESULT_FLUSH_BATCH):
+        self.path = path
+        self.ttl_sec = ttl_sec
+        self.flush_interval_sec = flush_interval_ms / 1000
+        self.flush_batch = max(1, flush_batch)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                           "unique_id TEXT PRIMARY KEY, status TEXT, record TEXT, updated_at REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS word_timestamps ("
+                           "unique_id TEXT PRIMARY KEY, words TEXT, updated_at REAL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_updated_at ON results (updated_at)")
+        self._conn.commit()
+        self._db_lock = threading.Lock()
+
+        # Writes waiting for the next flush, merged per id
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_timestamps: Dict[str, List[list]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_requested = threading.Event()
+        self._closed = False
+        self._last_eviction = 0.0
+        self._flusher = threading.Thread(target=self._flush_loop, name="result-store-flush", daemon=True)
+        self._flusher.start()
+
+    def get(self, unique_id):
+        with self._pending_lock:
+            if unique_id in self._pending:
+                return dict(self._pending[unique_id])
+        with self._db_lock:
+            row = self._conn.execute("SELECT record FROM results WHERE unique_id = ? AND updated_at >= ?",
+                                     (unique_id, time.time() - self.ttl_sec)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, unique_id, record):
+        with self._pending_lock:
+            self._pending[unique_id] = dict(record)
+            pending = len(self._pending)
+        if pending >= self.flush_batch:
+            self._flush_requested.set()
+
+    def delete(self, unique_id):
+        with self._pending_lock:
+            self._pending.pop(unique_id, None)
+            self._pending_timestamps.pop(unique_id, None)
+        with self._db_lock:
+            self._conn.execute("DELETE FROM results WHERE unique_id = ?", (unique_id,))
+            self._conn.execute("DELETE FROM word_timestamps WHERE unique_id = ?", (unique_id,))
+            self._conn.commit()
+
+    def put_timestamps(self, unique_id, words):
+        with self._pending_lock:
+            self._pending_timestamps[unique_id] = words
+
+    def get_timestamps(self, unique_id):
+        with self._pending_lock:
+            if unique_id in self._pending_timestamps:
+                return self._pending_timestamps[unique_id]
+        with self._db_lock:
+            row = self._conn.execute("SELECT words FROM word_timestamps WHERE unique_id = ?",
+                                     (unique_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def flush(self):
+        # The buffer is swapped while holding the database lock, so a reader that misses
+        # the buffer waits for the commit instead of reading the previous row
+        with self._db_lock:
+            with self._pending_lock:
+                records, self._pending = self._pending, {}
+                timestamps, self._pending_timestamps = self._pending_timestamps, {}
+            now = time.time()
+            try:
+                if records:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO results (unique_id, status, record, updated_at) VALUES (?, ?, ?, ?)",
+                        [(unique_id, record.get("status"), json.dumps(record), record.get("updated_at", now))
+                         for unique_id, record in records.items()])
+                if timestamps:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO word_timestamps (unique_id, words, updated_at) VALUES (?, ?, ?)",
+                        [(unique_id, json.dumps(words), now) for unique_id, words in timestamps.items()])
+                # Expired records are swept at most once a minute
+                if now - self._last_eviction > 60:
+                    cutoff = now - self.ttl_sec
+                    self._conn.execute("DELETE FROM results WHERE updated_at < ?", (cutoff,))
+                    self._conn.execute("DELETE FROM word_timestamps WHERE updated_at < ?", (cutoff,))
+                    self._last_eviction = now
+                self._conn.commit()
+            except Exception:
+                # Keep the writes for the next flush (disk full, database locked); entries
+                # buffered since the swap are newer and win
+                self._conn.rollback()
+                with self._pending_lock:
+                    self._pending = {**records, **self._pending}
+                    self._pending_timestamps = {**timestamps, **self._pending_timestamps}
+                raise
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_requested.wait(self.flush_interval_sec)
+            self._flush_requested.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error flushing results to {self.path}: {e}")
+
+    def close(self):
+        self._closed = True
+        self._flush_requested.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+def create_result_store() -> ResultStore:
+    """
+    Build the result store selected by RESULT_STORE.
+    """
+    if RESULT_STORE == "sqlite":
+        return SQLiteResultStore()
+    if RESULT_STORE != "memory":
+        raise ValueError(f"Unknown RESULT_STORE '{RESULT_STORE}', expected 'memory' or 'sqlite'.")
+    return MemoryResultStore()
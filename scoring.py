@@ -0,0 +1,131 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+from analysis import NLTK_REGISTRY_KEY, analyze_text, word_timing_arrays
+from fluency_score import calculate_fluency_score
+from vocabulary_score import calculate_vocabulary_score
+from grammar_score import LANGUAGE_TOOL_REGISTRY_KEY, calculate_grammar_score
+from relevancy_score import (EMBEDDING_REGISTRY_KEY, TOPIC_BANK_FILE, calculate_relevancy_score, load_topic_bank,
+                             preload_topics)
+from metrics import profile_call
+from model_registry import model_status, warm_up
+
+# --- Configuration ---
+# "thread": scorers share the API process; "process": each job is scored in a worker process,
+# so pure-Python scoring (tokenizing, lemmatizing, lexical diversity) is not serialized by the GIL
+SCORING_BACKEND = os.environ.get("SCORING_BACKEND", "thread")
+# Scoring threads, or worker processes with the process backend
+SCORING_WORKERS = int(os.environ.get("SCORING_WORKERS", 4))
+
+if SCORING_BACKEND not in ("thread", "process"):
+    raise ValueError(f"SCORING_BACKEND must be 'thread' or 'process', not {SCORING_BACKEND!r}")
+
+# Models the scorers need; with the process backend they are loaded by each worker instead
+SCORING_MODELS = (NLTK_REGISTRY_KEY, LANGUAGE_TOOL_REGISTRY_KEY, EMBEDDING_REGISTRY_KEY)
+
+
+def transcript_payload(transcribed_output) -> Dict[str, Any]:
+    """
+    Reduce a Nemo transcribe output to what the scorers read: the text, the words and
+    their start/end arrays. This is all that is pickled to a worker process.
+    """
+    hypothesis = transcribed_output[0]
+    words, starts, ends = word_timing_arrays((getattr(hypothesis, "timestamp", None) or {}).get('word', []))
+    return {"text": hypothesis.text, "words": words, "starts": starts, "ends": ends}
+
+
+# Passed to every worker process; warm-up status calls wait on it, see warm_up_scoring_workers
+_warm_up_barrier = None
+
+
+def _init_worker(warm_up_barrier=None):
+    """
+    Load the NLTK data, the embedding model and LanguageTool once per worker process,
+    and embed the topic bank into the worker's topic cache.
+    """
+    global _warm_up_barrier
+    _warm_up_barrier = warm_up_barrier
+    warm_up(SCORING_MODELS)
+    if TOPIC_BANK_FILE:
+        try:
+            preload_topics(load_topic_bank(TOPIC_BANK_FILE))
+        except Exception as e:
+            print(f"Could not preload topics from {TOPIC_BANK_FILE}: {e}")
+
+
+def _worker_model_status():
+    # Held until every worker is running one of these calls, so no worker answers twice
+    # while another is still in its initializer
+    if _warm_up_barrier is not None:
+        _warm_up_barrier.wait()
+    return os.getpid(), model_status(SCORING_MODELS)
+
+
+SCORERS = ("fluency", "vocabulary", "grammar", "relevancy")
+
+
+def score_payload(payload: Dict[str, Any], topic: str, profile: bool = False,
+                  scorers: Tuple[str, ...] = SCORERS) -> Dict[str, Any]:
+    """
+    Analyze a transcript payload and run the scorers on it (all four unless `scorers` says
+    otherwise), one after another. Returns the scores with the duration (and, when asked,
+    the profile) of each stage.
+    """
+    spans = {}
+    profiles = {}
+
+    def run(stage, fn, *args):
+        start = time.perf_counter()
+        if profile:
+            result, profiles[stage] = profile_call(fn, args)
+        else:
+            result = fn(*args)
+        spans[stage] = time.perf_counter() - start
+        return result
+
+    document = run("analysis", analyze_text, payload["text"], payload["words"], payload["starts"], payload["ends"])
+    scorer_calls = {
+        "fluency": (calculate_fluency_score, document),
+        "vocabulary": (calculate_vocabulary_score, document),
+        "grammar": (calculate_grammar_score, document),
+        "relevancy": (calculate_relevancy_score, document, topic),
+    }
+    scores = {scorer: run(scorer, *scorer_calls[scorer]) for scorer in scorers}
+    return {"scores": scores, "spans": spans, "profiles": profiles}
+
+
+def create_scoring_executor() -> Executor:
+    if SCORING_BACKEND == "process":
+        # Spawned, not forked: the parent may already run model and batcher threads
+        context = multiprocessing.get_context("spawn")
+        return ProcessPoolExecutor(max_workers=SCORING_WORKERS, mp_context=context,
+                                   initializer=_init_worker, initargs=(context.Barrier(SCORING_WORKERS),))
+    return ThreadPoolExecutor(max_workers=SCORING_WORKERS)
+
+
+def local_model_names() -> List[str]:
+    """
+    Registered models that this (API) process loads itself.
+    """
+    return [name for name in model_status() if SCORING_BACKEND != "process" or name not in SCORING_MODELS]
+
+
+def warm_up_scoring_workers(executor: Executor) -> Dict[str, Dict[str, Any]]:
+    """
+    With the process backend, start the worker processes (each loads its models in the
+    initializer) and return the status of their models, keyed by "<model>@worker-<pid>".
+    Returns once every worker has finished its initializer.
+    """
+    if SCORING_BACKEND != "process":
+        return {}
+    # Submitted together, so a process is spawned for each while none is idle yet
+    futures = [executor.submit(_worker_model_status) for _ in range(SCORING_WORKERS)]
+    statuses = {}
+    for future in futures:
+        pid, worker_statuses = future.result()
+        for name, status in worker_statuses.items():
+            statuses[f"{name}@worker-{pid}"] = status
+    return statuses
@@ -0,0 +1,182 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+# --- Configuration ---
+SAMPLE_RATE = 16000  # Parakeet expects 16 kHz mono audio
+# Recordings longer than this are split; no chunk is ever longer than this
+CHUNK_MAX_SEC = float(os.environ.get("ASR_CHUNK_MAX_SEC", 40))
+# Chunks are not cut before this length, so short silences do not produce tiny chunks
+CHUNK_MIN_SEC = float(os.environ.get("ASR_CHUNK_MIN_SEC", 10))
+# A frame quieter than this (dBFS) counts as silence
+VAD_SILENCE_DB = float(os.environ.get("VAD_SILENCE_DB", -40))
+# Minimum silence length that can be used as a cut point
+VAD_MIN_SILENCE_MS = float(os.environ.get("VAD_MIN_SILENCE_MS", 300))
+VAD_FRAME_MS = 30
+# Number of chunks decoded and in flight at once, which bounds peak memory
+CHUNK_PARALLELISM = int(os.environ.get("ASR_CHUNK_PARALLELISM", 4))
+
+# Block size used when streaming through a file to measure frame energies
+_READ_BLOCK_SEC = 10
+
+
+@dataclass
+class Transcript:
+    """
+    Transcription of a chunked recording, shaped like a Nemo hypothesis
+    (`.text` and `.timestamp['word']`) so the scorers can consume it unchanged.
+    """
+    text: str
+    timestamp: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+
+def _frame_energies_db(audio_file) -> Tuple[np.ndarray, float]:
+    """
+    Stream through the file block by block and return the energy of every VAD frame in dBFS,
+    together with the frame length in seconds. Only one block is held in memory at a time.
+    """
+    import soundfile
+
+    info = soundfile.info(audio_file)
+    frame_len = max(1, int(info.samplerate * VAD_FRAME_MS / 1000))
+    block_len = frame_len * max(1, int(_READ_BLOCK_SEC * 1000 / VAD_FRAME_MS))
+
+    energies = [_block_energies_db(block.mean(axis=1), frame_len)
+                for block in soundfile.blocks(audio_file, blocksize=block_len, dtype="float32", always_2d=True)]
+
+    frame_sec = frame_len / info.samplerate
+    if not energies:
+        return np.zeros(0, dtype=np.float32), frame_sec
+    return np.concatenate(energies), frame_sec
+
+
+def _block_energies_db(mono: np.ndarray, frame_len: int) -> np.ndarray:
+    """
+    Energy in dBFS of every whole frame of a mono block.
+    """
+    num_frames = len(mono) // frame_len
+    frames = mono[:num_frames * frame_len].reshape(num_frames, frame_len)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def _silence_midpoints(energies_db: np.ndarray, frame_sec: float) -> np.ndarray:
+    """
+    Return the midpoint (in seconds) of every silent run long enough to cut at.
+    """
+    silent = (energies_db < VAD_SILENCE_DB).astype(np.int8)
+    if not silent.any():
+        return np.zeros(0)
+    # Run boundaries: +1 where a silent run starts, -1 where it ends
+    edges = np.diff(np.concatenate(([0], silent, [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    min_frames = VAD_MIN_SILENCE_MS / 1000 / frame_sec
+    long_runs = (ends - starts) >= min_frames
+    return (starts[long_runs] + ends[long_runs]) / 2 * frame_sec
+
+
+def next_chunk_end(chunk_start: float, split_candidates: np.ndarray) -> float:
+    """
+    End of a chunk starting at `chunk_start` that has more than CHUNK_MAX_SEC of audio after it.
+    """
+    limit = chunk_start + CHUNK_MAX_SEC
+    usable = split_candidates[(split_candidates >= chunk_start + CHUNK_MIN_SEC) & (split_candidates <= limit)]
+    return float(usable[-1]) if len(usable) else limit
+
+
+def plan_chunks(duration: float, split_candidates: np.ndarray) -> List[Tuple[float, float]]:
+    """
+    Greedily cut [0, duration] into chunks no longer than CHUNK_MAX_SEC, cutting at the last
+    silence that keeps the chunk under the cap and hard-cutting when there is none.
+    """
+    chunks = []
+    chunk_start = 0.0
+    while duration - chunk_start > CHUNK_MAX_SEC:
+        chunk_end = next_chunk_end(chunk_start, split_candidates)
+        chunks.append((chunk_start, chunk_end))
+        chunk_start = chunk_end
+    chunks.append((chunk_start, duration))
+    return chunks
+
+
+def segment_audio_file(audio_file) -> List[Tuple[float, float]]:
+    """
+    Return the (start, end) seconds of each chunk a recording should be transcribed in.
+    A single chunk is returned for recordings that fit in one forward pass.
+    """
+    if isinstance(audio_file, np.ndarray):
+        return segment_audio_array(audio_file)
+
+    import soundfile
+
+    duration = soundfile.info(audio_file).duration
+    if duration <= CHUNK_MAX_SEC:
+        return [(0.0, duration)]
+    energies_db, frame_sec = _frame_energies_db(audio_file)
+    return plan_chunks(duration, _silence_midpoints(energies_db, frame_sec))
+
+
+def segment_audio_array(audio: np.ndarray) -> List[Tuple[float, float]]:
+    """
+    Same as segment_audio_file, for a recording already decoded to 16 kHz mono samples.
+    """
+    duration = len(audio) / SAMPLE_RATE
+    if duration <= CHUNK_MAX_SEC:
+        return [(0.0, duration)]
+    frame_len = int(SAMPLE_RATE * VAD_FRAME_MS / 1000)
+    return plan_chunks(duration, _silence_midpoints(_block_energies_db(audio, frame_len), frame_len / SAMPLE_RATE))
+
+
+def to_mono_16k(audio: np.ndarray, samplerate: int) -> np.ndarray:
+    """
+    Downmix (frames x channels) samples and resample them to 16 kHz float32.
+    """
+    audio = audio.mean(axis=1) if audio.ndim == 2 else audio
+    if samplerate != SAMPLE_RATE:
+        from math import gcd
+        from scipy.signal import resample_poly
+
+        divisor = gcd(SAMPLE_RATE, samplerate)
+        audio = resample_poly(audio, SAMPLE_RATE // divisor, samplerate // divisor)
+    return audio.astype(np.float32, copy=False)
+
+
+def load_chunk(audio_file, start: float, end: float) -> np.ndarray:
+    """
+    Read only [start, end) of the file as 16 kHz mono float32. Decoded recordings are sliced without a copy.
+    """
+    if isinstance(audio_file, np.ndarray):
+        return audio_file[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)]
+
+    import soundfile
+
+    with soundfile.SoundFile(audio_file) as f:
+        f.seek(int(start * f.samplerate))
+        audio = f.read(int((end - start) * f.samplerate), dtype="float32", always_2d=True)
+        samplerate = f.samplerate
+    return to_mono_16k(audio, samplerate)
+
+
+def merge_chunk_hypotheses(hypotheses: List[Any], offsets: List[float]) -> Transcript:
+    """
+    Stitch per-chunk hypotheses into one transcript, shifting each chunk's word and segment
+    timestamps by the chunk offset so the word timeline stays continuous.
+    """
+    texts = []
+    timestamps: Dict[str, List[Dict[str, Any]]] = {"word": [], "segment": []}
+    for hypothesis, offset in zip(hypotheses, offsets):
+        text = hypothesis.text.strip()
+        if text:
+            texts.append(text)
+        chunk_timestamps = getattr(hypothesis, "timestamp", None) or {}
+        for level in ("word", "segment"):
+            for entry in chunk_timestamps.get(level, []):
+                # Frame offsets are chunk-relative, so only the time fields are carried over
+                shifted = {key: value for key, value in entry.items() if not key.endswith("_offset")}
+                shifted["start"] = entry["start"] + offset
+                shifted["end"] = entry["end"] + offset
+                timestamps[level].append(shifted)
+    return Transcript(text=" ".join(texts), timestamp=timestamps)
@@ -0,0 +1,208 @@
+"""
+Serve the API from several worker processes that share one copy of the model weights.
+
+`uvicorn main:app --workers N` starts N independent processes, and each loads Parakeet, the
+embedding model, the NLTK data and its own LanguageTool JVMs. Here the parent process loads
+the models once and then forks the workers, which inherit the weights copy-on-write: tensor
+storage is never written by inference, so those pages stay shared and each extra worker only
+adds its own Python objects, caches and activations. One LanguageTool server, started by the
+parent, is used by every worker.
+
+    python serve.py --workers 4 --host 0.0.0.0 --port 5000
+
+The models must be loaded on the CPU; CUDA state cannot be inherited by a forked process.
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+# --- Configuration ---
+# Intra-op threads of torch in each worker (0 keeps the torch default of one per core)
+SERVE_TORCH_THREADS = int(os.environ.get("SERVE_TORCH_THREADS", 0))
+# Seconds to wait before replacing a worker that exited unexpectedly
+WORKER_RESTART_DELAY_SEC = float(os.environ.get("WORKER_RESTART_DELAY_SEC", 1))
+# How often the supervisor checks on the workers and the shared LanguageTool server
+SUPERVISOR_POLL_SEC = 0.5
+
+
+def preload_shared_models():
+    """
+    Load in this process the models the workers can share, and start the LanguageTool server
+    they connect to. Returns the LanguageTool server client (None when none was started).
+
+    Only the registry modules are imported here, not `main`: the API creates threads, executors
+    and database connections at import time, and those must belong to each worker.
+    """
+    import grammar_score
+    from analysis import NLTK_REGISTRY_KEY
+    from model_registry import FAILED, warm_up
+    from relevancy_score import EMBEDDING_BACKEND, EMBEDDING_REGISTRY_KEY
+    from scoring import SCORING_BACKEND, local_model_names
+    from transcribe import ASR_REGISTRY_KEY
+
+    # ONNX Runtime sessions own thread pools, which a forked process does not inherit
+    shareable = {ASR_REGISTRY_KEY, NLTK_REGISTRY_KEY}
+    if EMBEDDING_BACKEND == "torch":
+        shareable.add(EMBEDDING_REGISTRY_KEY)
+    names = [name for name in local_model_names() if name in shareable]
+    if SCORING_BACKEND == "process":
+        print("SCORING_BACKEND=process: the scoring worker processes of each API worker load their own models")
+
+    language_tool = None
+    if not grammar_score.LANGUAGE_TOOL_SERVER:
+        try:
+            language_tool, url = grammar_score.start_language_tool_server()
+        except Exception as e:
+            print(f"Could not start the shared LanguageTool server, each worker starts its own: {e}")
+        else:
+            # Read by the registry loader of every worker, and at import by spawned scoring processes
+            grammar_score.LANGUAGE_TOOL_SERVER = os.environ["LANGUAGE_TOOL_SERVER"] = url
+            print(f"Shared LanguageTool server listening on {url}")
+
+    started = time.perf_counter()
+    statuses = warm_up(names)
+    failed = [name for name, model in statuses.items() if model["state"] == FAILED]
+    print(f"Preloaded {', '.join(sorted(set(names) - set(failed))) or 'no models'} "
+          f"in {time.perf_counter() - started:.1f}s")
+    if failed:
+        print(f"Preloading failed for {', '.join(failed)}; each worker loads them itself")
+
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_initialized():
+        raise RuntimeError("The models were loaded on a GPU, which forked workers cannot share. "
+                           "Run a single worker, or hide the GPU with CUDA_VISIBLE_DEVICES=''.")
+    return language_tool
+
+
+def bind_socket(host, port, backlog=2048):
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, log_level):
+    """
+    Body of a forked worker: serve `main:app` on the inherited socket. Never returns; the
+    worker leaves with os._exit so the parent's exit handlers, which would stop the shared
+    LanguageTool server, do not run in it.
+    """
+    exit_code = 0
+    try:
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        torch = sys.modules.get("torch")
+        if torch is not None and SERVE_TORCH_THREADS:
+            torch.set_num_threads(SERVE_TORCH_THREADS)
+
+        import uvicorn
+
+        # Imported after the fork, so the API's threads and connections are created per worker
+        server = uvicorn.Server(uvicorn.Config("main:app", log_level=log_level))
+        server.run(sockets=[sock])
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the API from forked workers sharing preloaded models.")
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=5000, help="Port to listen on")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level of the workers")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Bound first, so a port already in use fails before the models are loaded
+    try:
+        sock = bind_socket(args.host, args.port)
+    except OSError as e:
+        print(f"Could not listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        language_tool = preload_shared_models()
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 2
+    # Move the preloaded objects out of the collector's reach; collections would otherwise
+    # write to their headers and copy the pages holding them into every worker
+    gc.collect()
+    gc.freeze()
+
+    # The JVM behind the shared server; language_tool_python keeps its process as `_server`
+    language_tool_process = getattr(language_tool, "_server", None)
+    workers = {}
+    stopping = False
+    exit_code = 0
+
+    def spawn(slot):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(sock, args.log_level)
+        workers[pid] = slot
+        print(f"Started worker {slot} (pid {pid})")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        for slot in range(max(1, args.workers)):
+            spawn(slot)
+        while workers:
+            # Only worker pids are waited for, so the LanguageTool JVM (also a child of this
+            # process) is never reaped behind its Popen's back
+            for pid in list(workers):
+                try:
+                    reaped, wait_status = os.waitpid(pid, os.WNOHANG)
+                except ChildProcessError:
+                    reaped, wait_status = pid, 0
+                if not reaped:
+                    continue
+                slot = workers.pop(pid)
+                if not stopping:
+                    print(f"Worker {slot} (pid {pid}) exited with status "
+                          f"{os.waitstatus_to_exitcode(wait_status)}, restarting it")
+                    time.sleep(WORKER_RESTART_DELAY_SEC)
+                    if not stopping:
+                        spawn(slot)
+            # The workers only know the server's URL, so a server that died takes the service down
+            # and the process manager restarts everything together
+            if not stopping and language_tool_process is not None and language_tool_process.poll() is not None:
+                print(f"The shared LanguageTool server exited with status {language_tool_process.returncode}, "
+                      f"stopping the workers", file=sys.stderr)
+                exit_code = 1
+                stop(None, None)
+            time.sleep(SUPERVISOR_POLL_SEC)
+    finally:
+        sock.close()
+        if language_tool is not None:
+            language_tool.close()
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
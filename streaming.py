@@ -0,0 +1,395 @@
+import os
+import copy
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from analysis import FilledPauseCounter, SentenceStream, content_lemmas, sentence_tokens, word_timing_arrays
+from fluency_score import (MINIMUM_PAUSE_DURATION, PUNCTUATION, fluency_score_from_metrics,
+                           pause_metrics_from_totals)
+from lexical_kernels import MTLD_THRESHOLD, hdd_from_frequencies
+from segmentation import (SAMPLE_RATE, CHUNK_MAX_SEC, VAD_FRAME_MS, VAD_MIN_SILENCE_MS, _block_energies_db,
+                          VAD_SILENCE_DB, merge_chunk_hypotheses, next_chunk_end)
+from vocabulary_score import lexical_diversity, readability, vocabulary_score_from_metrics
+
+# --- Configuration ---
+# Seconds of new audio after which the unfinished window is re-transcribed for interim results
+STREAM_INTERIM_SEC = float(os.environ.get("STREAM_INTERIM_SEC", 3))
+
+STREAM_ENCODINGS = {"pcm_s16le": ("<i2", 32768.0), "pcm_f32le": ("<f4", 1.0)}
+
+
+class PCMDecoder:
+    """
+    Turns binary WebSocket frames of little-endian mono PCM into float32 samples,
+    carrying over a sample split between two frames.
+    """
+
+    def __init__(self, encoding: str = "pcm_s16le"):
+        self.dtype, self.scale = STREAM_ENCODINGS[encoding]
+        self.sample_width = np.dtype(self.dtype).itemsize
+        self._carry = b""
+
+    def decode(self, frame: bytes) -> np.ndarray:
+        data = self._carry + frame
+        usable = len(data) - len(data) % self.sample_width
+        self._carry = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32)
+        if self.scale != 1.0:
+            samples /= self.scale
+        return samples
+
+
+class StreamWindower:
+    """
+    Cuts a stream of 16 kHz samples into the same chunks segment_audio_array would cut the whole
+    recording into. A chunk is released as soon as no later audio can move its end: when more than
+    CHUNK_MAX_SEC have arrived past its start and no silence still open could end up as its cut point.
+    """
+
+    def __init__(self):
+        self.frame_len = int(SAMPLE_RATE * VAD_FRAME_MS / 1000)
+        self.frame_sec = self.frame_len / SAMPLE_RATE
+        self.min_silence_frames = VAD_MIN_SILENCE_MS / 1000 / self.frame_sec
+        self.total_samples = 0
+        self.chunk_start = 0.0
+        self.num_chunks = 0
+        # Samples from the start of the current chunk, as a list of arrays joined on demand
+        self._pieces: List[np.ndarray] = []
+        self._buffer_start = 0
+        # Samples that do not fill a VAD frame yet
+        self._frame_carry = np.zeros(0, dtype=np.float32)
+        self._num_frames = 0
+        self._open_silence: Optional[int] = None
+        # Midpoints (seconds) of finished silences long enough to cut at
+        self._split_candidates: List[float] = []
+
+    @property
+    def duration(self) -> float:
+        return self.total_samples / SAMPLE_RATE
+
+    def add(self, samples: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+        """
+        Append samples and return the (start second, samples) of every chunk that became final.
+        """
+        self._pieces.append(samples)
+        self.total_samples += len(samples)
+        self._update_silences(samples)
+
+        chunks = []
+        while True:
+            limit = self.chunk_start + CHUNK_MAX_SEC
+            # One frame of margin: a silence starting in the unfinished frame always ends past the limit
+            if self.duration <= limit + self.frame_sec:
+                break
+            if (self._open_silence is not None
+                    and (self._open_silence + self._num_frames) / 2 * self.frame_sec <= limit):
+                break
+            chunks.append(self._cut(next_chunk_end(self.chunk_start, np.asarray(self._split_candidates))))
+        return chunks
+
+    def finish(self) -> List[Tuple[float, np.ndarray]]:
+        """
+        End of the stream: return the remaining chunks, the last one running to the end.
+        """
+        if self._open_silence is not None:
+            self._close_silence(self._num_frames)
+        chunks = []
+        while self.duration - self.chunk_start > CHUNK_MAX_SEC:
+            chunks.append(self._cut(next_chunk_end(self.chunk_start, np.asarray(self._split_candidates))))
+        if self.num_chunks == 0:
+            # A recording that fits in one chunk is transcribed whole
+            chunks.append(self._cut(None))
+        else:
+            chunks.append(self._cut(self.duration))
+        return chunks
+
+    def pending_audio(self) -> Tuple[float, np.ndarray]:
+        """
+        The start second and samples of the chunk still being received.
+        """
+        self._pieces = [np.concatenate(self._pieces)] if len(self._pieces) > 1 else self._pieces
+        return self.chunk_start, self._pieces[0] if self._pieces else np.zeros(0, dtype=np.float32)
+
+    def _cut(self, end: Optional[float]) -> Tuple[float, np.ndarray]:
+        # Same sample bounds as load_chunk on the whole recording
+        buffer = np.concatenate(self._pieces) if self._pieces else np.zeros(0, dtype=np.float32)
+        start = self.chunk_start
+        end_sample = len(buffer) if end is None else int(end * SAMPLE_RATE) - self._buffer_start
+        chunk = buffer[int(start * SAMPLE_RATE) - self._buffer_start:end_sample]
+        if end is not None:
+            self._pieces = [buffer[end_sample:]]
+            self._buffer_start += end_sample
+            self.chunk_start = end
+            # Only silences past the next chunk's minimum length can be cut at again
+            self._split_candidates = [candidate for candidate in self._split_candidates
+                                      if candidate >= end]
+        self.num_chunks += 1
+        return start, chunk
+
+    def _update_silences(self, samples: np.ndarray):
+        # Frames are aligned to the start of the stream, as in _block_energies_db over the whole array
+        data = np.concatenate((self._frame_carry, samples)) if len(self._frame_carry) else samples
+        num_frames = len(data) // self.frame_len
+        self._frame_carry = data[num_frames * self.frame_len:]
+        if num_frames == 0:
+            return
+        silent = _block_energies_db(data[:num_frames * self.frame_len], self.frame_len) < VAD_SILENCE_DB
+        for offset, is_silent in enumerate(silent):
+            frame = self._num_frames + offset
+            if is_silent and self._open_silence is None:
+                self._open_silence = frame
+            elif not is_silent and self._open_silence is not None:
+                self._close_silence(frame)
+        self._num_frames += num_frames
+
+    def _close_silence(self, end_frame: int):
+        # Same run length test and midpoint as _silence_midpoints
+        if end_frame - self._open_silence >= self.min_silence_frames:
+            self._split_candidates.append((self._open_silence + end_frame) / 2 * self.frame_sec)
+        self._open_silence = None
+
+
+class FluencyAccumulator:
+    """
+    Running pause and rate totals of a transcription that grows word by word. Adding words costs
+    O(new words); the metrics are those calculate_pause_metrics gives for all the words so far.
+    """
+
+    def __init__(self):
+        self.num_words = 0
+        self.first_start = None
+        self.last_end = None
+        self._last_word = None
+        self.total_pause_time_sec = 0.0
+        self.num_total_pauses = 0
+        self.num_valid_pauses = 0
+        self.num_hesitation_pauses = 0
+        self.valid_pause_durations = 0.0
+        self.hesitation_pause_durations = 0.0
+        self.filled_pauses = FilledPauseCounter()
+
+    def add(self, words, starts, ends, text):
+        for word, start, end in zip(words, starts, ends):
+            if self.last_end is None:
+                self.first_start = start
+            else:
+                # The pause after the previous word, classified by that word's punctuation
+                pause = start - self.last_end
+                if pause > MINIMUM_PAUSE_DURATION:
+                    self.total_pause_time_sec += pause
+                    self.num_total_pauses += 1
+                    if any(char in PUNCTUATION for char in self._last_word):
+                        self.num_valid_pauses += 1
+                        self.valid_pause_durations += pause
+                    else:
+                        self.num_hesitation_pauses += 1
+                        self.hesitation_pause_durations += pause
+            self.num_words += 1
+            self.last_end = end
+            self._last_word = word
+        self.filled_pauses.feed(text)
+
+    def metrics(self) -> Optional[Dict[str, Any]]:
+        if self.num_words == 0:
+            return None
+        return pause_metrics_from_totals(
+            self.num_words, float(self.last_end - self.first_start), self.total_pause_time_sec,
+            self.num_total_pauses, self.num_valid_pauses, self.num_hesitation_pauses,
+            self.valid_pause_durations, self.hesitation_pause_durations, self.filled_pauses.count)
+
+    def score(self) -> float:
+        return fluency_score_from_metrics(self.metrics())
+
+    def preview(self, words, starts, ends, text) -> float:
+        """
+        Score as if the words were added, leaving the totals unchanged.
+        """
+        accumulator = copy.deepcopy(self)
+        accumulator.add(words, starts, ends, text)
+        return accumulator.score()
+
+
+class VocabularyAccumulator:
+    """
+    Running vocabulary state of a growing transcription: the content lemmas with their type/token
+    counts and frequency-of-frequency table, the forward MTLD factor state, and word-weighted
+    readability of the finished sentences. Adding text costs O(new words).
+
+    Interim scores use the forward MTLD pass and the mean readability of the sentences so far;
+    `final_score` computes the exact metrics, including the backward MTLD pass, once at the end.
+    """
+
+    def __init__(self):
+        self.sentences = SentenceStream()
+        self.lemmas: List[str] = []
+        self.counts: Counter = Counter()
+        self.frequency_counts: Counter = Counter()
+        self._mtld_state = (frozenset(), 0, 0, 1.0)  # segment terms, segment words, factors, last TTR
+        self._readability_totals = [0.0, 0.0, 0]  # word-weighted Flesch, word-weighted fog, words
+        self.text = ""
+
+    def add(self, text):
+        self.text += text
+        closed = self.sentences.feed(text)
+        if not closed:
+            return
+        new_lemmas = content_lemmas(sentence_tokens(closed))
+        for lemma in new_lemmas:
+            self._add_lemma(self.counts, self.frequency_counts, lemma)
+        self.lemmas.extend(new_lemmas)
+        self._mtld_state = self._advance_mtld(self._mtld_state, new_lemmas)
+        self._add_readability(self._readability_totals, " ".join(closed))
+
+    @staticmethod
+    def _add_lemma(counts, frequency_counts, lemma):
+        previous = counts[lemma]
+        counts[lemma] = previous + 1
+        if previous:
+            frequency_counts[previous] -= 1
+            if not frequency_counts[previous]:
+                del frequency_counts[previous]
+        frequency_counts[previous + 1] += 1
+
+    @staticmethod
+    def _advance_mtld(state, lemmas):
+        # One step of lexicalrichness' forward MTLD pass per lemma
+        terms, word_counter, factor_count, ttr = state
+        terms = set(terms)
+        for lemma in lemmas:
+            word_counter += 1
+            terms.add(lemma)
+            ttr = len(terms) / word_counter
+            if ttr <= MTLD_THRESHOLD:
+                word_counter = 0
+                terms = set()
+                factor_count += 1
+        return frozenset(terms), word_counter, factor_count, ttr
+
+    @staticmethod
+    def _add_readability(totals, text):
+        num_words = len(text.split())
+        if num_words:
+            flesch, fog = readability(text.lower())
+            totals[0] += flesch * num_words
+            totals[1] += fog * num_words
+            totals[2] += num_words
+
+    def score(self, pending_text: str = "") -> float:
+        """
+        Interim score of the text so far, plus `pending_text` that is not added.
+        """
+        _, open_text = self.sentences.split(pending_text)
+        open_lemmas = content_lemmas(sentence_tokens([open_text])) if open_text.strip() else []
+
+        counts = {}
+        frequency_counts = Counter(self.frequency_counts)
+        for lemma in open_lemmas:
+            previous = counts.get(lemma, self.counts.get(lemma, 0))
+            counts[lemma] = previous + 1
+            if previous:
+                frequency_counts[previous] -= 1
+            frequency_counts[previous + 1] += 1
+        num_tokens = len(self.lemmas) + len(open_lemmas)
+        num_types = len(self.counts) + sum(1 for lemma in counts if lemma not in self.counts)
+
+        mtld = self._forward_mtld(self._advance_mtld(self._mtld_state, open_lemmas), num_tokens, num_types)
+        hdd = self._hdd(frequency_counts, num_tokens, num_types)
+
+        totals = list(self._readability_totals)
+        self._add_readability(totals, open_text)
+        if not totals[2]:
+            return vocabulary_score_from_metrics(mtld, hdd, *readability(""))
+        return vocabulary_score_from_metrics(mtld, hdd, totals[0] / totals[2], totals[1] / totals[2])
+
+    @staticmethod
+    def _forward_mtld(state, num_tokens, num_types):
+        # The end of lexicalrichness' sub_mtld, from the accumulated factor state
+        if num_tokens == 0:
+            return 0.0
+        _, word_counter, factor_count, ttr = state
+        if word_counter > 0:
+            factor_count += (1 - ttr) / (1 - MTLD_THRESHOLD)
+        if factor_count == 0:
+            ttr = num_types / num_tokens
+            factor_count += 1 if ttr == 1 else (1 - ttr) / (1 - MTLD_THRESHOLD)
+        return num_tokens / factor_count
+
+    @staticmethod
+    def _hdd(frequency_counts, num_tokens, num_types):
+        # Draws chosen as in lexical_diversity
+        draws = max(1, num_types // 2)
+        if draws >= num_types:
+            draws = num_types - 1
+        if draws < 1 or num_tokens < draws:
+            return 0.0
+        frequencies = np.fromiter(frequency_counts.keys(), dtype=np.int64)
+        types_per_frequency = np.fromiter(frequency_counts.values(), dtype=np.float64)
+        return hdd_from_frequencies(frequencies, types_per_frequency, num_tokens, draws)
+
+    def final_score(self) -> float:
+        """
+        The vocabulary score of the whole transcription, as calculate_vocabulary_score computes it.
+        """
+        closed, open_text = self.sentences.split("")
+        lemmas = self.lemmas + content_lemmas(sentence_tokens(closed + ([open_text] if open_text.strip() else [])))
+        mtld, hdd = lexical_diversity(lemmas)
+        return vocabulary_score_from_metrics(mtld, hdd, *readability(self.text.lower()))
+
+
+class StreamTranscript:
+    """
+    The transcription of a stream, built from the hypotheses of its chunks in order, with the
+    fluency and vocabulary state kept up to date as each chunk is added.
+    """
+
+    def __init__(self):
+        self.hypotheses = []
+        self.offsets: List[float] = []
+        self.fluency = FluencyAccumulator()
+        self.vocabulary = VocabularyAccumulator()
+
+    @property
+    def text(self) -> str:
+        return self.vocabulary.text
+
+    def _chunk_update(self, hypothesis, offset):
+        # The text and shifted word timings merge_chunk_hypotheses gives this chunk
+        text = hypothesis.text.strip()
+        if text and self.vocabulary.text:
+            text = " " + text
+        words, starts, ends = word_timing_arrays((getattr(hypothesis, "timestamp", None) or {}).get('word', []))
+        return words, starts + offset, ends + offset, text
+
+    def add(self, hypothesis, offset: float):
+        words, starts, ends, text = self._chunk_update(hypothesis, offset)
+        self.hypotheses.append(hypothesis)
+        self.offsets.append(offset)
+        self.fluency.add(words, starts, ends, text)
+        self.vocabulary.add(text)
+
+    def partial_scores(self) -> Dict[str, float]:
+        return {"fluency": self.fluency.score(), "vocabulary": self.vocabulary.score()}
+
+    def preview_scores(self, hypothesis, offset: float) -> Dict[str, float]:
+        """
+        Scores with a provisional hypothesis for the audio after the added chunks, which is not kept.
+        """
+        words, starts, ends, text = self._chunk_update(hypothesis, offset)
+        return {"fluency": self.fluency.preview(words, starts, ends, text), "vocabulary": self.vocabulary.score(text)}
+
+    def final_scores(self) -> Dict[str, float]:
+        """
+        The fluency and vocabulary scores the batch path gives the same recording.
+        """
+        return {"fluency": self.fluency.score(), "vocabulary": self.vocabulary.final_score()}
+
+    def transcript(self):
+        """
+        The transcription in the batch path's form: the hypothesis itself for a single chunk,
+        the merged hypotheses otherwise.
+        """
+        if len(self.hypotheses) == 1:
+            return self.hypotheses[0]
+        return merge_chunk_hypotheses(self.hypotheses, self.offsets)
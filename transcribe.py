@@ -1,14 +1,147 @@
-import nemo.collections.asr as nemo_asr
+import os
+import wave
+import asyncio
+import threading
+
+import numpy as np
+
+from batching import MicroBatcher
+from metrics import AUDIO_DURATION_SECONDS, time_stage
+from model_registry import register_model, get_model
+from segmentation import (SAMPLE_RATE, CHUNK_PARALLELISM, segment_audio_file, load_chunk,
+                          merge_chunk_hypotheses)
+
+# --- Configuration ---
+ASR_MODEL_NAME = os.environ.get("ASR_MODEL_NAME", "nvidia/parakeet-tdt-0.6b-v2")
+ASR_REGISTRY_KEY = "parakeet"
+
+# Micro-batching of concurrent transcription requests
+ASR_BATCH_MAX_SIZE = int(os.environ.get("ASR_BATCH_MAX_SIZE", 8))
+ASR_BATCH_WINDOW_MS = float(os.environ.get("ASR_BATCH_WINDOW_MS", 50))
+ASR_BATCH_MAX_AUDIO_SEC = float(os.environ.get("ASR_BATCH_MAX_AUDIO_SEC", 600))
+
+
+def _load_parakeet_model():
+    """
+    Load the Nemo Parakeet model. Only called once per process by the model registry.
+    """
+    import nemo.collections.asr as nemo_asr
+
+    asr_model = nemo_asr.models.ASRModel.from_pretrained(model_name=ASR_MODEL_NAME)
+    asr_model.eval()
+    return asr_model
+
+
+register_model(ASR_REGISTRY_KEY, _load_parakeet_model)
+
+# Nemo's transcribe() switches the model into inference mode and builds a temporary
+# dataloader, so calls on the shared instance must not overlap.
+_inference_lock = threading.Lock()
+
+
+def get_asr_model():
+    """
+    Return the shared Parakeet model for this process, loading it on first use.
+    """
+    return get_model(ASR_REGISTRY_KEY)
+
+
+def audio_duration_seconds(audio_file):
+    """
+    Best-effort duration of an audio file (or 16 kHz sample array) in seconds, used to size
+    transcription batches. Returns 0 when the duration cannot be read without decoding the whole file.
+    """
+    if isinstance(audio_file, np.ndarray):
+        return len(audio_file) / SAMPLE_RATE
+    try:
+        import soundfile
+        return soundfile.info(audio_file).duration
+    except Exception:
+        pass
+    try:
+        with wave.open(audio_file, "rb") as wav_file:
+            return wav_file.getnframes() / float(wav_file.getframerate())
+    except Exception:
+        return 0.0
+
+
+def _transcribe_batch(audio_files):
+    """
+    Run Nemo transcribe over a batch of audio files and in-memory chunks.
+    """
+    # Nemo expects a list of one input type per call, so paths and sample arrays are split
+    groups = {}
+    for index, audio in enumerate(audio_files):
+        groups.setdefault(isinstance(audio, np.ndarray), []).append(index)
+
+    # Loading the model (first call only) and waiting for the inference lock
+    with time_stage("model_acquire"):
+        asr_model = get_asr_model()
+        _inference_lock.acquire()
+
+    hypotheses = [None] * len(audio_files)
+    try:
+        with time_stage("asr"):
+            for indices in groups.values():
+                batch = [audio_files[index] for index in indices]
+                outputs = asr_model.transcribe(batch, batch_size=len(batch), timestamps=True)
+                for index, hypothesis in zip(indices, outputs):
+                    hypotheses[index] = hypothesis
+    finally:
+        _inference_lock.release()
+    # Every caller gets the same shape as a single-file transcribe() call
+    return [[hypothesis] for hypothesis in hypotheses]
+
+
+asr_batcher = MicroBatcher(
+    _transcribe_batch,
+    max_batch_size=ASR_BATCH_MAX_SIZE,
+    max_wait_ms=ASR_BATCH_WINDOW_MS,
+    max_batch_cost=ASR_BATCH_MAX_AUDIO_SEC,
+    cost_fn=audio_duration_seconds,
+    name="asr-batcher",
+)
+
+
+def _plan_chunks(audio_file):
+    """
+    Return the chunks to transcribe, or a single chunk when the file cannot be read
+    with soundfile (e.g. compressed formats), in which case Nemo decodes it whole.
+    Recordings decoded at upload are always segmented.
+    """
+    try:
+        return segment_audio_file(audio_file)
+    except Exception as e:
+        print(f"Could not segment {audio_file}, transcribing it in one piece: {e}")
+        return [(0.0, None)]
+
+
+def transcribe_audio(audio_file):
+    """
+    Transcribe a file or 16 kHz mono samples using the shared Nemo Parakeet model (blocking).
+    Long recordings are split at silences and their chunks are transcribed as a batch;
+    concurrent callers are grouped into a single batched transcribe call.
+    """
+    duration = audio_duration_seconds(audio_file)
+    if duration > 0:
+        AUDIO_DURATION_SECONDS.observe(duration)
+
+    chunks = _plan_chunks(audio_file)
+    if len(chunks) == 1:
+        return asr_batcher.submit(audio_file).result()
+
+    # Only CHUNK_PARALLELISM decoded chunks are held in memory at any time
+    hypotheses = []
+    for group_start in range(0, len(chunks), CHUNK_PARALLELISM):
+        group = chunks[group_start:group_start + CHUNK_PARALLELISM]
+        futures = [asr_batcher.submit(load_chunk(audio_file, start, end)) for start, end in group]
+        hypotheses.extend(future.result()[0] for future in futures)
+
+    return [merge_chunk_hypotheses(hypotheses, [start for start, _ in chunks])]
 
 
 async def transcribe_audio_with_nemo_parakeet(audio_file):
     """
     Transcribe audio using Nemo Parakeet.
     """
-    # Load the model
-    asr_model = nemo_asr.models.ASRModel.from_pretrained(model_name="nvidia/parakeet-tdt-0.6b-v2")
-    
-    # Transcribe the audio file
-    transcription = asr_model.transcribe([audio_file], timestamps=True)
-
-    return transcription
+    return await asyncio.to_thread(transcribe_audio, audio_file)
@@ -1,82 +1,46 @@
-from lexicalrichness import LexicalRichness
-from nltk.stem import WordNetLemmatizer
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import nltk
-import textstat
+import lexical_kernels
+from analysis import analyze_transcript
 
 LOWER_BOUND = 0
 UPPER_BOUND = 10
 
-# Finding the NLTK data files, downloading if not found
-try:
-    nltk.data.find('corpora/stopwords')
-except :
-    nltk.download('stopwords')
-try:
-    nltk.data.find('corpora/wordnet')
-except :
-    nltk.download('wordnet')
-try:
-    nltk.data.find('corpora/punkt')
-except :
-    nltk.download('punkt')
-try:
-    nltk.data.find('corpora/punkt_tab')
-except :
-    nltk.download('punkt_tab')
-
-def calculate_vocabulary_score(transcribe_output):
+def lexical_diversity(lem_word):
     """
-    Calculate vocabulary score based on the transcribe output.
+    MTLD and HD-D of a list of lemmas; either is 0 when the list is too short to compute it.
     """
-    vocab_score = 0
-    
-    # Fetch Text
-    audio_text = transcribe_output[0].text.lower()
-    
-    # Tokenize the text
-    words = word_tokenize(audio_text)
-    # Remove punctuation
-    words = [word for word in words if word.isalpha()]
-
-    # Initialize lemmatizer
-    lemmatizer = WordNetLemmatizer()
-
-    # Initialize stop words
-    english_stop_words = set(stopwords.words('english'))
-    
-    # Lemmatize and remove stop words
-    lem_word = [lemmatizer.lemmatize(token) for token in words if token not in english_stop_words]
-    # Calculate lexical richness
-    lem_word_with_stop_words = [lemmatizer.lemmatize(token) for token in words]
-
     # Calculate lexical richness metrics and mostly used are MTLD and HDD
     # MTLD (Measure of Textual Lexical Diversity)
     # HDD (Hypergeometric Distribution Diversity)
     mtld = 0.0
     hdd = 0.0
 
-    lex = LexicalRichness(lem_word, preprocessor=None, tokenizer=None)
-
-    unique_words = len(set(lem_word))
+    # Integer-encoded once for both measures
+    token_ids, unique_words = lexical_kernels.encode_tokens(lem_word)
     hdd_draws_param = max(1, unique_words // 2)
 
     # making sure that the draws for HDD is less than unique_words
     if hdd_draws_param >= unique_words:
         hdd_draws_param = unique_words - 1
     try:
-        mtld = lex.mtld()
-        hdd = lex.hdd(draws=hdd_draws_param)
+        mtld = lexical_kernels.mtld(token_ids, unique_words)
+        hdd = lexical_kernels.hdd(token_ids, draws=hdd_draws_param)
     except Exception as e:
         print(f"Error calculating lexical richness: {e}")
-        
-        
-    # --- Readability Metrics (using textstat) ---
-    # Textstat functions typically work on the original, uncleaned text for syllable counting etc.
-    flesch_reading_ease = textstat.flesch_reading_ease(audio_text) # Higher score = easier to read
-    gunning_fog_index = textstat.gunning_fog(audio_text) # Lower score = easier to read
-        
+    return mtld, hdd
+
+
+def readability(audio_text):
+    """
+    Flesch reading ease (higher = easier) and Gunning fog index (lower = easier) of the text.
+    """
+    # Counted on the original, uncleaned text, as textstat counts it
+    return lexical_kernels.readability(audio_text)
+
+
+def vocabulary_score_from_metrics(mtld, hdd, flesch_reading_ease, gunning_fog_index):
+    """
+    Turn the lexical diversity and readability metrics into the 0-10 vocabulary score.
+    """
     # ============= Diversity Score calculation ==============
     diversity_score = 0
 
@@ -97,6 +61,18 @@ def calculate_vocabulary_score(transcribe_output):
     # Assuming the Lexical Diversity and readability scores contirbute equally to the vocabulary score
     vocab_score = (diversity_score + readability_score) / 2
     # Normalize to a scale of 0-10
-    vocab_score = max(LOWER_BOUND, min(vocab_score / UPPER_BOUND, UPPER_BOUND))
+    return max(LOWER_BOUND, min(vocab_score / UPPER_BOUND, UPPER_BOUND))
+
+
+def calculate_vocabulary_score(transcribe_output):
+    """
+    Calculate vocabulary score based on the transcribe output (or an AnalyzedTranscript).
+    """
+    document = analyze_transcript(transcribe_output)
     
-    return vocab_score
\ No newline at end of file
+    # Lemmatized alphabetic tokens without stop words
+    lem_word = [lemma for lemma, is_stop_word in zip(document.lemmas, document.stopword_mask) if not is_stop_word]
+
+    mtld, hdd = lexical_diversity(lem_word)
+    flesch_reading_ease, gunning_fog_index = readability(document.lower_text)
+    return vocabulary_score_from_metrics(mtld, hdd, flesch_reading_ease, gunning_fog_index)